@@ -234,6 +234,10 @@ echo ⚠️  Achtung: ca. 8 GB Download – dies kann dauern.
 
 "%OLLAMA_CMD%" pull gemma3:12b
 
+echo Lade Embedding-Modell nomic-embed-text (Mail-Passagen im Chatbot) ...
+
+"%OLLAMA_CMD%" pull nomic-embed-text
+
  
 
 :: ===============================================
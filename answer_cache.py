@@ -0,0 +1,210 @@
+import atexit
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from company_aliases import file_lock
+from config import (
+    ANSWER_CACHE_FILE,
+    ANSWER_CACHE_SIZE,
+    JSON_PROFILE_FOLDER,
+    MAIL_INDEX_FOLDER,
+    MODEL,
+)
+from mail_index import index_signature
+
+
+def normalize_question(question):
+    """Vereinheitlicht Groß-/Kleinschreibung, Leerraum und Satzzeichen am Ende."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def profile_set_fingerprint(folder=JSON_PROFILE_FOLDER, mail_index=MAIL_INDEX_FOLDER):
+    """Fingerprint über alle Profil-Dateien (Name + Inhalt) und den Mail-Index.
+
+    Antworten hängen auch von den Mail-Passagen ab, daher zählt der Stand
+    des Embedding-Index mit.
+    """
+    h = hashlib.sha256()
+    h.update(index_signature(mail_index).encode("utf-8"))
+    for path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        h.update(os.path.basename(path).encode("utf-8"))
+        h.update(b"\0")
+        with open(path, "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+
+class AnswerCache:
+    """Persistenter LRU-Cache für Chatbot-Antworten.
+
+    Schlüssel ist (MODEL, normalisierte Frage, Profil-Fingerprint), Antworten
+    zu einem veralteten Fingerprint sind also nicht mehr erreichbar. Sie
+    werden mit ``prune`` (nach einer Profil-Aktualisierung) oder bei vollem
+    Cache zuerst verworfen. Treffer ändern nur den Stand im Speicher; auf
+    die Platte kommt er bei ``put``, beim ersten Treffer nach
+    ``save_interval`` Sekunden, mit ``flush`` und beim Beenden.
+
+    Oberfläche und Worker halten eigene Instanzen. Beim Schreiben wird daher
+    unter einer Lock-Datei der aktuelle Dateistand gelesen und nur die
+    eigenen Änderungen darauf angewendet (wie ``CompanyAliasIndex.save``).
+    """
+
+    def __init__(
+        self, path=ANSWER_CACHE_FILE, max_entries=ANSWER_CACHE_SIZE, save_interval=60
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        # Änderungen seit dem letzten Schreiben: ("put", key, entry),
+        # ("hit", key), ("prune", fingerprint) oder ("clear",)
+        self._changes = []
+        self._saved_at = time.monotonic()
+        _register(self)
+        self._entries = self._read()
+
+    def _read(self):
+        entries = OrderedDict()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return entries
+        for key, entry in data.get("entries", []):
+            entries[key] = entry
+        return entries
+
+    def _apply(self, entries, change):
+        """Wendet eine Änderung auf ``entries`` an (gibt entfernte Anzahl zurück)."""
+        if change[0] == "put":
+            _, key, entry = change
+            entries[key] = dict(entry)
+            entries.move_to_end(key)
+            if len(entries) > self.max_entries:
+                # Voll: zuerst veraltete Antworten, dann die am längsten ungenutzten
+                for k in [
+                    k for k, e in entries.items() if e["profiles"] != entry["profiles"]
+                ]:
+                    del entries[k]
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+        elif change[0] == "hit":
+            # von einem anderen Prozess verworfene Antworten nicht zurückholen
+            if change[1] in entries:
+                entries.move_to_end(change[1])
+                entries[change[1]]["hits"] = entries[change[1]].get("hits", 0) + 1
+        elif change[0] == "prune":
+            stale = [k for k, e in entries.items() if e["profiles"] != change[1]]
+            for k in stale:
+                del entries[k]
+            return len(stale)
+        elif change[0] == "clear":
+            entries.clear()
+        return 0
+
+    def _change(self, change):
+        self._changes.append(change)
+        return self._apply(self._entries, change)
+
+    def _save(self):
+        """Spielt die eigenen Änderungen auf den Dateistand ein und schreibt atomar."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with file_lock(self.path + ".lock"):
+            entries = self._read()
+            for change in self._changes:
+                self._apply(entries, change)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"entries": list(entries.items())}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        # Einträge anderer Prozesse sind damit auch hier sichtbar
+        self._entries, self._changes = entries, []
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Schreibt Treffer-Zähler und LRU-Reihenfolge, falls geändert."""
+        with self._lock:
+            if self._changes:
+                self._save()
+
+    @staticmethod
+    def key(question, fingerprint):
+        payload = f"{MODEL}\0{normalize_question(question)}\0{fingerprint}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def prune(self, fingerprint):
+        """Entfernt alle Antworten, die auf einem anderen Profilstand beruhen."""
+        with self._lock:
+            removed = self._change(("prune", fingerprint))
+            self._save()
+        return removed
+
+    def get(self, question, fingerprint):
+        """Gespeicherte Antwort oder ``None``; ein Treffer wird als zuletzt genutzt markiert."""
+        key = self.key(question, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            answer = entry["answer"]
+            self._change(("hit", key))
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+            return answer
+
+    def put(self, question, fingerprint, answer):
+        key = self.key(question, fingerprint)
+        entry = {
+            "question": question,
+            "answer": answer,
+            "profiles": fingerprint,
+            "model": MODEL,
+            "created": round(time.time(), 3),
+            "hits": 0,
+        }
+        with self._lock:
+            self._change(("put", key, entry))
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._change(("clear",))
+            self._save()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Je Datei nur die zuletzt geöffnete Instanz beim Beenden schreiben; eine
+# ersetzte (z. B. nach ``get_answer_cache.clear()``) wird vorher geschrieben
+_open_caches = {}
+_open_caches_lock = threading.Lock()
+
+
+def _register(cache):
+    with _open_caches_lock:
+        previous = _open_caches.get(cache.path)
+        _open_caches[cache.path] = cache
+    if previous is not None:
+        previous.flush()
+
+
+@atexit.register
+def _flush_open_caches():
+    with _open_caches_lock:
+        caches = list(_open_caches.values())
+    for cache in caches:
+        cache.flush()
@@ -0,0 +1,86 @@
+"""Benchmark für das Bereinigen der Mail-Texte (entfernte Zeichen und Dauer je Stripper).
+
+Liest die Beispielmails ungekürzt ein und wendet die Stripper aus
+``body_cleaning.py`` an. Ausgegeben werden die entfernten Zeichen je
+Stripper und je Mail sowie der Durchsatz der gesamten Kette.
+
+Aufruf aus dem Projektordner:
+
+    python benchmarks/bench_cleaning.py --per-mail
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from body_cleaning import STRIPPERS, active_strippers, strip_body  # noqa: E402
+from mail_ingest import parse_eml_stream  # noqa: E402
+
+
+def read_raw_bodies(source):
+    """(Pfad, ungekürzter Text) aller .eml-Dateien unter ``source``."""
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(source, "**", "*.eml"), recursive=True)):
+        with open(path, "rb") as f:
+            record = parse_eml_stream(os.path.basename(path), f, strippers=[])
+        bodies.append((os.path.relpath(path, source), record["body"]))
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="Kundenmails_Original")
+    parser.add_argument(
+        "--strippers", nargs="+", default=None, choices=sorted(STRIPPERS)
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--per-mail", action="store_true", help="Zeile je Mail")
+    args = parser.parse_args()
+
+    names = active_strippers(args.strippers)
+    bodies = read_raw_bodies(args.source)
+
+    removed_by_stripper, per_mail = Counter(), []
+    for path, body in bodies:
+        cleaned, removed = strip_body(body, names)
+        removed_by_stripper.update(removed)
+        per_mail.append(
+            {"mail": path, "chars": len(body), "removed": sum(removed.values())}
+        )
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for _, body in bodies:
+            strip_body(body, names)
+        best = min(best, time.perf_counter() - start)
+
+    chars = sum(m["chars"] for m in per_mail)
+    removed_total = sum(removed_by_stripper.values())
+    result = {
+        "mails": len(bodies),
+        "strippers": names,
+        "chars": chars,
+        "removed_chars": removed_total,
+        "removed_by_stripper": dict(removed_by_stripper),
+        "seconds": round(best, 6),
+        "mails_per_second": round(len(bodies) / best, 1) if best else None,
+    }
+    if args.per_mail:
+        result["per_mail"] = per_mail
+    print(
+        f"{len(bodies)} Mails: {removed_total} von {chars} Zeichen entfernt "
+        f"({removed_total / max(chars, 1):.1%}), {best * 1000:.2f} ms",
+        file=sys.stderr,
+    )
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""End-to-End-Benchmark auf einem synthetischen Postfach (Einlesen, Profile, Chatbot, Oberfläche).
+
+Erzeugt in einem temporären Ordner ein Postfach mit ``synth_mailbox.py``
+und misst nacheinander:
+
+- ``ingest_cold`` / ``ingest_warm``: ``ingest_eml_folder`` (der Kern von
+  ``process_uploaded_emails``) beim ersten Lauf und ohne Änderungen,
+- ``profiles``: ``refresh_profiles`` gegen das LLM,
+- ``mail_index_cold`` / ``mail_index_warm``: Aufbau des Embedding-Index
+  über die Mail-Passagen und ein Lauf ohne Änderungen,
+- ``mail_search``: Suche der Passagen je Frage (Einbetten der Frage und
+  die vektorisierte Ähnlichkeitssuche einzeln),
+- ``chatbot``: ``ask`` und ``ask_stream`` (Zeit bis zum ersten Token) mit
+  den Beispielfragen gegen das LLM,
+- ``gui``: ``load_profiles``/``load_emails`` und den Seitenaufbau der
+  Streamlit-App (über ``streamlit.testing``, ohne ``--skip-gui``).
+
+Standardmäßig antwortet der Ollama-Stub mit ``--llm-delay`` Sekunden
+(plus ``--llm-token-delay`` je Antwort-Token) Verzögerung und einem Profil je Firma
+(Embeddings: ``--embed-delay`` je Stapel), gemessen wird also die Pipeline und
+nicht das Modell. Mit ``--llm record`` laufen die Anfragen gegen das echte
+Ollama (``OLLAMA_HOST``) und werden in ``--recordings`` aufgezeichnet; mit
+``--llm replay`` werden sie von dort ohne Ollama abgespielt (Latenz und
+Slots über ``MDZ_REPLAY_*``, siehe ``llm_client.py``). Das Postfach ist
+über ``--seed`` reproduzierbar, die Anfragen treffen also die Aufzeichnung.
+Das Ergebnis ist JSON (``--output``); ``--compare`` vergleicht mit einem
+früheren Ergebnis und endet mit Exit-Code 1, wenn eine Stufe um mehr als
+``--threshold`` (und mindestens ``--min-delta`` Sekunden) langsamer
+geworden ist.
+
+Aufruf aus dem Projektordner:
+
+    python benchmarks/bench_e2e.py --companies 200 --mails 25 --output e2e_alt.json
+    python benchmarks/bench_e2e.py --companies 200 --mails 25 --compare e2e_alt.json
+    python benchmarks/bench_e2e.py --llm replay --recordings aufnahme.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from ollama_stub import start_stub_server  # noqa: E402
+
+EMAIL_DOMAIN = re.compile(r"[\w.+-]+@([\w-]+(?:\.[\w-]+)+)")
+
+
+def stub_content(request):
+    """Antwort des Stubs: Chat-Antwort oder ein Profil zur ersten Kunden-Domain.
+
+    Mit JSON-Schema (``format``) enthält das Profil nur die dort verlangten Felder.
+    """
+    from company_aliases import is_own_domain
+
+    prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+    if "Frage:" in prompt:
+        return "Antwort des Ollama-Stubs."
+    domains = [d for d in EMAIL_DOMAIN.findall(prompt) if not is_own_domain(d)]
+    domain = domains[0] if domains else "unbekannt.de"
+    profile = {
+        "company_name": domain.split(".")[0].replace("-", " ").title() + " GmbH",
+        "contacts": [{"name": "Erika Muster", "email": f"erika.muster@{domain}"}],
+        "products": ["SmartTrack Modul", "Care Basic"],
+        "summary": "Synthetischer Kunde aus dem Benchmark.",
+    }
+    schema = request.get("format")
+    if isinstance(schema, dict):
+        fields = schema.get("items", schema).get("properties") or profile
+        profile = {k: v for k, v in profile.items() if k in fields}
+    return json.dumps([profile], ensure_ascii=False)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def stage_records(stage):
+    from metrics import read_metrics
+
+    return [r for r in read_metrics() if r.get("stage") == stage]
+
+
+def bench_ingest(stages, mail_count):
+    from config import EML_MAIL_FOLDER, JSON_MAIL_FOLDER
+    from mail_ingest import ingest_eml_folder
+
+    for name in ("ingest_cold", "ingest_warm"):
+        start = time.perf_counter()
+        stats = ingest_eml_folder(EML_MAIL_FOLDER, JSON_MAIL_FOLDER)
+        seconds = time.perf_counter() - start
+        stages[name] = {
+            "seconds": round(seconds, 4),
+            "parsed": stats["parsed"],
+            "mails_per_second": round(mail_count / seconds, 1),
+        }
+
+
+def bench_profiles(stages, concurrency):
+    from profile_generation import refresh_profiles
+
+    start = time.perf_counter()
+    summary = refresh_profiles(max_concurrency=concurrency)
+    seconds = time.perf_counter() - start
+    calls = stage_records("llm_call")
+    stages["profiles"] = {
+        "seconds": round(seconds, 4),
+        "regenerated": summary["regenerated"],
+        "failed": summary["failed"] + summary["raw_output"],
+        "llm_calls": len(calls),
+        "prompt_tokens": summary["prompt_tokens"],
+        "completion_tokens": summary["completion_tokens"],
+        "profiles_per_second": round(summary["regenerated"] / seconds, 2),
+    }
+
+
+def bench_mail_index(stages, rounds):
+    from chatbot import SAMPLE_QUESTIONS
+    from mail_index import MailIndex, embed_texts, search_mails
+
+    for name in ("mail_index_cold", "mail_index_warm"):
+        start = time.perf_counter()
+        stats = MailIndex().update()
+        seconds = time.perf_counter() - start
+        stages[name] = {
+            "seconds": round(seconds, 4),
+            "passages": stats["passages"],
+            "embedded": stats["embedded"],
+            "passages_per_second": round(stats["embedded"] / seconds, 1),
+        }
+
+    index = MailIndex()
+    query_vectors = embed_texts(SAMPLE_QUESTIONS, index.model)
+    search_times, vector_times = [], []
+    for _ in range(rounds):
+        for question, vector in zip(SAMPLE_QUESTIONS, query_vectors):
+            start = time.perf_counter()
+            search_mails(question, index)
+            search_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.search(vector)
+            vector_times.append(time.perf_counter() - start)
+    stages["mail_search"] = {
+        "rows": len(index.vectors()),
+        "dim": index.meta["dim"],
+        "vector_search_p50_s": round(statistics.median(vector_times), 6),
+        "seconds": round(statistics.median(search_times), 5),
+    }
+    return index
+
+
+def bench_chatbot(stages, rounds, mail_index=None):
+    from chatbot import (
+        SAMPLE_QUESTIONS,
+        ask,
+        ask_stream,
+        build_chat_messages,
+        read_profiles,
+    )
+    from profile_search import ProfileIndex
+
+    profiles, _ = read_profiles()
+    start = time.perf_counter()
+    index = ProfileIndex(profiles)
+    index_seconds = time.perf_counter() - start
+
+    prompt_times, answer_times, first_token_times = [], [], []
+    for _ in range(rounds):
+        for question in SAMPLE_QUESTIONS:
+            start = time.perf_counter()
+            build_chat_messages(question, profiles, index=index)
+            prompt_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            ask(question, profiles, index=index, mail_index=mail_index)
+            answer_times.append(time.perf_counter() - start)
+        for question in SAMPLE_QUESTIONS:
+            timings = {}
+            for _ in ask_stream(
+                question, profiles, timings, index=index, mail_index=mail_index
+            ):
+                pass
+            first_token_times.append(timings.get("ttft", timings["total"]))
+    stages["chatbot"] = {
+        "profiles": len(profiles),
+        "questions": len(answer_times),
+        "index_seconds": round(index_seconds, 4),
+        "prompt_p50_s": round(statistics.median(prompt_times), 5),
+        "seconds": round(statistics.median(answer_times), 4),
+        "answer_max_s": round(max(answer_times), 4),
+        "ttft_p50_s": round(statistics.median(first_token_times), 4),
+    }
+
+
+def bench_gui(stages, repeat):
+    from streamlit.testing.v1 import AppTest
+
+    from chatbot import read_profiles
+
+    profiles, _ = read_profiles()
+    at = AppTest.from_file(os.path.join(ROOT, "gui.py"), default_timeout=600)
+    at.query_params["page"] = "Startseite"
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception[0].value)
+    at.query_params["page"] = next(iter(sorted(profiles)), "Startseite")
+    at.run()
+    if at.exception:
+        raise SystemExit(at.exception[0].value)
+    for _ in range(repeat):
+        at.run()
+
+    renders = [r["seconds"] for r in stage_records("page_render")]
+    for stage in ("load_profiles", "load_emails"):
+        records = stage_records(stage)
+        if records:
+            stages[stage] = {
+                "seconds": records[-1]["seconds"],
+                "files": records[-1].get("files"),
+            }
+    stages["gui"] = {
+        "first_render_s": round(renders[0], 4),
+        "customer_page_first_s": round(renders[1], 4),
+        "seconds": round(statistics.median(renders[2:] or renders), 4),
+    }
+
+
+def compare(result, baseline, threshold, min_delta):
+    """Vergleicht ``seconds`` je Stufe; gibt die Namen langsamerer Stufen zurück.
+
+    Eine Stufe gilt als langsamer, wenn sie um mehr als den Faktor
+    ``threshold`` und mindestens ``min_delta`` Sekunden länger braucht
+    (Stufen im Millisekundenbereich schwanken sonst zu stark).
+    """
+    regressions = []
+    print(f"{'Stufe':<16}{'vorher':>10}{'jetzt':>10}{'Faktor':>9}", file=sys.stderr)
+    for name, stage in result["stages"].items():
+        old = baseline.get("stages", {}).get(name, {}).get("seconds")
+        new = stage.get("seconds")
+        if not old or new is None:
+            continue
+        ratio = new / old
+        flag = ""
+        if ratio > threshold and new - old >= min_delta:
+            regressions.append(name)
+            flag = "  ⚠️"
+        print(
+            f"{name:<16}{old:>10.4f}{new:>10.4f}{ratio:>8.2f}x{flag}", file=sys.stderr
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="Kundenmails_Original")
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--mails", type=int, default=20, help="Mails je Firma")
+    parser.add_argument("--attachments", type=float, default=0.1)
+    parser.add_argument("--quoted", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm", choices=("stub", "record", "replay"), default="stub")
+    parser.add_argument("--recordings", default="llm_recordings.jsonl")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="nur Stub")
+    parser.add_argument(
+        "--llm-token-delay", type=float, default=0.0, help="nur Stub, je Antwort-Token"
+    )
+    parser.add_argument(
+        "--embed-delay", type=float, default=0.01, help="nur Stub, je Embedding-Stapel"
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--chat-rounds", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5, help="Reruns der Oberfläche")
+    parser.add_argument("--skip-gui", action="store_true")
+    parser.add_argument("--output", help="Ergebnis zusätzlich in diese Datei schreiben")
+    parser.add_argument("--compare", help="Früheres Ergebnis (JSON) zum Vergleich")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    parser.add_argument("--min-delta", type=float, default=0.01, help="Sekunden")
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.source)
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {
+            k: v
+            for k, v in vars(args).items()
+            if k not in ("source", "output", "compare", "threshold", "min_delta")
+        },
+        "stages": {},
+    }
+
+    # Vor dem ersten Import von config setzen (Werte werden beim Import gelesen)
+    server = None
+    if args.llm == "stub":
+        server, host = start_stub_server(
+            delay=args.llm_delay,
+            content=stub_content,
+            token_delay=args.llm_token_delay,
+            embed_delay=args.embed_delay,
+        )
+        os.environ["OLLAMA_HOST"] = host
+        os.environ["MDZ_LLM_BACKEND"] = "ollama"
+    else:
+        os.environ["MDZ_LLM_BACKEND"] = args.llm
+        os.environ["MDZ_LLM_RECORDINGS"] = os.path.abspath(args.recordings)
+    os.environ["MDZ_METRICS"] = "1"
+    from synth_mailbox import generate_mailbox
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            from config import EML_MAIL_FOLDER
+
+            mailbox = generate_mailbox(
+                EML_MAIL_FOLDER,
+                companies=args.companies,
+                mails=args.mails,
+                attachments=args.attachments,
+                quoted=args.quoted,
+                source=source,
+                seed=args.seed,
+            )
+            result["mailbox"] = mailbox
+            bench_ingest(result["stages"], mailbox["files"])
+            bench_profiles(result["stages"], args.concurrency)
+            mail_index = bench_mail_index(result["stages"], args.chat_rounds)
+            bench_chatbot(result["stages"], args.chat_rounds, mail_index)
+            if not args.skip_gui:
+                shutil.copytree(os.path.join(ROOT, "Logos"), "Logos")
+                bench_gui(result["stages"], args.repeat)
+        finally:
+            os.chdir(cwd)
+            if server is not None:
+                server.shutdown()
+
+    for name, stage in result["stages"].items():
+        print(f"{name:<16}{stage['seconds']:>10.4f}s", file=sys.stderr)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold, args.min_delta)
+        if regressions:
+            print(f"Langsamer: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
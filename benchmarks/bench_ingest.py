@@ -0,0 +1,74 @@
+"""Durchsatz-Benchmark für das Parsen der .eml-Dateien (Mails/Sekunde je Worker-Anzahl).
+
+Aufruf aus dem Projektordner:
+
+    python benchmarks/bench_ingest.py --copies 200 --workers 1 2 4 8
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_ingest import parse_eml_files  # noqa: E402
+
+
+def build_corpus(source, copies, target):
+    """Vervielfältigt die Beispielmails ``copies``-mal in ``target``."""
+    originals = glob.glob(os.path.join(source, "**", "*.eml"), recursive=True)
+    for i in range(copies):
+        for path in originals:
+            name = f"{i:05d}_{os.path.basename(path)}"
+            shutil.copyfile(path, os.path.join(target, name))
+    return sorted(f for f in os.listdir(target) if f.lower().endswith(".eml"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default="Kundenmails_Original")
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filenames = build_corpus(args.source, args.copies, tmp)
+        items = [(name, None) for name in filenames]
+
+        results = []
+        for workers in args.workers:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                parse_eml_files(tmp, items, workers=workers)
+                best = min(best, time.perf_counter() - start)
+            results.append(
+                {
+                    "workers": workers,
+                    "mails": len(items),
+                    "seconds": round(best, 4),
+                    "mails_per_second": round(len(items) / best, 1),
+                }
+            )
+            print(
+                f"{workers:>3} Worker: {len(items) / best:10.1f} Mails/s "
+                f"({len(items)} Mails in {best:.3f}s)",
+                file=sys.stderr,
+            )
+
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
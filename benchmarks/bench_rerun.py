@@ -0,0 +1,109 @@
+"""Rerun-Latenz der Streamlit-Oberfläche (Dauer eines Skriptdurchlaufs nach dem Start).
+
+Erzeugt in einem temporären Ordner synthetische Profile und Email-Verläufe
+und führt mit ``streamlit.testing`` wiederholt eine Seite aus – so, wie bei
+jedem Klick. Gemessen wird die Messung ``page_render`` der App selbst (ohne
+den Overhead des Test-Runners).
+
+Aufruf aus dem Projektordner:
+
+    python benchmarks/bench_rerun.py --profiles 500 --page KI-Chatbot
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def build_data(target, n_profiles, mails_per_company):
+    """Legt ``n_profiles`` Firmen mit Profil und Email-Verlauf an."""
+    mail_dir = os.path.join(target, "data", "emails", "json")
+    profile_dir = os.path.join(target, "data", "profiles", "json")
+    os.makedirs(mail_dir)
+    os.makedirs(profile_dir)
+    for i in range(n_profiles):
+        company = f"firma-{i:05d}_de"
+        mails = [
+            {
+                "filename": f"{company}_{j}.eml",
+                "date": f"2025-01-{j % 28 + 1:02d}T10:00:00",
+                "from_email": f"kontakt{j}@firma-{i:05d}.de",
+                "subject": f"Anfrage {j}",
+                "body": "Sehr geehrte Damen und Herren,\n" + "Text " * 120,
+            }
+            for j in range(mails_per_company)
+        ]
+        with open(os.path.join(mail_dir, f"{company}.json"), "w") as f:
+            json.dump(mails, f)
+        profile = {
+            "company_name": f"Firma {i:05d} GmbH",
+            "contacts": [{"name": f"Person {i}", "email": f"p{i}@firma-{i:05d}.de"}],
+            "products": ["SmartTrack Modul", "Care Basic"],
+            "summary": "Kunde interessiert sich für Wartungsverträge. " * 6,
+        }
+        with open(os.path.join(profile_dir, f"profil_{company}.json"), "w") as f:
+            json.dump(profile, f)
+    shutil.copytree(os.path.join(ROOT, "Logos"), os.path.join(target, "Logos"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=300)
+    parser.add_argument("--mails", type=int, default=10, help="Mails je Firma")
+    parser.add_argument("--page", default="Startseite")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        build_data(tmp, args.profiles, args.mails)
+        os.chdir(tmp)
+        try:
+            os.environ["MDZ_METRICS"] = "1"
+            from metrics import read_metrics
+
+            at = AppTest.from_file(os.path.join(ROOT, "gui.py"), default_timeout=600)
+            at.query_params["page"] = args.page
+
+            at.run()
+            if at.exception:
+                raise SystemExit(at.exception[0].value)
+            for _ in range(args.repeat):
+                at.run()
+
+            renders = [
+                r["seconds"]
+                for r in read_metrics(os.path.join("data", "metrics", "metrics.jsonl"))
+                if r.get("stage") == "page_render"
+            ]
+        finally:
+            os.chdir(cwd)
+
+    first, reruns = renders[0], sorted(renders[1:])
+    result = {
+        "profiles": args.profiles,
+        "mails_per_company": args.mails,
+        "page": args.page,
+        "first_run_s": round(first, 4),
+        "rerun_p50_s": round(statistics.median(reruns), 4),
+        "rerun_max_s": round(reruns[-1], 4),
+    }
+    print(
+        f"{args.page}: erster Lauf {first:.3f}s, Rerun p50 "
+        f"{result['rerun_p50_s']:.3f}s ({args.profiles} Profile)",
+        file=sys.stderr,
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Minimaler Ollama-Stub-Server (``/api/chat``, ``/api/embed``) für Tests und Benchmarks.
+
+Aufruf aus dem Projektordner:
+
+    python benchmarks/ollama_stub.py --port 11435 --delay 0.5
+
+Anschließend z. B. mit ``OLLAMA_HOST=http://127.0.0.1:11435`` starten.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PROFILE = [
+    {
+        "company_name": "Stub GmbH",
+        "contacts": [{"name": "Erika Muster", "email": "erika@stub.de"}],
+        "products": ["SmartTrack Modul"],
+        "summary": "Antwort des Ollama-Stubs.",
+    }
+]
+
+
+# Antwort ohne verwertbares JSON (für Tests von Reparatur und Wiederholung)
+INVALID_CONTENT = "Leider kann ich aus diesen Emails kein Profil erstellen."
+
+
+# Dimension der Stub-Embeddings
+EMBEDDING_DIM = 256
+
+
+def stub_embedding(text, dim=EMBEDDING_DIM):
+    """Normierter Bag-of-Words-Vektor (Wörter per Hash auf ``dim`` Felder).
+
+    Texte mit gemeinsamen Wörtern liegen nah beieinander – genug, um die
+    Suche ohne echtes Embedding-Modell zu prüfen.
+    """
+    vector = [0.0] * dim
+    for word in re.findall(r"\w{3,}", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    server_version = "OllamaStub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _embed(self, request):
+        texts = request.get("input") or []
+        texts = [texts] if isinstance(texts, str) else texts
+        stub = self.server.stub
+        with stub["lock"]:
+            stub["embed_requests"] += 1
+            stub["embedded"] += len(texts)
+        time.sleep(stub["embed_delay"])
+        self._send_json(
+            {
+                "model": request.get("model", ""),
+                "embeddings": [stub_embedding(text) for text in texts],
+                "prompt_eval_count": sum(len(text) // 4 for text in texts),
+            }
+        )
+
+    def do_POST(self):
+        if self.path not in ("/api/chat", "/api/embed"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/embed":
+            self._embed(request)
+            return
+
+        stub = self.server.stub
+        with stub["lock"]:
+            stub["requests"] += 1
+            stub["in_flight"] += 1
+            stub["max_in_flight"] = max(stub["max_in_flight"], stub["in_flight"])
+            fail = stub["fail_first"] > 0
+            if fail:
+                stub["fail_first"] -= 1
+            invalid = not fail and stub["invalid_first"] > 0
+            if invalid:
+                stub["invalid_first"] -= 1
+            if request.get("format") is not None:
+                stub["structured"] += 1
+        try:
+            if fail:
+                time.sleep(stub["delay"])
+                self.send_error(503, "stub: simulierter Fehler")
+                return
+            content = INVALID_CONTENT if invalid else stub["content"]
+            if callable(content):
+                content = content(request)
+            time.sleep(stub["delay"] + stub["token_delay"] * (len(content) // 4))
+            self._send_json(
+                {
+                    "model": request.get("model", ""),
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "message": {"role": "assistant", "content": content},
+                    "done": True,
+                    "done_reason": "stop",
+                    "prompt_eval_count": sum(
+                        len(m.get("content", "")) // 4
+                        for m in request.get("messages", [])
+                    ),
+                    "eval_count": len(content) // 4,
+                }
+            )
+        finally:
+            with stub["lock"]:
+                stub["in_flight"] -= 1
+
+
+def start_stub_server(
+    port=0,
+    delay=0.0,
+    content=None,
+    fail_first=0,
+    invalid_first=0,
+    token_delay=0.0,
+    embed_delay=0.0,
+):
+    """Startet den Stub in einem Hintergrund-Thread.
+
+    ``content`` ist der Antworttext oder eine Funktion ``request -> text``.
+    Jede Antwort dauert ``delay`` plus ``token_delay`` je Antwort-Token.
+    Die ersten ``fail_first`` Anfragen scheitern mit HTTP 503, die nächsten
+    ``invalid_first`` liefern Text ohne JSON. Embeddings (``stub_embedding``)
+    dauern ``embed_delay`` je Anfrage. Gibt (server, host_url) zurück;
+    ``server.stub`` enthält Zähler wie ``requests``, ``structured``
+    (Anfragen mit ``format``), ``max_in_flight``, ``embed_requests`` und
+    ``embedded`` (eingebettete Texte). Beenden mit ``server.shutdown()``.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), OllamaStubHandler)
+    server.daemon_threads = True
+    server.stub = {
+        "lock": threading.Lock(),
+        "delay": delay,
+        "token_delay": token_delay,
+        "embed_delay": embed_delay,
+        "content": content or json.dumps(DEFAULT_PROFILE, ensure_ascii=False),
+        "fail_first": fail_first,
+        "invalid_first": invalid_first,
+        "requests": 0,
+        "structured": 0,
+        "in_flight": 0,
+        "max_in_flight": 0,
+        "embed_requests": 0,
+        "embedded": 0,
+    }
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    parser.add_argument("--invalid-first", type=int, default=0)
+    parser.add_argument("--embed-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(
+        args.port,
+        args.delay,
+        fail_first=args.fail_first,
+        invalid_first=args.invalid_first,
+        token_delay=args.token_delay,
+        embed_delay=args.embed_delay,
+    )
+    print(f"Ollama-Stub läuft auf {url} (Strg+C beendet)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Erzeugt ein synthetisches Postfach (.eml) aus den Beispielmails in ``Kundenmails_Original``.
+
+Sätze, Betreffzeilen und Namen stammen aus den Originalen; jeder Mail-Text
+wird aus zufälligen Sätzen neu zusammengesetzt, damit die Duplikaterkennung
+die Mails nicht zusammenfasst. Firmen, Domains,
+Datumsangaben, Anhänge und zitierte Antwort-Ketten werden zufällig (aber
+reproduzierbar über ``--seed``) erzeugt. Die Dateien landen flach in einem
+Ordner – so, wie ``ingest_eml_folder`` sie erwartet.
+
+Aufruf aus dem Projektordner:
+
+    python benchmarks/synth_mailbox.py --out /tmp/postfach --companies 200 --mails 25
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import format_datetime, parseaddr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from company_aliases import is_own_domain  # noqa: E402
+from config import MY_DOMAINS  # noqa: E402
+from mail_ingest import parse_eml_stream  # noqa: E402
+
+REPLY_MARKER = "-----Ursprüngliche Nachricht-----"
+SENTENCE = re.compile(r"[^.!?\n]{20,}[.!?]")
+GREETINGS = ("Sehr geehrte Damen und Herren,", "Guten Tag,", "Hallo zusammen,")
+CLOSINGS = ("Mit freundlichen Grüßen", "Viele Grüße", "Freundliche Grüße")
+
+
+def load_seed_texts(source):
+    """Sätze, Betreffzeilen und Personennamen aus den bereinigten Originalen."""
+    seed = {"sentences": [], "subjects": [], "customers": [], "staff": []}
+    for path in sorted(glob.glob(os.path.join(source, "**", "*.eml"), recursive=True)):
+        with open(path, "rb") as f:
+            record = parse_eml_stream(os.path.basename(path), f)
+        seed["sentences"].extend(s.strip() for s in SENTENCE.findall(record["body"]))
+        subject = record["subject"].removeprefix("Re: ").removeprefix("AW: ")
+        seed["subjects"].append(subject)
+        name, email = parseaddr(record["from_email"])
+        name = name or email.split("@")[0].replace(".", " ").title()
+        domain = email.rpartition("@")[2]
+        seed["staff" if is_own_domain(domain) else "customers"].append(name)
+    for key in ("sentences", "subjects", "customers", "staff"):
+        seed[key] = sorted(set(filter(None, seed[key])))
+    if not seed["sentences"]:
+        raise SystemExit(f"Keine .eml-Dateien in {source}")
+    seed["staff"] = seed["staff"] or ["Markus Schuster"]
+    seed["customers"] = seed["customers"] or ["Erika Muster"]
+    return seed
+
+
+def _body(rng, seed, sender):
+    """Anrede, 3–8 zufällige Sätze und Grußformel."""
+    sentences = rng.sample(
+        seed["sentences"], k=min(rng.randint(3, 8), len(seed["sentences"]))
+    )
+    return (
+        f"{rng.choice(GREETINGS)}\n\n{' '.join(sentences)}\n\n"
+        f"{rng.choice(CLOSINGS)}\n{sender}"
+    )
+
+
+def _address(name, domain):
+    local = name.lower().replace(" ", ".")
+    local = local.translate(str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"}))
+    return f"{name} <{local}@{domain}>"
+
+
+def _quote(previous):
+    """Zitierter Vorgänger im Outlook-Stil (inklusive seiner eigenen Zitate)."""
+    return (
+        f"\n\n{REPLY_MARKER}\n"
+        f"From: {previous['From']}\n"
+        f"Date: {previous['Date']}\n"
+        f"To: {previous['To']}\n"
+        f"Subject: {previous['Subject']}\n\n"
+        f"{previous['text']}"
+    )
+
+
+def build_mail(rng, seed, company, contact, sender_domain, date, previous, options):
+    """Baut eine Mail; Anfragen kommen vom Kunden, Antworten von uns."""
+    staff = _address(rng.choice(seed["staff"]), sender_domain)
+    customer = _address(contact, company["domain"])
+    from_customer = previous is None or previous["From"] != customer
+    subject = previous["Subject"] if previous else rng.choice(seed["subjects"])
+    if previous and not subject.startswith("Re: "):
+        subject = "Re: " + subject
+
+    text = _body(rng, seed, contact if from_customer else staff.split(" <")[0])
+    if previous is not None and rng.random() < options["quoted"]:
+        depth = previous.get("depth", 0)
+        if depth < options["quote_depth"]:
+            text += _quote(previous)
+            depth += 1
+        else:
+            depth = 0
+    else:
+        depth = 0
+
+    msg = EmailMessage()
+    msg["From"] = customer if from_customer else staff
+    msg["To"] = staff if from_customer else customer
+    msg["Date"] = format_datetime(date)
+    msg["Subject"] = subject
+    msg["Message-ID"] = (
+        f"<{date:%Y%m%d%H%M%S}.{rng.randrange(10**6)}@{company['domain']}>"
+    )
+    msg.set_content(text)
+    if rng.random() < options["attachments"]:
+        msg.add_attachment(
+            rng.randbytes(options["attachment_kb"] * 1024),
+            maintype="application",
+            subtype="pdf",
+            filename=f"Angebot_{date:%Y%m%d}.pdf",
+        )
+    return msg, {
+        "From": msg["From"],
+        "To": msg["To"],
+        "Date": msg["Date"],
+        "Subject": subject,
+        "text": text,
+        "depth": depth,
+    }
+
+
+def generate_mailbox(
+    target,
+    companies=50,
+    mails=20,
+    attachments=0.1,
+    attachment_kb=100,
+    quoted=0.5,
+    quote_depth=3,
+    source="Kundenmails_Original",
+    seed=0,
+):
+    """Schreibt ``companies`` × ``mails`` .eml-Dateien nach ``target``.
+
+    ``attachments`` und ``quoted`` sind Anteile (0–1) der Mails mit einem
+    PDF-Anhang (``attachment_kb`` KiB) bzw. mit zitiertem Vorgänger (Kette
+    bis ``quote_depth`` Ebenen). Gibt eine Statistik zurück.
+    """
+    rng = random.Random(seed)
+    texts = load_seed_texts(source)
+    options = {
+        "attachments": attachments,
+        "attachment_kb": attachment_kb,
+        "quoted": quoted,
+        "quote_depth": quote_depth,
+    }
+    os.makedirs(target, exist_ok=True)
+    stats = {"companies": companies, "files": 0, "bytes": 0, "attachments": 0}
+    start_date = datetime(2022, 1, 3, 9, 0).astimezone()
+
+    for i in range(companies):
+        company = {"domain": f"firma-{i:05d}.de"}
+        contacts = rng.sample(texts["customers"], k=min(2, len(texts["customers"])))
+        date, previous = start_date + timedelta(days=rng.randrange(365)), None
+        for j in range(mails):
+            # Neuer Vorgang etwa bei jeder vierten Mail
+            if previous is not None and rng.random() < 0.25:
+                previous = None
+            date += timedelta(hours=rng.randrange(2, 96))
+            msg, previous = build_mail(
+                rng,
+                texts,
+                company,
+                rng.choice(contacts),
+                MY_DOMAINS[0],
+                date,
+                previous,
+                options,
+            )
+            data = msg.as_bytes()
+            with open(os.path.join(target, f"firma-{i:05d}_{j:04d}.eml"), "wb") as f:
+                f.write(data)
+            stats["files"] += 1
+            stats["bytes"] += len(data)
+            stats["attachments"] += msg.is_multipart()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="Zielordner für die .eml-Dateien")
+    parser.add_argument("--source", default="Kundenmails_Original")
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--mails", type=int, default=20, help="Mails je Firma")
+    parser.add_argument("--attachments", type=float, default=0.1, help="Anteil 0–1")
+    parser.add_argument("--attachment-kb", type=int, default=100)
+    parser.add_argument("--quoted", type=float, default=0.5, help="Anteil 0–1")
+    parser.add_argument("--quote-depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = generate_mailbox(
+        args.out,
+        companies=args.companies,
+        mails=args.mails,
+        attachments=args.attachments,
+        attachment_kb=args.attachment_kb,
+        quoted=args.quoted,
+        quote_depth=args.quote_depth,
+        source=args.source,
+        seed=args.seed,
+    )
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
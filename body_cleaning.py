@@ -0,0 +1,132 @@
+import re
+
+from config import BODY_STRIPPERS
+
+# -------------------------------
+# Entfernen von Antwort-Ketten, Zitaten und Signaturen
+# -------------------------------
+
+# Registrierte Stripper in Anwendungsreihenfolge: Name → Funktion(text) → text
+STRIPPERS = {}
+
+
+def register_stripper(name):
+    """Decorator: registriert eine Funktion ``text -> text`` als Stripper."""
+
+    def decorator(func):
+        STRIPPERS[name] = func
+        return func
+
+    return decorator
+
+
+def _cut_at(pattern, text):
+    """Schneidet ab dem ersten Treffer ab – aber nie den ganzen Text."""
+    for match in pattern.finditer(text):
+        if text[: match.start()].strip():
+            return text[: match.start()]
+    return text
+
+
+# Outlook (DE/EN), Lotus u. a.: "-----Ursprüngliche Nachricht-----"
+REPLY_MARKER = re.compile(
+    r"^[ \t]*-{3,}[ \t]*(?:Ursprüngliche Nachricht|Original Message|Originalnachricht)"
+    r"[ \t]*-{3,}",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Kopfblock einer zitierten Mail: "Von: …" und wenige Zeilen später "Gesendet: …"
+HEADER_BLOCK = re.compile(
+    r"^[ \t]*\**(?:Von|From)\**[ \t]*:[^\n]*\n(?:[^\n]*\n){0,2}?"
+    r"[ \t]*\**(?:Gesendet|Sent|Datum|Date)\**[ \t]*:",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Gmail, Apple Mail, Thunderbird: "On … wrote:" / "Am … schrieb …:", auch auf
+# zwei Zeilen umbrochen
+ON_WROTE = re.compile(
+    r"^[ \t]*(?:On|Am)[ \t](?:[^\n]{0,200}\b(?:wrote|schrieb)\b[^\n]{0,150}"
+    r"(?:\n[^\n]{0,150})?|[^\n]{0,200}\n[^\n]{0,200}\b(?:wrote|schrieb)\b"
+    r"[^\n]{0,150}):[ \t]*$",
+    re.MULTILINE,
+)
+
+QUOTED_LINE = re.compile(r"^[ \t]*>[^\n]*(?:\n|$)", re.MULTILINE)
+
+# Signatur-Trenner nach RFC 3676
+SIGNATURE_DELIMITER = re.compile(r"^-- ?$", re.MULTILINE)
+
+# Pflichtangaben und Haftungsausschlüsse (nur am Mail-Ende gesucht); mehrdeutige
+# Wörter wie "Geschäftsführer" zählen nur in der Form "Geschäftsführer: …"
+LEGAL_LINE = re.compile(
+    r"(?:\b(?:Geschäftsführer(?:in)?|Geschäftsführung|Managing Directors?|Vorstand"
+    r"|Aufsichtsratsvorsitzende[r]?)[ \t]*:"
+    r"|\b(?:Amtsgericht|Registergericht|Handelsregister|Sitz der Gesellschaft"
+    r"|Registered office|Company registration)\b"
+    r"|\b(?:HRB|HRA)[ \t]*\d"
+    r"|\b(?:USt|Ust)\.?-?Id(?:Nr)?\b|\bSteuer-?Nr\b|\bVAT (?:ID|No)\b"
+    r"|\bDiese (?:E-?Mail|Nachricht) (?:enthält|ist|kann) (?:vertraulich|rechtlich)"
+    r"|\bThis (?:e-?mail|message) (?:and any attachments )?"
+    r"(?:is|contains|may contain) (?:confidential|privileged)|\bDisclaimer\b)",
+    re.IGNORECASE,
+)
+LEGAL_TAIL_LINES = 20
+
+
+@register_stripper("reply_marker")
+def strip_reply_marker(text):
+    return _cut_at(REPLY_MARKER, text)
+
+
+@register_stripper("header_block")
+def strip_header_block(text):
+    return _cut_at(HEADER_BLOCK, text)
+
+
+@register_stripper("on_wrote")
+def strip_on_wrote(text):
+    return _cut_at(ON_WROTE, text)
+
+
+@register_stripper("quoted")
+def strip_quoted(text):
+    stripped = QUOTED_LINE.sub("", text)
+    return stripped if stripped.strip() else text
+
+
+@register_stripper("signature_delimiter")
+def strip_signature_delimiter(text):
+    return _cut_at(SIGNATURE_DELIMITER, text)
+
+
+@register_stripper("legal_signature")
+def strip_legal_signature(text):
+    """Entfernt Pflichtangaben/Disclaimer in den letzten ``LEGAL_TAIL_LINES`` Zeilen."""
+    lines = text.rstrip().split("\n")
+    first_tail = max(0, len(lines) - LEGAL_TAIL_LINES)
+    for i in range(first_tail, len(lines)):
+        if LEGAL_LINE.search(lines[i]) and "\n".join(lines[:i]).strip():
+            return "\n".join(lines[:i])
+    return text
+
+
+def active_strippers(names=None):
+    """Namen der zu verwendenden Stripper (Standard: ``MDZ_BODY_STRIPPERS`` oder alle)."""
+    if names is None:
+        names = BODY_STRIPPERS or list(STRIPPERS)
+    return [name for name in names if name in STRIPPERS]
+
+
+def strip_body(text, names=None):
+    """Wendet die Stripper nacheinander an.
+
+    Gibt (bereinigter Text, {Stripper: entfernte Zeichen}) zurück; Stripper,
+    die nichts entfernt haben, fehlen im Dict.
+    """
+    removed = {}
+    for name in active_strippers(names):
+        stripped = STRIPPERS[name](text)
+        if len(stripped) < len(text):
+            removed[name] = len(text) - len(stripped)
+        text = stripped
+    return text, removed
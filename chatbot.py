@@ -0,0 +1,138 @@
+import glob
+import json
+import os
+import time
+
+from config import CHATBOT_TOP_K, JSON_PROFILE_FOLDER, MODEL
+from llm_client import get_client
+from mail_index import search_mails
+from metrics import ollama_durations, record_metric
+from prompt_compaction import compact_json
+from profile_search import select_profiles
+
+SYSTEM_PROMPT = """Du bist ein Kundenservice-Assistent.
+Antworte auf Basis der mitgelieferten Kundenprofile und Email-Auszüge.
+Wenn die Frage zu einem bestimmten Unternehmen gehört, beantworte sie mit Bezug auf dieses Profil.
+Wenn keine Information vorhanden ist, sage: 'Das weiß ich leider nicht'. """
+
+
+# 🧪 Beispielfragen (Chatbot und Vorab-Beantwortung nach Profil-Aktualisierung)
+SAMPLE_QUESTIONS = [
+    "An welchen Produkten hat Herr Vogt Interesse gezeigt?",
+    "Gehören Frau Klein und Herr Reuter zum selben Unternehmen?",
+    "Wie viele Produkte hat Mueller Maschinenbau bisher bei uns bestellt?",
+    "Welcher Kunde wartet noch auf eine Rückmeldung von uns?",
+    "Hat Frau Klein Interesse am Predictive Maintenance Plus Paket?",
+    "Welche Firma hat einen Care Basic Wartungsvertrag?",
+]
+
+
+def read_profiles(folder=JSON_PROFILE_FOLDER):
+    """Liest alle Kundenprofile (Schlüssel: ``company_name``).
+
+    Gibt ``(profiles, errors)`` zurück; ``errors`` enthält (Pfad, Fehler)
+    für Dateien, die nicht gelesen werden konnten.
+    """
+    profiles, errors = {}, []
+    for filepath in glob.glob(os.path.join(folder, "*.json")):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                profile = data[0] if isinstance(data, list) and len(data) > 0 else data
+                company_name = profile.get("company_name", os.path.basename(filepath))
+                profiles[company_name] = profile
+        except Exception as e:
+            errors.append((filepath, e))
+    return profiles, errors
+
+
+def format_passages(passages):
+    """Mail-Passagen als Prompt-Abschnitt (Firma, Datum, Betreff, Text)."""
+    return "\n\n".join(
+        f"[{p['company']} | {p.get('date') or '?'} | {p['subject']}]\n{p['text']}"
+        for p in passages
+    )
+
+
+def build_chat_messages(
+    query, all_profiles, index=None, k=CHATBOT_TOP_K, passages=None
+):
+    """Baut System- und User-Prompt mit den relevantesten Profilen.
+
+    ``passages`` (aus ``search_mails``) werden als Email-Auszüge angehängt.
+    """
+    relevant_profiles = select_profiles(query, all_profiles, index=index, k=k)
+
+    user_prompt = f"""
+Frage: {query}
+
+Hier sind die relevanten Kundenprofile:
+{compact_json(relevant_profiles)}
+"""
+    if passages:
+        user_prompt += f"""
+Passende Auszüge aus den Emails:
+{format_passages(passages)}
+"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def ask(query, all_profiles, index=None, mail_index=None):
+    """Beantwortet eine Frage anhand der relevantesten Profile (blockierend).
+
+    Dazu kommen die passendsten Mail-Passagen aus ``mail_index`` (ohne
+    Angabe: der gespeicherte Index).
+    """
+    passages = search_mails(query, mail_index)
+    messages = build_chat_messages(query, all_profiles, index=index, passages=passages)
+    start = time.perf_counter()
+    response = get_client().chat(model=MODEL, messages=messages)
+    record_metric(
+        "llm_call",
+        purpose="chat",
+        key=query,
+        prompt_chars=sum(len(m["content"]) for m in messages),
+        prompt_tokens=response.get("prompt_eval_count") or 0,
+        completion_tokens=response.get("eval_count") or 0,
+        seconds=time.perf_counter() - start,
+        **ollama_durations(response),
+    )
+    return response["message"]["content"]
+
+
+def ask_stream(query, all_profiles, timings, index=None, mail_index=None):
+    """Wie ``ask``, liefert die Antwort aber stückweise, sobald sie entsteht.
+
+    In ``timings`` werden ``ttft`` (Zeit bis zum ersten Token) und ``total``
+    (Gesamtdauer) in Sekunden eingetragen – auch bei Abbruch – sowie die von
+    Ollama gemeldeten ``prompt_tokens``/``completion_tokens``, deren Dauern
+    und die Prompt-Länge ``prompt_chars``; ``search_s`` ist die Dauer der
+    Suche nach Mail-Passagen (vor dem LLM-Aufruf).
+    """
+    search_start = time.perf_counter()
+    passages = search_mails(query, mail_index)
+    timings["search_s"] = time.perf_counter() - search_start
+    timings["passages"] = len(passages)
+    messages = build_chat_messages(query, all_profiles, index=index, passages=passages)
+    timings["prompt_chars"] = sum(len(m["content"]) for m in messages)
+    start = time.perf_counter()
+    stream = get_client().chat(model=MODEL, messages=messages, stream=True)
+    try:
+        for chunk in stream:
+            if chunk.get("done"):
+                timings["prompt_tokens"] = chunk.get("prompt_eval_count") or 0
+                timings["completion_tokens"] = chunk.get("eval_count") or 0
+                timings.update(ollama_durations(chunk))
+            text = chunk["message"]["content"]
+            if not text:
+                continue
+            if "ttft" not in timings:
+                timings["ttft"] = time.perf_counter() - start
+            yield text
+    finally:
+        timings["total"] = time.perf_counter() - start
+        # Verbindung zu Ollama schließen, damit die Generierung dort endet
+        stream.close()
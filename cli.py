@@ -0,0 +1,248 @@
+"""Kommandozeile für Einlesen, Profil-Erzeugung und Fragen ohne Streamlit.
+
+Beispiele::
+
+    python cli.py ingest
+    python cli.py index                # Mail-Passagen für den Chatbot einbetten
+    python cli.py profile --force
+    python cli.py profile --queue      # als Hintergrund-Job, siehe "worker"
+    python cli.py worker --idle-exit 60
+    python cli.py ask "Welche Firma hat einen Care Basic Wartungsvertrag?"
+    MDZ_STORAGE=sqlite python cli.py search "Wartungsvertrag"
+    python cli.py search --semantic "Lieferung verzögert sich"
+
+Jeder Befehl gibt ein JSON-Objekt (inkl. ``seconds``) auf stdout aus,
+Fortschritt und Fehler gehen nach stderr. ``ollama`` und ``streamlit``
+werden nur geladen, wenn ein Befehl sie braucht.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from config import EML_MAIL_FOLDER, JSON_MAIL_FOLDER, LLM_MAX_CONCURRENCY
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def cmd_ingest(args):
+    from mail_ingest import ingest_eml_folder
+    from mail_store import open_store
+
+    stats = ingest_eml_folder(
+        args.source, args.output, workers=args.workers, store=open_store()
+    )
+    for company, count in stats["written"].items():
+        _log(f"{count} Mail(s) verarbeitet für '{company}'")
+    return stats, 0
+
+
+def cmd_profile(args):
+    if args.queue:
+        from jobs import JobQueue, ensure_worker
+
+        queue = JobQueue()
+        job = queue.enqueue("refresh_profiles", {"force": args.force, "prewarm": False})
+        started = ensure_worker(queue)
+        return {"job": job["id"], "status": job["status"], "worker_started": started}, 0
+
+    from mail_store import open_store
+    from profile_generation import refresh_profiles
+
+    def on_result(result, output_file, done, total):
+        if result["profile"] is None:
+            status = f"FEHLER ({result['error']})"
+        elif not result["ok"]:
+            status = (
+                "Rohtext gespeichert"
+                if output_file
+                else "Rohtext verworfen, altes Profil bleibt"
+            )
+        else:
+            status = "ok (Delta)" if result["mode"] == "delta" else "ok"
+        _log(f"[{done}/{total}] {result['key']}: {status} ({result['seconds']:.1f}s)")
+
+    def on_load_error(filename, e):
+        _log(f"Fehler beim Laden von {filename}: {e}")
+
+    summary = refresh_profiles(
+        force=args.force,
+        on_result=on_result,
+        on_load_error=on_load_error,
+        store=open_store(),
+        max_concurrency=args.concurrency,
+    )
+    summary["results"] = [
+        {k: v for k, v in r.items() if k != "profile"} for r in summary["results"]
+    ]
+    return summary, 1 if summary["failed"] else 0
+
+
+def cmd_ask(args):
+    from answer_cache import AnswerCache, profile_set_fingerprint
+    from chatbot import ask, read_profiles
+    from mail_store import open_store
+
+    store = open_store()
+    profiles, errors = (store.profiles(), []) if store else read_profiles()
+    for filepath, e in errors:
+        _log(f"Fehler beim Laden von {filepath}: {e}")
+    if not profiles:
+        _log("Keine Profile gefunden – zuerst 'profile' ausführen.")
+        return {"question": args.question, "answer": None}, 1
+
+    cache = None if args.no_cache else AnswerCache()
+    fingerprint = profile_set_fingerprint() if cache is not None else None
+    answer = cache.get(args.question, fingerprint) if cache is not None else None
+    cached = answer is not None
+    if not cached:
+        answer = ask(args.question, profiles)
+        if cache is not None:
+            cache.put(args.question, fingerprint, answer)
+    return {"question": args.question, "answer": answer, "cached": cached}, 0
+
+
+def cmd_index(args):
+    if args.queue:
+        from jobs import JobQueue, ensure_worker
+
+        queue = JobQueue()
+        job = queue.enqueue("update_mail_index")
+        started = ensure_worker(queue)
+        return {"job": job["id"], "status": job["status"], "worker_started": started}, 0
+
+    from mail_index import MailIndex
+
+    def on_progress(done, total):
+        _log(f"[{done}/{total}] Passagen eingebettet")
+
+    return MailIndex().update(on_progress=on_progress), 0
+
+
+def cmd_worker(args):
+    from jobs import run_worker
+
+    _log(f"Worker gestartet (PID {os.getpid()})")
+    return {"jobs": run_worker(idle_exit=args.idle_exit)}, 0
+
+
+def cmd_jobs(args):
+    from jobs import JobQueue
+
+    jobs = JobQueue().jobs(limit=args.limit)
+    for job in jobs:
+        job.pop("result")
+    return {"jobs": jobs}, 0
+
+
+def cmd_search(args):
+    if args.semantic:
+        from mail_index import MailIndex, search_mails
+
+        index = MailIndex()
+        if not len(index):
+            _log("Mail-Index ist leer – zuerst 'index' ausführen.")
+            return {"query": args.query, "hits": []}, 1
+        # Mit Firmenfilter alle Passagen ranken, dann filtern
+        hits = search_mails(
+            args.query, index, k=len(index) if args.company else args.limit
+        )
+        if args.company:
+            hits = [h for h in hits if h["company"] == args.company][: args.limit]
+        return {"query": args.query, "hits": hits}, 0
+
+    from mail_store import open_store
+
+    store = open_store()
+    if store is None:
+        _log("Volltextsuche benötigt MDZ_STORAGE=sqlite.")
+        return {"query": args.query, "hits": []}, 1
+    hits = store.search(args.query, company=args.company, limit=args.limit)
+    return {"query": args.query, "hits": hits}, 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Emails2Profile ohne Weboberfläche"
+    )
+    parser.add_argument(
+        "--indent", type=int, default=None, help="JSON-Ausgabe einrücken"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help=".eml-Dateien einlesen und Email-JSON erzeugen")
+    p.add_argument("--source", default=EML_MAIL_FOLDER, help="Ordner mit .eml")
+    p.add_argument("--output", default=JSON_MAIL_FOLDER, help="Ausgabeordner")
+    p.add_argument(
+        "--workers", type=int, default=None, help="Parser-Prozesse (0 = alle Kerne)"
+    )
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("profile", help="geänderte Kundenprofile neu erzeugen")
+    p.add_argument("--force", action="store_true", help="alle Profile neu erzeugen")
+    p.add_argument(
+        "--queue", action="store_true", help="als Job an den Hintergrund-Worker geben"
+    )
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=LLM_MAX_CONCURRENCY,
+        help="parallele LLM-Anfragen",
+    )
+    p.set_defaults(func=cmd_profile)
+
+    p = sub.add_parser("ask", help="Frage an den Chatbot stellen")
+    p.add_argument("question")
+    p.add_argument("--no-cache", action="store_true", help="Antwort-Cache umgehen")
+    p.set_defaults(func=cmd_ask)
+
+    p = sub.add_parser("index", help="Mail-Passagen einbetten (Index für den Chatbot)")
+    p.add_argument(
+        "--queue", action="store_true", help="als Job an den Hintergrund-Worker geben"
+    )
+    p.set_defaults(func=cmd_index)
+
+    p = sub.add_parser("worker", help="Jobs der Warteschlange abarbeiten")
+    p.add_argument(
+        "--idle-exit",
+        type=float,
+        default=None,
+        help="nach so vielen Sekunden ohne Job beenden (Standard: nie)",
+    )
+    p.set_defaults(func=cmd_worker)
+
+    p = sub.add_parser("jobs", help="Status der letzten Jobs")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_jobs)
+
+    p = sub.add_parser("search", help="Volltextsuche in Mails (nur SQLite)")
+    p.add_argument("query")
+    p.add_argument(
+        "--semantic", action="store_true", help="ähnliche Passagen im Mail-Index suchen"
+    )
+    p.add_argument("--company", default=None, help="nur Mails dieser Firma")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_search)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        result, code = args.func(args)
+    except Exception as e:
+        result, code = {"error": str(e) or type(e).__name__}, 2
+    result = {"command": args.command, **result}
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    print(json.dumps(result, ensure_ascii=False, indent=args.indent, default=str))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from config import COMPANY_ALIAS_FILE, MY_DOMAINS
+
+# -------------------------------
+# Eigene Domains
+# -------------------------------
+
+_OWN_DOMAINS = frozenset(d.lower() for d in MY_DOMAINS)
+
+
+def is_own_domain(domain):
+    """True für eine eigene Domain oder eine ihrer Subdomains."""
+    labels = domain.lower().split(".")
+    return any(".".join(labels[i:]) in _OWN_DOMAINS for i in range(len(labels)))
+
+
+# -------------------------------
+# Alias-Index: Domain / Firmenname → Schlüssel der Email-JSON
+# -------------------------------
+
+# Rechtsformen und Füllwörter, die beim Vergleich von Firmennamen wegfallen
+LEGAL_FORM_TOKENS = frozenset(
+    "gmbh mbh ag kg kgaa ug haftungsbeschraenkt ohg gbr se ev eg co und "
+    "inc ltd llc corp plc sa sarl bv nv".split()
+)
+
+_TRANSLITERATION = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def alias_key(name):
+    """Normalisierter Firmenname: klein, ohne Umlaute, Satzzeichen und Rechtsform.
+
+    "Technomech GmbH & Co. KG", "technomech-gmbh" und "Technomech" ergeben
+    denselben Schlüssel.
+    """
+    tokens = _TOKEN.findall(str(name).lower().translate(_TRANSLITERATION))
+    kept = [t for t in tokens if t not in LEGAL_FORM_TOKENS]
+    return "-".join(kept or tokens)
+
+
+def domain_aliases(domain):
+    """Aliase einer Domain: vollständig und ohne Top-Level-Domain."""
+    domain = domain.lower()
+    aliases = [domain]
+    if "." in domain:
+        aliases.append(domain.rsplit(".", 1)[0])
+    return aliases
+
+
+class CompanyAliasIndex:
+    """Bildet Domains und Firmennamen auf den Schlüssel der Email-JSON ab.
+
+    Domain-Aliase entstehen beim Einlesen, Namen (``company_name`` der
+    Profile) beim Erzeugen der Profile; Domains haben Vorrang. Die Suche
+    ist ein einzelner Dict-Zugriff auf den normalisierten Namen.
+
+    Einlesen (Streamlit) und Profil-Worker schreiben dieselbe Datei; daher
+    merkt sich der Index seine Änderungen und ``save`` spielt sie unter
+    einer Dateisperre auf den aktuellen Dateistand ein.
+    """
+
+    def __init__(self, domains=None, names=None):
+        self.domains = dict(domains or {})
+        self.names = dict(names or {})
+        self._changes = []
+
+    def set_companies(self, companies):
+        """Setzt die Domain-Aliase neu: ``{domain: schlüssel}``.
+
+        Namens-Aliase von Schlüsseln, die es nicht mehr gibt, fallen weg.
+        """
+        self._changes.append(("set_companies", dict(companies)))
+        self._set_companies(companies)
+
+    def _set_companies(self, companies):
+        self.domains = {}
+        for domain, key in companies.items():
+            for alias in [key, *domain_aliases(domain)]:
+                self.domains.setdefault(alias_key(alias), key)
+        keys = set(companies.values())
+        self.names = {a: k for a, k in self.names.items() if k in keys}
+
+    def add_name(self, name, key):
+        """Merkt sich einen Firmennamen (z. B. vom LLM) für ``key``."""
+        if name:
+            self._changes.append(("add_name", name, key))
+            self.names[alias_key(name)] = key
+
+    def resolve(self, name):
+        """Schlüssel der Email-JSON zu Domain/Firmenname oder ``None``."""
+        alias = alias_key(name)
+        return self.domains.get(alias) or self.names.get(alias)
+
+    @classmethod
+    def load(cls, path=COMPANY_ALIAS_FILE):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls(data.get("domains"), data.get("names"))
+
+    def save(self, path=COMPANY_ALIAS_FILE):
+        """Spielt die eigenen Änderungen auf den Dateistand ein und schreibt atomar.
+
+        Aliase, die ein anderer Prozess seit dem Laden gespeichert hat,
+        bleiben so erhalten.
+        """
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with file_lock(path + ".lock"):
+            current = CompanyAliasIndex.load(path)
+            for change in self._changes:
+                if change[0] == "set_companies":
+                    current._set_companies(change[1])
+                    continue
+                # von einem anderen Prozess entfernte Firmen nicht zurückholen
+                keys = set(current.domains.values())
+                if not keys or change[2] in keys:
+                    current.names[alias_key(change[1])] = change[2]
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {"domains": current.domains, "names": current.names},
+                        f,
+                        indent=1,
+                        ensure_ascii=False,
+                    )
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        self.domains, self.names, self._changes = current.domains, current.names, []
+
+
+@contextmanager
+def file_lock(lock_path, poll_seconds=0.05):
+    """Exklusive Sperre über eine Lock-Datei (auch zwischen Prozessen)."""
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(poll_seconds)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,120 @@
+import os
+
+# =====================================
+# ⚙️ Gemeinsame Konfiguration
+# =====================================
+
+UPLOAD_FOLDER = "data"
+EML_MAIL_FOLDER = UPLOAD_FOLDER + "/emails/eml"
+JSON_MAIL_FOLDER = UPLOAD_FOLDER + "/emails/json"
+JSON_PROFILE_FOLDER = UPLOAD_FOLDER + "/profiles/json"
+
+# Fingerprints der Profil-Eingaben (bewusst außerhalb von JSON_PROFILE_FOLDER)
+PROFILE_FINGERPRINT_FILE = UPLOAD_FOLDER + "/profiles/fingerprints.json"
+# Je Profil: berücksichtigte Mails (Digests) und Anzahl Delta-Aktualisierungen
+PROFILE_DELTA_STATE_FILE = UPLOAD_FOLDER + "/profiles/delta_state.json"
+# Teilprofile (Map-Schritt) je Block-Hash
+PROFILE_CHUNK_CACHE_FOLDER = UPLOAD_FOLDER + "/profiles/chunks"
+
+# Antwort-Cache des Chatbots (LRU, bleibt über Neustarts erhalten)
+ANSWER_CACHE_FILE = UPLOAD_FOLDER + "/chat/answer_cache.json"
+ANSWER_CACHE_SIZE = int(os.environ.get("MDZ_ANSWER_CACHE_SIZE", "500"))
+
+# Messwerte (JSON-Zeilen) je Verarbeitungsstufe, z. B. Parsen, LLM, Seitenaufbau
+METRICS_FILE = UPLOAD_FOLDER + "/metrics/metrics.jsonl"
+METRICS_ENABLED = os.environ.get("MDZ_METRICS", "1") != "0"
+METRICS_MAX_BYTES = 20 * 1024 * 1024
+# Seite "Performance" mit p50/p95 je Stufe in der Navigation anzeigen
+SHOW_METRICS_PAGE = os.environ.get("MDZ_METRICS_PAGE", "0") == "1"
+
+# Manifest der bereits eingelesenen .eml-Dateien (Pfad, Größe, mtime, Digest)
+MAIL_MANIFEST_FILE = UPLOAD_FOLDER + "/emails/manifest.json"
+# Cache der geparsten Mails (nur bei Änderungen geladen)
+MAIL_PARSE_CACHE_FILE = UPLOAD_FOLDER + "/emails/parsed_cache.json"
+
+# Speicher: "json" (nur Dateien) oder "sqlite" (zusätzlich Mails, Kontakte und
+# Profile als Zeilen mit Volltextindex in SQLITE_DB_FILE)
+STORAGE_BACKEND = os.environ.get("MDZ_STORAGE", "json").lower()
+SQLITE_DB_FILE = UPLOAD_FOLDER + "/mdz.sqlite3"
+
+# Maximale Größe des dekodierten Mail-Texts je Mail (Rest wird abgeschnitten)
+MAIL_BODY_MAX_BYTES = int(os.environ.get("MDZ_MAIL_BODY_MAX_BYTES", str(256 * 1024)))
+
+# Duplikaterkennung: ab dieser Ähnlichkeit (Jaccard über Wort-Shingles, 0–1)
+# gilt eine Mail als fast gleich (z. B. Weiterleitung); 1 = nur exakte Duplikate
+DEDUP_THRESHOLD = float(os.environ.get("MDZ_DEDUP_THRESHOLD", "0.7"))
+# MinHash-Fingerprints der Mail-Texte (Schlüssel: Digest des normalisierten Texts)
+DEDUP_FINGERPRINT_FILE = UPLOAD_FOLDER + "/emails/dedup_fingerprints.json"
+
+# Stripper für Antwort-Ketten/Signaturen, kommagetrennt (leer = alle, siehe body_cleaning.py)
+BODY_STRIPPERS = [
+    name.strip()
+    for name in os.environ.get("MDZ_BODY_STRIPPERS", "").split(",")
+    if name.strip()
+]
+
+# Alias-Index: Domains und Firmennamen → Schlüssel der Email-JSON
+COMPANY_ALIAS_FILE = UPLOAD_FOLDER + "/emails/company_aliases.json"
+
+# Anzahl Prozesse für das Parsen der .eml-Dateien (0 = alle CPU-Kerne)
+INGEST_WORKERS = int(os.environ.get("MDZ_INGEST_WORKERS", "0"))
+
+
+# Zu verwendendes LLM-Modell als globale Variable definieren
+MODEL = "gemma3:12b"
+
+# Nebenläufige LLM-Anfragen (sinnvoll bis OLLAMA_NUM_PARALLEL des Servers)
+LLM_MAX_CONCURRENCY = int(os.environ.get("MDZ_LLM_CONCURRENCY", "2"))
+# Timeout pro Firma und Wiederholungen mit exponentiellem Backoff
+LLM_TIMEOUT_SECONDS = float(os.environ.get("MDZ_LLM_TIMEOUT", "600"))
+LLM_RETRIES = int(os.environ.get("MDZ_LLM_RETRIES", "2"))
+LLM_BACKOFF_SECONDS = 2.0
+
+# LLM-Backend: "ollama", "record" (Ollama, Anfragen/Antworten werden in
+# LLM_RECORDINGS_FILE aufgezeichnet) oder "replay" (Aufzeichnungen ohne Ollama
+# abspielen, mit simulierter Latenz und begrenzten parallelen Slots)
+LLM_BACKEND = os.environ.get("MDZ_LLM_BACKEND", "ollama").lower()
+LLM_RECORDINGS_FILE = os.environ.get(
+    "MDZ_LLM_RECORDINGS", UPLOAD_FOLDER + "/llm/recordings.jsonl"
+)
+LLM_REPLAY_FIRST_TOKEN_SECONDS = float(os.environ.get("MDZ_REPLAY_FIRST_TOKEN", "0.3"))
+LLM_REPLAY_TOKEN_SECONDS = float(os.environ.get("MDZ_REPLAY_PER_TOKEN", "0.02"))
+LLM_REPLAY_CONCURRENCY = int(os.environ.get("MDZ_REPLAY_CONCURRENCY", "1"))
+
+# Token-Budget je Profil-Prompt; längere Verläufe werden per Map-Reduce verdichtet
+# (sollte zum Kontextfenster des Modells, num_ctx, passen)
+PROFILE_TOKEN_BUDGET = int(os.environ.get("MDZ_PROFILE_TOKEN_BUDGET", "6000"))
+
+# Delta-Aktualisierung: Kommen zu einer Firma nur Mails hinzu, bekommt das LLM das
+# bisherige Profil und nur die neuen Mails. Nach so vielen Deltas (und mit "force")
+# wird das Profil vollständig neu erzeugt; 0 = immer vollständig
+PROFILE_FULL_REBUILD_EVERY = int(os.environ.get("MDZ_PROFILE_FULL_REBUILD_EVERY", "10"))
+
+# Job-Warteschlange für lang laufende Arbeiten (z. B. Profil-Erzeugung im Hintergrund)
+JOB_DB_FILE = UPLOAD_FOLDER + "/jobs/jobs.sqlite3"
+JOB_WORKER_LOG = UPLOAD_FOLDER + "/jobs/worker.log"
+# Ohne Lebenszeichen so lange (Sekunden) gilt ein Job/Worker als abgebrochen
+JOB_STALE_SECONDS = float(os.environ.get("MDZ_JOB_STALE_SECONDS", "60"))
+
+# Profil-Ausgabe per JSON-Schema erzwingen (Ollama "format"); ungültige Antworten
+# werden zuerst lokal repariert, dann je LLM-Aufruf so oft neu angefragt
+PROFILE_STRUCTURED_OUTPUT = os.environ.get("MDZ_STRUCTURED_OUTPUT", "1") != "0"
+PROFILE_PARSE_RETRIES = int(os.environ.get("MDZ_PROFILE_PARSE_RETRIES", "1"))
+
+# Anzahl Kundenprofile, die der Chatbot je Frage als Kontext bekommt
+CHATBOT_TOP_K = int(os.environ.get("MDZ_CHATBOT_TOP_K", "5"))
+
+# Embedding-Index über die bereinigten Mails (Vektoren als Memory-Map + Metadaten);
+# der Chatbot bekommt zusätzlich die passendsten Mail-Passagen (0 = aus)
+MAIL_INDEX_FOLDER = UPLOAD_FOLDER + "/mail_index"
+EMBEDDING_MODEL = os.environ.get("MDZ_EMBEDDING_MODEL", "nomic-embed-text")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("MDZ_EMBEDDING_BATCH_SIZE", "32"))
+# Höchstlänge einer Passage in Zeichen (Mails werden an Absätzen geteilt)
+MAIL_PASSAGE_CHARS = int(os.environ.get("MDZ_MAIL_PASSAGE_CHARS", "800"))
+CHATBOT_PASSAGES = int(os.environ.get("MDZ_CHATBOT_PASSAGES", "4"))
+
+# Mails je Seite im Email-Verlauf eines Kunden
+MAIL_PAGE_SIZE = int(os.environ.get("MDZ_MAIL_PAGE_SIZE", "20"))
+
+# Eigene Domains (für Erkennung von Antwort-Mails)
+MY_DOMAINS = ["innovatek-solutions.de"]
@@ -1,173 +1,55 @@
 import streamlit as st
 import json
 import glob
+import hashlib
 import os
 from datetime import datetime
-import ollama
-import email
-from email.header import decode_header
-from email.utils import parsedate_to_datetime, parseaddr, getaddresses
-from collections import defaultdict
 import subprocess
-import re
-import difflib
+import time
+
+from answer_cache import AnswerCache, profile_set_fingerprint
+from chatbot import SAMPLE_QUESTIONS, ask, ask_stream, read_profiles
+from company_aliases import CompanyAliasIndex
+from config import (
+    COMPANY_ALIAS_FILE,
+    UPLOAD_FOLDER,
+    EML_MAIL_FOLDER,
+    JSON_MAIL_FOLDER,
+    JSON_PROFILE_FOLDER,
+    JOB_STALE_SECONDS,
+    MAIL_PAGE_SIZE,
+    MY_DOMAINS,
+    SHOW_METRICS_PAGE,
+)
+from jobs import JobQueue, ensure_worker
+from mail_index import MailIndex, index_signature
+from mail_ingest import ingest_eml_folder
+from mail_store import open_store
+from metrics import read_metrics, record_metric, summarize_metrics, timed
+from profile_search import ProfileIndex, find_best_key
+
+# ⏱️ Startzeitpunkt dieses Skriptdurchlaufs (für die Messung "page_render")
+page_start = time.perf_counter()
 
 
 # =====================================
 # ⚡ Globale Initialisierung: Profile
 # =====================================
 
-UPLOAD_FOLDER = "data"
-EML_MAIL_FOLDER = UPLOAD_FOLDER + "/emails/eml"
-JSON_MAIL_FOLDER = UPLOAD_FOLDER + "/emails/json"
-JSON_PROFILE_FOLDER = UPLOAD_FOLDER + "/profiles/json"
-
-
-# Zu verwendendes LLM-Modell als globale Variable definieren
-MODEL = "gemma3:12b"
-
-# Eigene Domains (für Erkennung von Antwort-Mails)
-MY_DOMAINS = ["innovatek-solutions.de"]
-
 os.makedirs(JSON_PROFILE_FOLDER, exist_ok=True)
 
-# Aktive Unternehmen (Emails vorhanden)
-company_files = glob.glob(os.path.join(JSON_MAIL_FOLDER, "*.json"))
-active_companies = {os.path.splitext(os.path.basename(f))[0] for f in company_files}
-
-# Profiles laden
-profiles = {}
-for profile_path in glob.glob(os.path.join(JSON_PROFILE_FOLDER, "profil_*.json")):
-    profile_name = os.path.splitext(os.path.basename(profile_path))[0].replace(
-        "profil_", ""
-    )
-    if profile_name in active_companies:
-        with open(profile_path, "r", encoding="utf-8") as f:
-            try:
-                profiles[profile_name] = json.load(f)
-            except Exception as e:
-                st.warning(f"⚠️ Fehler beim Laden von {profile_path}: {e}")
-
 
 # -------------------------------
 # Funktionen
 # -------------------------------
 
 
-def clean_body(text):
-    """Reduziert die Email so, dass nur noch die Antwort drauf ist."""
-    marker = "-----Ursprüngliche Nachricht-----"
-    if marker in text:
-        text = text.split(marker)[0]
-    return text.strip()
-
-
-def extract_company(from_email, to_emails):
-    """Bestimmt die Firma anhand der Absender-/Empfänger-Domain."""
-    if not from_email:
-        return "Unbekannt"
-    from_domain = from_email.split("@")[-1].lower()
-
-    if any(from_domain.endswith(my_dom) for my_dom in MY_DOMAINS):
-        if to_emails:
-            return to_emails[0].split("@")[-1].lower()
-        return "Unbekannt"
-    return from_domain
-
-
-def decode_subject(raw_subject):
-    """Dekodiert den Betreff und entfernt fehlerhafte Sonderzeichen."""
-    if not raw_subject:
-        return ""
-    decoded_parts = decode_header(raw_subject)
-    subject = ""
-    for part, enc in decoded_parts:
-        if isinstance(part, bytes):
-            try:
-                subject += part.decode(enc or "utf-8", errors="ignore")
-            except:
-                subject += part.decode("utf-8", errors="ignore")
-        else:
-            subject += part
-    return subject
-
-
 def process_uploaded_emails(company_folder, output_dir):
-    """Verarbeitet alle .eml-Dateien eines Firmenordners und speichert JSON."""
-    emails_data = []
-
-    for filename in os.listdir(company_folder):
-        if filename.lower().endswith(".eml"):
-            filepath = os.path.join(company_folder, filename)
-            with open(filepath, "rb") as f:
-                msg = email.message_from_binary_file(f)
-
-            # Metadaten extrahieren
-            date = parsedate_to_datetime(str(msg["Date"])) if msg["Date"] else None
-            _, sender_email = parseaddr(str(msg["From"]) if msg["From"] else "")
-
-            to_cc = []
-            if msg["To"]:
-                to_cc.extend([addr for _, addr in getaddresses([msg["To"]])])
-            if msg["Cc"]:
-                to_cc.extend([addr for _, addr in getaddresses([msg["Cc"]])])
-
-            subject = decode_subject(msg["Subject"])
-
-            # Body
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        charset = part.get_content_charset() or "utf-8"
-                        body += part.get_payload(decode=True).decode(
-                            charset, errors="ignore"
-                        )
-            else:
-                charset = msg.get_content_charset() or "utf-8"
-                body = msg.get_payload(decode=True).decode(charset, errors="ignore")
-
-            body_clean = clean_body(body)
-
-            emails_data.append(
-                {
-                    "filename": filename,
-                    "date": date.isoformat() if date else None,
-                    "from_email": sender_email,
-                    "to_emails": to_cc,
-                    "subject": subject,
-                    "body": body_clean,
-                }
-            )
-
-    # Sortieren + Duplikate
-    emails_data.sort(key=lambda x: x["date"] or "", reverse=False)
-    unique_emails, seen_bodies = [], set()
-    for mail in emails_data:
-        body_hash = hash(mail["body"])
-        if body_hash not in seen_bodies:
-            seen_bodies.add(body_hash)
-            unique_emails.append(mail)
-
-    # Nach Firma gruppieren
-    profiles = defaultdict(list)
-    for mail in unique_emails:
-        company = extract_company(mail["from_email"], mail["to_emails"])
-        mail_copy = {k: v for k, v in mail.items() if k != "to_emails"}
-        profiles[company].append(mail_copy)
-
-    # 🔧 Sicherstellen, dass der Ausgabeordner existiert
-    os.makedirs(output_dir, exist_ok=True)
-
-    # JSON speichern (nur für diese Firma)
-    for company, mails in profiles.items():
-        safe_name = company.replace(".", "_").replace("@", "_")
-        out_path = os.path.join(output_dir, f"{safe_name}.json")
-        # sicherstellen, dass der Ordner existiert
-        os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(mails, f, indent=2, ensure_ascii=False)
-        st.toast(f"✅ {len(mails)} Mail(s) verarbeitet für '{company}'")
+    """Verarbeitet neue/geänderte .eml-Dateien eines Firmenordners und speichert JSON."""
+    stats = ingest_eml_folder(company_folder, output_dir, store=get_mail_store())
+    for company, count in stats["written"].items():
+        st.toast(f"✅ {count} Mail(s) verarbeitet für '{company}'")
+    return stats
 
 
 # =====================================
@@ -233,62 +115,194 @@ def manage_uploaded_emails(company_folder, output_dir):
         process_uploaded_emails(company_folder, output_dir)
 
 
-# 🔹 Profile laden
-@st.cache_data
-def load_profiles():
-    """Lädt alle Kundenprofile aus JSON."""
-    profiles = {}
-    for filepath in glob.glob(os.path.join(JSON_PROFILE_FOLDER, "*.json")):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                profile = data[0] if isinstance(data, list) and len(data) > 0 else data
-                company_name = profile.get("company_name", os.path.basename(filepath))
-                profiles[company_name] = profile
-        except Exception as e:
-            st.warning(f"⚠️ Fehler beim Laden von {filepath}: {e}")
+def folder_signature(folder, pattern="*.json"):
+    """Hash über Name, Größe und Änderungszeit aller Dateien eines Ordners.
+
+    Dient als Cache-Schlüssel, damit Daten nur nach Dateiänderungen neu
+    geladen werden und nicht bei jedem Rerun (ein kurzer String statt
+    vieler Tupel hält auch das Hashing durch Streamlit billig).
+    """
+    h = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(folder, pattern))):
+        stat = os.stat(path)
+        entry = f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n"
+        h.update(entry.encode("utf-8"))
+    return h.hexdigest()
+
+
+# 🔹 Optionaler SQLite-Speicher (MDZ_STORAGE=sqlite), sonst None
+@st.cache_resource
+def get_mail_store():
+    return open_store()
+
+
+def profile_signature():
+    """Cache-Schlüssel des Profilstands (SQLite-Revision oder Datei-Signatur)."""
+    store = get_mail_store()
+    if store is not None:
+        return f"sqlite:{store.revision()}"
+    return folder_signature(JSON_PROFILE_FOLDER)
+
+
+# 🔹 Profile laden (nur lesend verwenden: wird über alle Reruns geteilt)
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_profiles(signature):
+    """Lädt alle Kundenprofile aus JSON bzw. SQLite."""
+    store = get_mail_store()
+    with timed("load_profiles", backend="sqlite" if store else "json") as m:
+        if store is not None:
+            profiles, errors = store.profiles(), []
+        else:
+            profiles, errors = read_profiles()
+        m["files"] = len(profiles)
+    for filepath, e in errors:
+        st.warning(f"⚠️ Fehler beim Laden von {filepath}: {e}")
     return profiles
 
 
-# 🔹 Emails laden
-@st.cache_data
-def load_emails():
+# 🔹 Emails laden (nur lesend verwenden: wird über alle Reruns geteilt)
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_emails(signature):
     """Lädt alle den gesamten Email Verlauf aus JSON."""
     emails = {}
-    for filepath in glob.glob(os.path.join(JSON_MAIL_FOLDER, "*.json")):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                company = os.path.splitext(os.path.basename(filepath))[0]
-                emails[company] = data
-        except Exception as e:
-            st.warning(f"⚠️ Fehler beim Laden von {filepath}: {e}")
+    with timed("load_emails") as m:
+        for filepath in glob.glob(os.path.join(JSON_MAIL_FOLDER, "*.json")):
+            try:
+                with open(filepath, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    company = os.path.splitext(os.path.basename(filepath))[0]
+                    emails[company] = data
+            except Exception as e:
+                st.warning(f"⚠️ Fehler beim Laden von {filepath}: {e}")
+        m["files"] = len(emails)
     return emails
 
 
-# 🔹 Chatbot-Funktion (alle Profile)
-def chatbot(query, all_profiles):
-    """Chatbot, der Kundenfragen anhand der Profile beantwortet."""
-    system_prompt = """Du bist ein Kundenservice-Assistent.
-Antworte auf Basis aller vorhandenen Kundenprofile.
-Wenn die Frage zu einem bestimmten Unternehmen gehört, beantworte sie mit Bezug auf dieses Profil.
-Wenn keine Information vorhanden ist, sage: 'Das weiß ich leider nicht'. """
-
-    user_prompt = f"""
-Frage: {query}
-
-Hier sind alle Kundenprofile:
-{json.dumps(all_profiles, indent=2, ensure_ascii=False)}
-"""
-
-    response = ollama.chat(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+# 🔹 Email-Verlauf einer Firma, neueste zuerst (einmal je Datenstand sortiert)
+@st.cache_resource(max_entries=32, show_spinner=False)
+def mail_history(signature, company):
+    emails = load_emails(signature)
+    return sorted(
+        emails.get(company, []), key=lambda x: x.get("date") or "", reverse=True
     )
-    return response["message"]["content"]
+
+
+def set_mail_page(state_key, number):
+    st.session_state[state_key] = number
+
+
+# 🔹 Suchindex über die Profile
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_profile_index(signature):
+    """Baut den Suchindex über alle Kundenprofile (neu nur bei Profiländerungen)."""
+    return ProfileIndex(load_profiles(signature))
+
+
+# 🔹 Antwort-Cache (über Sessions und Neustarts hinweg)
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache()
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_profile_set_fingerprint(signature, mail_index_signature):
+    """Fingerprint des Profil- und Index-Stands (neu nur nach Änderungen)."""
+    return profile_set_fingerprint()
+
+
+# 🔹 Embedding-Index über die Mail-Passagen (neu geladen nach jeder Aktualisierung)
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_mail_index(signature):
+    return MailIndex()
+
+
+# 🔹 Alias-Index Firmenname/Domain → Email-Schlüssel (beim Einlesen/Erzeugen gebaut)
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_company_aliases(mtime_ns):
+    return CompanyAliasIndex.load()
+
+
+def company_aliases():
+    try:
+        mtime_ns = os.stat(COMPANY_ALIAS_FILE).st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    return load_company_aliases(mtime_ns)
+
+
+# 🔹 Job-Warteschlange (Profil-Erzeugung läuft in einem eigenen Prozess)
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+
+def enqueue_mail_index_update():
+    """Stellt einen Job für den Mail-Index ein, falls Mails noch fehlen.
+
+    Gibt True zurück, wenn der Index aktualisiert wird (auch durch einen
+    bereits laufenden Job).
+    """
+    changed, removed = load_mail_index(index_signature()).pending()
+    if not changed and not removed:
+        return False
+    queue = get_job_queue()
+    if not queue.jobs("update_mail_index", ("queued", "running"), limit=1):
+        queue.enqueue("update_mail_index")
+    ensure_worker(queue)
+    return True
+
+
+@st.fragment(run_every=2)
+def show_profile_job(job_id):
+    """Zeigt den Stand eines Profil-Jobs; fragt alle 2 s neu ab."""
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        st.session_state.pop("profile_job", None)
+        return
+    if job["status"] in ("queued", "running"):
+        # Worker beendet (z. B. Neustart)? Dann neuen starten, der Job wird fortgesetzt
+        stale = time.time() - (job["heartbeat"] or 0) > JOB_STALE_SECONDS
+        if job["status"] == "queued" or stale:
+            ensure_worker(queue)
+        if job["total"]:
+            st.progress(
+                job["done"] / job["total"],
+                text=f"{job['done']} / {job['total']} Profile erzeugt",
+            )
+        else:
+            message = job["message"] or "Warte auf den Hintergrund-Prozess…"
+            st.info(f"⏳ {message}")
+        return
+    # Fertig: Ergebnis nach dem Neuladen anzeigen, Profile neu laden
+    st.session_state.pop("profile_job", None)
+    st.session_state["profile_job_result"] = job
+    st.cache_data.clear()
+    get_answer_cache.clear()
+    st.rerun()
+
+
+# 🔹 Chatbot-Funktion (relevante Profile)
+def chatbot(query, all_profiles):
+    """Chatbot, der Kundenfragen anhand der relevantesten Profile beantwortet."""
+    index = load_profile_index(profile_signature())
+    mail_index = load_mail_index(index_signature())
+    return ask(query, all_profiles, index=index, mail_index=mail_index)
+
+
+def chatbot_stream(query, all_profiles, timings):
+    """Wie ``chatbot``, liefert die Antwort aber stückweise (siehe ``ask_stream``)."""
+    index = load_profile_index(profile_signature())
+    mail_index = load_mail_index(index_signature())
+    return ask_stream(query, all_profiles, timings, index=index, mail_index=mail_index)
+
+
+def format_timings(timings):
+    if timings.get("cached"):
+        return f"⚡ Aus dem Antwort-Cache ({timings['total'] * 1000:.0f} ms)"
+    ttft = timings.get("ttft")
+    ttft_str = f"{ttft:.1f}s" if ttft is not None else "–"
+    return f"⏱️ Erstes Token nach {ttft_str} · gesamt {timings.get('total', 0):.1f}s"
 
 
 # -------------------------------
@@ -323,7 +337,9 @@ st.markdown(
 )
 
 
-def img64(path: str) -> str:
+@st.cache_data(show_spinner=False)
+def img64(path: str, mtime_ns: int = 0) -> str:
+    """Bild als data-URL (``mtime_ns`` erneuert den Cache bei geänderter Datei)."""
     mime = "image/svg+xml" if path.lower().endswith(".svg") else "image/png"
     data = pathlib.Path(path).read_bytes()
     b64 = base64.b64encode(data).decode()
@@ -331,8 +347,10 @@ def img64(path: str) -> str:
 
 
 # Pfade anpassen (PNG/SVG verwenden!)
-logo_left = img64("Logos/MD_zentrum_hannover_schutzzone_RGB.svg")
-logo_right = img64("Logos/bmwi_logo_de.svg")
+logo_left_path = "Logos/MD_zentrum_hannover_schutzzone_RGB.svg"
+logo_right_path = "Logos/bmwi_logo_de.svg"
+logo_left = img64(logo_left_path, os.stat(logo_left_path).st_mtime_ns)
+logo_right = img64(logo_right_path, os.stat(logo_right_path).st_mtime_ns)
 
 st.markdown(
     f"""
@@ -357,8 +375,8 @@ st.markdown(
 # with col2:
 #     st.image("Logos/bmwi_logo_de.svg", width=150)
 
-profiles = load_profiles()
-emails = load_emails()
+profiles_signature = profile_signature()
+profiles = load_profiles(profiles_signature)
 
 # -------------------------------
 # Sidebar Navigation mit Kacheln
@@ -406,43 +424,54 @@ if st.sidebar.button(
     st.query_params["page"] = "KI-Kundenübersicht"
 if st.sidebar.button("3: 💻 KI-Chatbot", width="stretch"):
     st.query_params["page"] = "KI-Chatbot"
+if SHOW_METRICS_PAGE and st.sidebar.button("⏱️ Performance", width="stretch"):
+    st.query_params["page"] = "Performance"
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("# 👥 Kundenprofile")
 
-# Kacheln für Unternehmen
-for company, profile in profiles.items():
-    contact = profile.get("contacts", [{}])[0]
-    contact_name = contact.get("name", "Kein Kontakt")
-    product_count = len(profile.get("products", []))
-    contact_email = contact.get("email", "Keine Email")
-
-    st.sidebar.markdown(
-        f"""
-        <a href="/?page={company}" target="_self" style="text-decoration:none;">
-            <div style="
-                border:1px solid #ddd;
-                border-radius:10px;
-                padding:10px;
-                margin-bottom:10px;
-                background-color:#f9f9f9;
-                transition: all 0.2s ease-in-out;
-            " onmouseover="this.style.backgroundColor='#eee';" onmouseout="this.style.backgroundColor='#f9f9f9';">
-                <h4 style="margin:0;color:#333;">🏭 {company}</h4>
-                <p style="margin:0;color:#666;font-size:13px;">
-                    👤 {contact_name}
-                </p>
-                <p style="margin:0;color:#666;font-size:12px;">
-                    ✉️ {contact_email}
-                </p>
-                <p style="margin:0;color:#999;font-size:12px;">
-                    📦 {product_count} Produkte
-                </p>
-            </div>
-        </a>
-        """,
-        unsafe_allow_html=True,
-    )
+
+# Kacheln für Unternehmen (HTML nur bei geänderten Profilen neu bauen)
+@st.cache_data(max_entries=2, show_spinner=False)
+def sidebar_tiles_html(signature):
+    tiles = []
+    for company, profile in load_profiles(signature).items():
+        contact = profile.get("contacts", [{}])[0]
+        contact_name = contact.get("name", "Kein Kontakt")
+        product_count = len(profile.get("products", []))
+        contact_email = contact.get("email", "Keine Email")
+
+        tiles.append(
+            f"""
+            <a href="/?page={company}" target="_self" style="text-decoration:none;">
+                <div style="
+                    border:1px solid #ddd;
+                    border-radius:10px;
+                    padding:10px;
+                    margin-bottom:10px;
+                    background-color:#f9f9f9;
+                    transition: all 0.2s ease-in-out;
+                " onmouseover="this.style.backgroundColor='#eee';" onmouseout="this.style.backgroundColor='#f9f9f9';">
+                    <h4 style="margin:0;color:#333;">🏭 {company}</h4>
+                    <p style="margin:0;color:#666;font-size:13px;">
+                        👤 {contact_name}
+                    </p>
+                    <p style="margin:0;color:#666;font-size:12px;">
+                        ✉️ {contact_email}
+                    </p>
+                    <p style="margin:0;color:#999;font-size:12px;">
+                        📦 {product_count} Produkte
+                    </p>
+                </div>
+            </a>
+            """
+        )
+    return "\n".join(tiles)
+
+
+tiles_html = sidebar_tiles_html(profiles_signature)
+if tiles_html:
+    st.sidebar.markdown(tiles_html, unsafe_allow_html=True)
 
 
 # Standard-Firma global setzen
@@ -517,7 +546,22 @@ if page == "Emails verwalten":
 
     # 🚀 Direkt verarbeiten (nur diesen Firmenordner!)
     company_folder = os.path.join(UPLOAD_FOLDER, selected_company)
-    process_uploaded_emails(company_folder, JSON_MAIL_FOLDER)
+    ingest_stats = process_uploaded_emails(company_folder, JSON_MAIL_FOLDER)
+    caption = (
+        f"📨 {ingest_stats['parsed']} Email(s) neu eingelesen, "
+        f"{ingest_stats['reused']} unverändert"
+    )
+    if "duplicates" in ingest_stats:
+        caption += (
+            f", {ingest_stats['duplicates'] + ingest_stats['near_duplicates']} "
+            "(fast) doppelte Email(s) ausgelassen"
+        )
+    st.caption(caption)
+
+    # 🔎 Neue Mails im Hintergrund für den Chatbot einbetten
+    if ingest_stats["written"] or ingest_stats["deleted"]:
+        if enqueue_mail_index_update():
+            st.caption("🔎 Mail-Index wird im Hintergrund aktualisiert.")
     manage_uploaded_emails(company_folder, JSON_MAIL_FOLDER)
 
 
@@ -529,89 +573,63 @@ elif page == "KI-Kundenübersicht":
 
     os.makedirs(JSON_PROFILE_FOLDER, exist_ok=True)
 
-    if st.button("🔄 Kundenprofile aktualisieren"):
-        # 1) Cache leeren, damit keine veralteten Daten verwendet werden
-        try:
-            st.cache_data.clear()
-        except Exception:
-            pass
-
-        # 2) Alte Profile löschen
-        removed_profiles = 0
-        for p in glob.glob(os.path.join(JSON_PROFILE_FOLDER, "*.json")):
-            try:
-                os.remove(p)
-                removed_profiles += 1
-            except Exception:
-                pass
-        if removed_profiles:
-            st.info(f"🗑️ {removed_profiles} bestehende Profil(e) gelöscht")
-
-        # 3) Neue Profile aus vorhandenen Email-JSONs generieren
-        st.info("Starte Verarbeitung der Emails…")
-
-        for filepath in glob.glob(os.path.join(JSON_MAIL_FOLDER, "*.json")):
-            filename = os.path.basename(filepath)
-            output_file = os.path.join(JSON_PROFILE_FOLDER, f"profil_{filename}")
-
-            st.write(f"📥 Verarbeite `{filename}` ...")
-
-            # Emails laden
-            with open(filepath, "r", encoding="utf-8") as f:
-                try:
-                    emails = json.load(f)
-                except Exception as e:
-                    st.error(f"⚠️ Fehler beim Laden von {filename}: {e}")
-                    continue
-
-            # Prompt vorbereiten
-            prompt = f"""
-            Du bekommst eine Liste von Emails im JSON-Format.
-            Erstelle für jede Kundenfirma nur ein Profil.
-
-            Jedes Profil enthält:
-            - Name des Unternehmens
-            - alle eindeutigen Kontakte (Name + Email)
-            - eine Liste der angefragten oder bestellten Produkte
-            - Summary des Email-Verlaufs (max. 8 Sätze). Die Zusammenfassung muss summary heißen.
-
-            Regeln:
-            - Die Kontakte der Firma Innovatek Solutions sollen nicht aufgenommen werden.
-            - Das heißt, eine Kunden-Emailadresse kann nicht auf @innovatek-solutions.de enden.
-            - Gib das Ergebnis ausschließlich als gültiges JSON-Array zurück, ohne Markdown.
-
-            Hier sind die Emails:
-            {json.dumps(emails, ensure_ascii=False, indent=2)}
-            """
+    force_all = st.checkbox(
+        "Alle Profile neu erzeugen",
+        help="Auch Profile neu erzeugen, deren Emails, Prompt und Modell unverändert sind.",
+    )
+    prewarm_answers = st.checkbox(
+        "Beispielfragen vorab beantworten",
+        help="Beantwortet die Beispielfragen des Chatbots direkt nach der "
+        "Aktualisierung und legt die Antworten im Antwort-Cache ab.",
+    )
 
-            # LLM ausführen
-            response = ollama.chat(
-                model=MODEL,
-                messages=[{"role": "user", "content": prompt}],
+    queue = get_job_queue()
+    if st.button("🔄 Kundenprofile aktualisieren"):
+        # Job einstellen: ein Hintergrund-Prozess erzeugt die Profile, damit
+        # Neuladen oder Seitenwechsel die Verarbeitung nicht abbrechen.
+        # Mail-Index zuerst nachziehen: Jobs laufen in Reihenfolge, und die
+        # vorab beantworteten Fragen hängen am Stand des Index
+        enqueue_mail_index_update()
+        job = queue.enqueue(
+            "refresh_profiles", {"force": force_all, "prewarm": prewarm_answers}
+        )
+        ensure_worker(queue)
+        st.session_state["profile_job"] = job["id"]
+
+    # Laufende Aktualisierung anzeigen (auch wenn sie jemand anderes gestartet hat)
+    job_id = st.session_state.get("profile_job")
+    if job_id is None:
+        active = queue.jobs("refresh_profiles", ("queued", "running"), limit=1)
+        job_id = active[0]["id"] if active else None
+    if job_id is not None:
+        show_profile_job(job_id)
+
+    if "profile_job_result" in st.session_state:
+        job = st.session_state.pop("profile_job_result")
+        if job["status"] == "failed":
+            st.error(
+                f"❌ Aktualisierung fehlgeschlagen ({job['error']}), "
+                "bisherige Profile bleiben erhalten."
+            )
+        else:
+            summary = job["result"]
+            for filename, error in summary.get("load_errors", []):
+                st.error(f"⚠️ Fehler beim Laden von {filename}: {error}")
+            for r in summary["results"]:
+                if r["error"]:
+                    st.error(
+                        f"❌ {r['key']}: Profil nach {r['attempts']} Versuch(en) "
+                        f"nicht erzeugt ({r['error']}), altes Profil bleibt erhalten."
+                    )
+                elif not r["ok"]:
+                    st.warning(f"⚠️ JSON-Parsing fehlgeschlagen bei {r['key']}.")
+            if summary["removed"]:
+                st.info(f"🗑️ {summary['removed']} veraltete(s) Profil(e) gelöscht")
+            st.success(
+                f"🎉 Kundenprofile aktualisiert: {summary['regenerated']} neu "
+                f"erzeugt (davon {summary.get('delta_updates', 0)} nur mit neuen "
+                f"Mails), {summary['skipped']} unverändert übersprungen."
             )
-            output_text = response["message"]["content"].strip()
-
-            # Eventuelle ```json``` Tags entfernen
-            cleaned_output = re.sub(r"```json|```", "", output_text).strip()
-
-            # JSON parsen
-            try:
-                kundenprofil = json.loads(cleaned_output)
-            except json.JSONDecodeError:
-                st.warning(
-                    f"⚠️ JSON-Parsing fehlgeschlagen bei {filename}, Rohtext gespeichert."
-                )
-                kundenprofil = {"raw_output": output_text}
-
-            # Speichern
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(kundenprofil, f, indent=2, ensure_ascii=False)
-
-            st.success(f"✅ Profil gespeichert: `{output_file}`")
-
-        st.success("🎉 Alle Kundenprofile wurden aktualisiert!")
-        st.cache_data.clear()
-        st.rerun()
 
     if not profiles:
         st.warning("Keine Profile gefunden.")
@@ -663,58 +681,65 @@ elif page in profiles:
     # --- Email Verlauf ---
     st.markdown("### 📧 Email Verlauf")
 
-    def normalize_key(name: str) -> str:
-        name = (
-            name.lower()
-            .replace("_", "-")
-            .replace(" ", "-")
-            .replace("ä", "ae")
-            .replace("ö", "oe")
-            .replace("ü", "ue")
-            .replace("ß", "ss")
-        )
-        # Firmen-Rechtsformen entfernen
-        for suffix in ["-gmbh", "-mbh", "-ag", "-kg", "-ug", "-inc", "-ltd"]:
-            if name.endswith(suffix):
-                name = name.replace(suffix, "")
-        return name.strip("-")
-
-    def find_best_key(expected: str, keys: list[str]) -> str | None:
-        expected_norm = normalize_key(expected)
-        normalized_keys = {normalize_key(k): k for k in keys}
-
-        # 1️⃣ Direkter exakter Treffer
-        if expected_norm in normalized_keys:
-            return normalized_keys[expected_norm]
-
-        # 2️⃣ Fuzzy-Matching (findet auch Tippfehler oder Teilmatches)
-        best_match = difflib.get_close_matches(
-            expected_norm, normalized_keys.keys(), n=1, cutoff=0.6
-        )
-        if best_match:
-            return normalized_keys[best_match[0]]
-
-        return None
-
     # Erwarteter Key (vom Page-Namen)
     expected_key = page
-    real_key = find_best_key(expected_key, list(emails.keys()))
+    # Mit SQLite nur die Mails dieser Firma abfragen, sonst alle JSONs laden
+    store = get_mail_store()
+    if store is None:
+        mail_signature = folder_signature(JSON_MAIL_FOLDER)
+        emails = load_emails(mail_signature)
+    real_key = company_aliases().resolve(expected_key)
+    if real_key is None:
+        # Noch nicht im Alias-Index (z. B. Profile aus älteren Versionen)
+        mail_keys = list(store.companies()) if store is not None else list(emails)
+        real_key = find_best_key(expected_key, mail_keys)
 
     if real_key is None:
         st.warning(
-            f"❌ Kein Match für '{expected_key}'.\n\n📂 Vorhandene Keys:\n{list(emails.keys())}"
+            f"❌ Kein Match für '{expected_key}'.\n\n📂 Vorhandene Keys:\n{mail_keys}"
         )
-        mails = []
+        total = 0
+    elif store is not None:
+        total = store.mail_count(real_key)
     else:
-        mails = emails.get(real_key, [])
+        history = mail_history(mail_signature, real_key)
+        total = len(history)
 
-    if not mails:
+    if not total:
         st.info("📭 Keine Emails für diesen Kunden vorhanden.")
     else:
-        mails_sorted = sorted(mails, key=lambda x: x.get("date", ""), reverse=True)
+        # 📄 Seitenweise Anzeige: es wird nur die aktuelle Seite geladen/gerendert
+        page_count = (total + MAIL_PAGE_SIZE - 1) // MAIL_PAGE_SIZE
+        state_key = f"mail_page_{real_key}"
+        page_number = min(st.session_state.get(state_key, 0), page_count - 1)
+        offset = page_number * MAIL_PAGE_SIZE
+        if store is not None:
+            mails_page = store.mails_for(real_key, limit=MAIL_PAGE_SIZE, offset=offset)
+        else:
+            mails_page = history[offset : offset + MAIL_PAGE_SIZE]
+
+        if page_count > 1:
+            col_prev, col_info, col_next = st.columns([1, 2, 1])
+            col_prev.button(
+                "◀ Neuere",
+                disabled=page_number == 0,
+                on_click=set_mail_page,
+                args=(state_key, page_number - 1),
+            )
+            col_info.caption(
+                f"Mails {offset + 1}–{offset + len(mails_page)} von {total} "
+                f"(Seite {page_number + 1}/{page_count})"
+            )
+            col_next.button(
+                "Ältere ▶",
+                disabled=page_number >= page_count - 1,
+                on_click=set_mail_page,
+                args=(state_key, page_number + 1),
+            )
+
         my_domains = tuple(d.lower() for d in MY_DOMAINS)
 
-        for mail in mails_sorted:
+        for mail in mails_page:
             date_str = mail.get("date", "")
             try:
                 date_fmt = datetime.fromisoformat(date_str).strftime("%d.%m.%Y %H:%M")
@@ -752,16 +777,9 @@ if page == "KI-Chatbot":
         st.session_state["history"] = []
     if "show_examples" not in st.session_state:
         st.session_state["show_examples"] = False
+    if "answer_timings" not in st.session_state:
+        st.session_state["answer_timings"] = {}
 
-    # 🧪 Beispielfragen
-    sample_questions = [
-        "An welchen Produkten hat Herr Vogt Interesse gezeigt?",
-        "Gehören Frau Klein und Herr Reuter zum selben Unternehmen?",
-        "Wie viele Produkte hat Mueller Maschinenbau bisher bei uns bestellt?",
-        "Welcher Kunde wartet noch auf eine Rückmeldung von uns?",
-        "Hat Frau Klein Interesse am Predictive Maintenance Plus Paket?",
-        "Welche Firma hat einen Care Basic Wartungsvertrag?",
-    ]
 
     # Toggle zum Anzeigen/Ausblendenl
     if st.button("✨ Beispielfragen", use_container_width=False):
@@ -771,30 +789,171 @@ if page == "KI-Chatbot":
     # Buttons nur rendern, wenn sichtbar
     if st.session_state["show_examples"]:
         cols = st.columns(2)
-        for i, q in enumerate(sample_questions):
+        for i, q in enumerate(SAMPLE_QUESTIONS):
             if cols[i % 2].button(q, key=f"ex_{i}", use_container_width=True):
                 st.session_state["queued_prompt"] = q
                 st.rerun()
 
-    # Falls eine Beispielfrage geklickt wurde: wie User-Eingabe verarbeiten
-    if "queued_prompt" in st.session_state:
-        q = st.session_state.pop("queued_prompt")
-        st.session_state["history"].append(("user", q))
-        antwort = chatbot(q, profiles)
-        st.session_state["history"].append(("assistant", antwort))
+    # Abgebrochene Antwort aus dem vorherigen Lauf übernehmen
+    if "pending_answer" in st.session_state:
+        partial = st.session_state.pop("pending_answer")
+        timings = st.session_state.pop("pending_timings", {})
+        timings.setdefault("total", time.perf_counter() - timings.pop("start", 0))
+        record_metric(
+            "chat_answer",
+            ttft_s=timings.get("ttft"),
+            seconds=timings["total"],
+            chars=len(partial),
+            cancelled=True,
+        )
+        if partial:
+            partial += "\n\n"
+        st.session_state["history"].append(("assistant", partial + "_⏹️ Abgebrochen._"))
+        answer_index = len(st.session_state["history"]) - 1
+        st.session_state["answer_timings"][answer_index] = timings
 
     # Chatverlauf anzeigen
-    for role, content in st.session_state["history"]:
+    for i, (role, content) in enumerate(st.session_state["history"]):
         with st.chat_message(role):
             st.markdown(content)
+            if i in st.session_state["answer_timings"]:
+                st.caption(format_timings(st.session_state["answer_timings"][i]))
 
-    # Normale Chat-Eingabe
-    if prompt := st.chat_input("💬 Frage eingeben..."):
+    # Normale Chat-Eingabe oder geklickte Beispielfrage
+    prompt = st.chat_input("💬 Frage eingeben...") or st.session_state.pop(
+        "queued_prompt", None
+    )
+    if prompt:
         st.session_state["history"].append(("user", prompt))
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        antwort = chatbot(prompt, profiles)
+        answer_cache = get_answer_cache()
+        fingerprint = load_profile_set_fingerprint(
+            profile_signature(), index_signature()
+        )
+        start = time.perf_counter()
+        antwort = answer_cache.get(prompt, fingerprint)
+
+        if antwort is not None:
+            # ⚡ Gleiche Frage zum gleichen Profilstand: keine LLM-Anfrage nötig
+            elapsed = time.perf_counter() - start
+            timings = {"ttft": elapsed, "total": elapsed, "cached": True}
+            record_metric(
+                "chat_answer",
+                ttft_s=elapsed,
+                seconds=elapsed,
+                chars=len(antwort),
+                cancelled=False,
+                cached=True,
+            )
+        else:
+            with st.chat_message("assistant"):
+                # Klick löst einen Rerun aus, der das Streaming beendet
+                st.button("⏹️ Antwort abbrechen", key="cancel_answer")
+
+                timings = {"start": start}
+                st.session_state["pending_answer"] = ""
+                st.session_state["pending_timings"] = timings
+
+                def stream_answer():
+                    for text in chatbot_stream(prompt, profiles, timings):
+                        st.session_state["pending_answer"] += text
+                        yield text
+
+                antwort = st.write_stream(stream_answer())
+
+            st.session_state.pop("pending_answer", None)
+            st.session_state.pop("pending_timings", None)
+            timings.pop("start", None)
+            record_metric(
+                "chat_answer",
+                question_chars=len(prompt),
+                ttft_s=timings.get("ttft"),
+                seconds=timings["total"],
+                chars=len(antwort),
+                prompt_chars=timings.get("prompt_chars"),
+                search_s=timings.get("search_s"),
+                passages=timings.get("passages"),
+                prompt_tokens=timings.get("prompt_tokens"),
+                completion_tokens=timings.get("completion_tokens"),
+                load_s=timings.get("load_s"),
+                prompt_eval_s=timings.get("prompt_eval_s"),
+                eval_s=timings.get("eval_s"),
+                cancelled=False,
+                cached=False,
+            )
+            answer_cache.put(prompt, fingerprint, antwort)
+
         st.session_state["history"].append(("assistant", antwort))
-        with st.chat_message("assistant"):
-            st.markdown(antwort)
+        answer_index = len(st.session_state["history"]) - 1
+        st.session_state["answer_timings"][answer_index] = timings
+        st.rerun()
+
+
+# -------------------------------
+# Seite: Performance (nur mit MDZ_METRICS_PAGE=1)
+# -------------------------------
+if page == "Performance" and SHOW_METRICS_PAGE:
+    st.title("⏱️ Performance")
+    st.write("Dauer je Verarbeitungsstufe aus den lokalen Messwerten (in Sekunden).")
+
+    records = read_metrics()
+    if not records:
+        st.info("Noch keine Messwerte vorhanden.")
+    else:
+        st.dataframe(summarize_metrics(records), hide_index=True)
+
+        # Ollama-Zeiten: Modell laden, Prompt verarbeiten, Antwort erzeugen
+        llm_records = [r for r in records if r.get("stage") == "llm_call"]
+        if llm_records:
+            st.subheader("🤖 LLM-Aufrufe")
+            st.dataframe(
+                summarize_metrics(
+                    llm_records,
+                    fields=("load_s", "prompt_eval_s", "eval_s", "seconds"),
+                ),
+                hide_index=True,
+            )
+
+        # Profil-Ausgabe: Anteil gültiger, reparierter und verworfener Antworten
+        parse_records = [r for r in records if r.get("stage") == "profile_parse"]
+        if parse_records:
+            st.subheader("📐 Profil-Ausgabe")
+            total = len(parse_records)
+            counts = {
+                status: sum(1 for r in parse_records if r.get("status") == status)
+                for status in ("valid", "repaired", "invalid")
+            }
+            retries = sum(1 for r in parse_records if r.get("retry"))
+            st.dataframe(
+                [
+                    {"status": status, "count": count, "rate": count / total}
+                    for status, count in counts.items()
+                ]
+                + [{"status": "retry", "count": retries, "rate": retries / total}],
+                hide_index=True,
+            )
+        # Mail-Index: Aufbau (letzte Aktualisierung) und Suchzeiten je Frage
+        index_records = [r for r in records if r.get("stage") == "mail_index"]
+        search_records = [r for r in records if r.get("stage") == "mail_search"]
+        if index_records or search_records:
+            st.subheader("🔎 Mail-Index")
+            if index_records:
+                last = index_records[-1]
+                st.write(
+                    f"Letzte Aktualisierung: {last.get('embedded', 0)} Passage(n) "
+                    f"eingebettet, {last.get('reused', 0)} übernommen, "
+                    f"{last.get('passages', 0)} im Index ({last['seconds']:.1f}s)."
+                )
+            if search_records:
+                st.dataframe(
+                    summarize_metrics(
+                        search_records, fields=("embed_s", "search_s", "seconds")
+                    ),
+                    hide_index=True,
+                )
+        st.caption(f"{len(records)} Messwerte")
+
+
+record_metric("page_render", page=page, seconds=time.perf_counter() - page_start)
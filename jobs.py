@@ -0,0 +1,412 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from config import JOB_DB_FILE, JOB_STALE_SECONDS, JOB_WORKER_LOG
+
+# -------------------------------
+# Persistente Job-Warteschlange (SQLite)
+# -------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    checkpoint TEXT,
+    created REAL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS workers (
+    pid INTEGER PRIMARY KEY,
+    heartbeat REAL
+);
+"""
+
+JOB_COLUMNS = (
+    "id",
+    "kind",
+    "params",
+    "status",
+    "attempts",
+    "done",
+    "total",
+    "message",
+    "result",
+    "error",
+    "checkpoint",
+    "created",
+    "started",
+    "finished",
+    "heartbeat",
+)
+
+# Ein abgebrochener Job wird so oft neu gestartet, danach gilt er als fehlgeschlagen
+MAX_ATTEMPTS = 3
+# Abstand der Lebenszeichen eines laufenden Jobs (Sekunden)
+HEARTBEAT_SECONDS = max(1.0, JOB_STALE_SECONDS / 6)
+
+
+def _job_from_row(row):
+    job = dict(zip(JOB_COLUMNS, row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["checkpoint"] = json.loads(job["checkpoint"]) if job["checkpoint"] else None
+    return job
+
+
+class JobQueue:
+    """Warteschlange mit den Status ``queued`` → ``running`` → ``done``/``failed``.
+
+    Mehrere Prozesse (Oberfläche, CLI, Worker) können gleichzeitig darauf
+    zugreifen. Laufende Jobs senden Lebenszeichen; bleiben diese länger als
+    ``stale_seconds`` aus (Worker beendet, Rechner neu gestartet), wird der
+    Job erneut vergeben.
+    """
+
+    def __init__(self, path=JOB_DB_FILE, stale_seconds=JOB_STALE_SECONDS):
+        self.path = path
+        self.stale_seconds = stale_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    @contextmanager
+    def _connect(self):
+        """Verbindung mit sofort gesperrter Transaktion (atomares Lesen+Schreiben)."""
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def enqueue(self, kind, params=None):
+        """Stellt einen Job ein und gibt ihn zurück.
+
+        Wartet bereits ein Job gleicher Art mit gleichen Parametern, wird
+        dieser zurückgegeben statt einen zweiten anzulegen.
+        """
+        params = json.dumps(params or {}, sort_keys=True)
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND params = ? AND status = 'queued'",
+                (kind, params),
+            ).fetchone()
+            if row:
+                job_id = row[0]
+            else:
+                job_id = db.execute(
+                    "INSERT INTO jobs (kind, params, status, created)"
+                    " VALUES (?, ?, 'queued', ?)",
+                    (kind, params, time.time()),
+                ).lastrowid
+        return self.get(job_id)
+
+    def claim(self):
+        """Übernimmt den ältesten wartenden oder abgebrochenen Job (oder ``None``)."""
+        now = time.time()
+        stale = now - self.stale_seconds
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?,"
+                " error = 'Abgebrochen (zu viele Neustarts)'"
+                " WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (now, stale, MAX_ATTEMPTS),
+            )
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued'"
+                " OR (status = 'running' AND heartbeat < ?) ORDER BY id LIMIT 1",
+                (stale,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " started = ?, heartbeat = ?, error = NULL WHERE id = ?",
+                (now, now, row[0]),
+            )
+        return self.get(row[0])
+
+    def heartbeat(self, job_id, done=None, total=None, message=None, checkpoint=None):
+        """Lebenszeichen eines laufenden Jobs, optional mit Fortschritt.
+
+        ``checkpoint`` (JSON-fähig) bekommt der Job bei einem Neustart zurück.
+        """
+        if checkpoint is not None:
+            checkpoint = json.dumps(checkpoint)
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET heartbeat = ?, done = coalesce(?, done),"
+                " total = coalesce(?, total), message = coalesce(?, message),"
+                " checkpoint = coalesce(?, checkpoint)"
+                " WHERE id = ? AND status = 'running'",
+                (time.time(), done, total, message, checkpoint, job_id),
+            )
+
+    def finish(self, job_id, result=None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'done', finished = ?, result = ? WHERE id = ?",
+                (time.time(), json.dumps(result, default=str), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                (time.time(), str(error), job_id),
+            )
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job_from_row(row) if row else None
+
+    def jobs(self, kind=None, statuses=None, limit=20):
+        """Neueste Jobs zuerst, optional nach Art und Status gefiltert."""
+        sql = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE 1"
+        params = []
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if statuses:
+            sql += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as db:
+            rows = db.execute(sql, params).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    # --- Worker ---
+
+    def worker_heartbeat(self, pid, alive=True):
+        with self._connect() as db:
+            if alive:
+                db.execute(
+                    "INSERT OR REPLACE INTO workers VALUES (?, ?)", (pid, time.time())
+                )
+            else:
+                db.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+    def worker_alive(self):
+        """True, wenn ein Worker in den letzten ``stale_seconds`` aktiv war."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT count(*) FROM workers WHERE heartbeat >= ?",
+                (time.time() - self.stale_seconds,),
+            ).fetchone()
+        return row[0] > 0
+
+
+# -------------------------------
+# Worker
+# -------------------------------
+
+# Job-Art → Funktion(params, progress, checkpoint);
+# progress(done, total, message, checkpoint), checkpoint: Stand vor einem Neustart
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Decorator: registriert die Funktion, die Jobs der Art ``kind`` ausführt."""
+
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+
+    return decorator
+
+
+def run_job(queue, job):
+    """Führt einen übernommenen Job aus; Lebenszeichen kommen aus einem Thread."""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            queue.heartbeat(job["id"])
+            queue.worker_heartbeat(os.getpid())
+
+    def progress(done=None, total=None, message=None, checkpoint=None):
+        queue.heartbeat(job["id"], done, total, message, checkpoint)
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        handler = JOB_HANDLERS.get(job["kind"])
+        if handler is None:
+            raise ValueError(f"Unbekannte Job-Art: {job['kind']}")
+        queue.finish(job["id"], handler(job["params"], progress, job["checkpoint"]))
+    except Exception as e:
+        traceback.print_exc()
+        queue.fail(job["id"], str(e) or type(e).__name__)
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_worker(queue=None, idle_exit=None, poll_seconds=1.0):
+    """Arbeitet die Warteschlange ab.
+
+    Mit ``idle_exit`` (Sekunden) endet der Worker, wenn so lange kein Job
+    vorlag; sonst läuft er bis zum Abbruch. Gibt die Anzahl Jobs zurück.
+    """
+    queue = queue or JobQueue()
+    pid = os.getpid()
+    handled, idle_since = 0, time.monotonic()
+    try:
+        while True:
+            queue.worker_heartbeat(pid)
+            job = queue.claim()
+            if job is not None:
+                print(
+                    f"Job {job['id']} ({job['kind']}), Versuch {job['attempts']}",
+                    file=sys.stderr,
+                    flush=True,
+                )
+                run_job(queue, job)
+                handled += 1
+                idle_since = time.monotonic()
+                continue
+            if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                return handled
+            time.sleep(poll_seconds)
+    finally:
+        queue.worker_heartbeat(pid, alive=False)
+
+
+def ensure_worker(queue=None, idle_exit=60):
+    """Startet einen Worker-Prozess im Hintergrund, falls keiner aktiv ist.
+
+    Der Prozess überlebt Neuladen der Seite und endet nach ``idle_exit``
+    Sekunden ohne Jobs. Gibt True zurück, wenn ein Worker gestartet wurde.
+    """
+    queue = queue or JobQueue()
+    if queue.worker_alive():
+        return False
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+    if os.name == "nt":
+        # Eigene Prozessgruppe ohne Konsole: Strg+C oder Schließen des
+        # Streamlit-Fensters beendet den Worker nicht
+        detach = {
+            "creationflags": subprocess.CREATE_NEW_PROCESS_GROUP
+            | subprocess.DETACHED_PROCESS
+        }
+    else:
+        detach = {"start_new_session": True}
+    os.makedirs(os.path.dirname(JOB_WORKER_LOG) or ".", exist_ok=True)
+    with open(JOB_WORKER_LOG, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, cli, "worker", "--idle-exit", str(idle_exit)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+            **detach,
+        )
+    # sofort als aktiv eintragen, damit parallele Aufrufe keinen zweiten starten
+    queue.worker_heartbeat(process.pid)
+    return True
+
+
+# -------------------------------
+# Job-Arten
+# -------------------------------
+
+
+@job_handler("refresh_profiles")
+def refresh_profiles_job(params, progress, checkpoint):
+    """Aktualisiert die Kundenprofile wie ``refresh_profiles``.
+
+    Erzeugte Profile stehen im Checkpoint (und haben ihren Fingerprint), ein
+    neu gestarteter Job setzt daher bei den noch fehlenden Firmen fort, auch
+    mit ``force``. Anschließend wird der
+    Antwort-Cache auf den neuen Profilstand gebracht (``prewarm``: die
+    Beispielfragen werden vorab beantwortet). Der Profilstand umfasst den
+    Mail-Index, ein ``update_mail_index`` muss daher vorher eingestellt sein.
+    """
+    from answer_cache import AnswerCache, profile_set_fingerprint
+    from chatbot import SAMPLE_QUESTIONS, ask, read_profiles
+    from mail_store import open_store
+    from profile_generation import refresh_profiles
+    from profile_search import ProfileIndex
+
+    store = open_store()
+    progress(message="Profile werden vorbereitet…")
+    load_errors, completed = [], list(checkpoint or [])
+
+    def on_result(result, output_file, done, total):
+        if output_file is not None:
+            completed.append(result["key"])
+        progress(done, total, result["key"], completed)
+
+    def on_load_error(filename, e):
+        load_errors.append((filename, str(e)))
+
+    summary = refresh_profiles(
+        force=params.get("force", False),
+        on_result=on_result,
+        on_load_error=on_load_error,
+        store=store,
+        keep=set(completed),
+    )
+    summary["load_errors"] = load_errors
+    summary["results"] = [
+        {k: v for k, v in r.items() if k != "profile"} for r in summary["results"]
+    ]
+
+    cache = AnswerCache()
+    fingerprint = profile_set_fingerprint()
+    cache.prune(fingerprint)
+    if params.get("prewarm"):
+        progress(message="Beispielfragen werden vorab beantwortet…")
+        profiles = store.profiles() if store else read_profiles()[0]
+        index = ProfileIndex(profiles)
+        for q in SAMPLE_QUESTIONS:
+            if cache.get(q, fingerprint) is None:
+                cache.put(q, fingerprint, ask(q, profiles, index=index))
+    return summary
+
+
+@job_handler("update_mail_index")
+def update_mail_index_job(params, progress, checkpoint):
+    """Bettet neue Mail-Passagen ein (siehe ``MailIndex.update``).
+
+    Bereits eingebettete Passagen sichert der Index selbst zwischen, ein
+    neu gestarteter Job setzt daher dort fort.
+    """
+    from mail_index import MailIndex
+
+    progress(message="Mail-Passagen werden eingebettet…")
+
+    def on_progress(done, total):
+        progress(done, total, "Mail-Passagen eingebettet")
+
+    return MailIndex().update(on_progress=on_progress)
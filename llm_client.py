@@ -0,0 +1,394 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import (
+    LLM_BACKEND,
+    LLM_RECORDINGS_FILE,
+    LLM_REPLAY_CONCURRENCY,
+    LLM_REPLAY_FIRST_TOKEN_SECONDS,
+    LLM_REPLAY_TOKEN_SECONDS,
+)
+
+# -------------------------------
+# Austauschbare LLM-Clients (Ollama, Aufzeichnen, Abspielen)
+# -------------------------------
+
+# Registrierte Backends: Name → Fabrik(host, asynchronous) → Client (chat, embed)
+LLM_BACKENDS = {}
+
+# Felder einer Ollama-Antwort, die aufgezeichnet und abgespielt werden
+RESPONSE_FIELDS = (
+    "model",
+    "done",
+    "done_reason",
+    "prompt_eval_count",
+    "eval_count",
+    "total_duration",
+    "load_duration",
+    "prompt_eval_duration",
+    "eval_duration",
+)
+
+
+class ReplayMissError(LookupError):
+    """Für diese Anfrage gibt es keine Aufzeichnung."""
+
+
+def register_backend(name):
+    """Decorator: registriert eine Fabrik ``(host, asynchronous) -> Client``."""
+
+    def decorator(factory):
+        LLM_BACKENDS[name] = factory
+        return factory
+
+    return decorator
+
+
+# Blockierende Clients je (Backend, Host) werden wiederverwendet (Verbindungen,
+# geladene Aufzeichnungen); asynchrone hängen an ihrer Event-Loop
+_clients = {}
+_clients_lock = threading.RLock()
+
+
+def get_client(host=None, backend=None):
+    """Blockierender Client des konfigurierten Backends (``MDZ_LLM_BACKEND``)."""
+    backend = backend or LLM_BACKEND
+    with _clients_lock:
+        if (backend, host) not in _clients:
+            _clients[backend, host] = LLM_BACKENDS[backend](host, False)
+        return _clients[backend, host]
+
+
+def get_async_client(host=None, backend=None):
+    """Asynchroner Client des konfigurierten Backends (``MDZ_LLM_BACKEND``)."""
+    return LLM_BACKENDS[backend or LLM_BACKEND](host, True)
+
+
+@register_backend("ollama")
+def ollama_client(host, asynchronous):
+    # Erst hier importieren, damit z. B. die CLI ohne ollama schnell startet
+    import ollama
+
+    return ollama.AsyncClient(host=host) if asynchronous else ollama.Client(host=host)
+
+
+# -------------------------------
+# Aufzeichnungen (JSON-Zeilen: Schlüssel, Anfrage, Antwort)
+# -------------------------------
+
+
+def request_key(model, messages, format=None, options=None):
+    """Schlüssel einer Anfrage: Hash über Modell, Nachrichten, Format und Optionen."""
+    payload = json.dumps(
+        [model, messages, format, options], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def response_dict(response, content=None):
+    """Ollama-Antwort (Objekt oder Dict) als einfaches, speicherbares Dict."""
+    data = {field: response.get(field) for field in RESPONSE_FIELDS}
+    message = response.get("message") or {}
+    data["message"] = {
+        "role": message.get("role") or "assistant",
+        "content": message.get("content") if content is None else content,
+    }
+    return data
+
+
+class Recordings:
+    """Aufgezeichnete Antworten je Anfrage-Schlüssel.
+
+    Mehrere Antworten auf dieselbe Anfrage (z. B. Wiederholungen nach
+    ungültiger Ausgabe) werden beim Abspielen der Reihe nach geliefert.
+    """
+
+    def __init__(self, path=LLM_RECORDINGS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses = None
+        self._served = {}
+
+    def append(self, key, request, response):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        line = json.dumps(
+            {"key": key, "request": request, "response": response}, ensure_ascii=False
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _load(self):
+        responses = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    responses.setdefault(entry["key"], []).append(entry["response"])
+        except OSError:
+            pass
+        return responses
+
+    def next_response(self, key):
+        """Nächste Antwort zu ``key`` (danach wieder von vorn)."""
+        with self._lock:
+            if self._responses is None:
+                self._responses = self._load()
+            responses = self._responses.get(key)
+            if not responses:
+                raise ReplayMissError(
+                    f"Keine Aufzeichnung für Anfrage {key[:12]} in {self.path}"
+                )
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            return responses[served % len(responses)]
+
+    def __len__(self):
+        with self._lock:
+            if self._responses is None:
+                self._responses = self._load()
+            return sum(len(r) for r in self._responses.values())
+
+
+_recordings = {}
+
+
+def shared_recordings(path=LLM_RECORDINGS_FILE):
+    """Eine ``Recordings``-Instanz je Datei und Prozess."""
+    with _clients_lock:
+        if path not in _recordings:
+            _recordings[path] = Recordings(path)
+        return _recordings[path]
+
+
+def embed_response_dict(response):
+    """Embedding-Antwort von Ollama als speicherbares Dict."""
+    data = {field: response.get(field) for field in RESPONSE_FIELDS}
+    data["embeddings"] = [list(vector) for vector in response["embeddings"]]
+    return data
+
+
+def _request(model, messages, format, options):
+    request = {"model": model, "messages": messages}
+    if format is not None:
+        request["format"] = format
+    if options is not None:
+        request["options"] = options
+    return request
+
+
+# -------------------------------
+# Aufzeichnen: echtes Ollama, Anfragen und Antworten landen auf der Platte
+# -------------------------------
+
+
+class RecordingClient:
+    def __init__(self, inner, recordings):
+        self.inner = inner
+        self.recordings = recordings
+
+    def chat(self, model, messages, stream=False, format=None, options=None):
+        key = request_key(model, messages, format, options)
+        request = _request(model, messages, format, options)
+        if not stream:
+            response = self.inner.chat(
+                model=model, messages=messages, format=format, options=options
+            )
+            self.recordings.append(key, request, response_dict(response))
+            return response
+        return self._stream(key, request)
+
+    def embed(self, model, input):
+        # Eingabetexte statt Nachrichten: Schlüssel kollidieren nicht mit Chats
+        texts = [input] if isinstance(input, str) else list(input)
+        response = self.inner.embed(model=model, input=texts)
+        self.recordings.append(
+            request_key(model, texts),
+            {"model": model, "input": texts},
+            embed_response_dict(response),
+        )
+        return response
+
+    def _stream(self, key, request):
+        parts = []
+        for chunk in self.inner.chat(stream=True, **request):
+            parts.append(chunk["message"]["content"] or "")
+            if chunk.get("done"):
+                self.recordings.append(
+                    key, request, response_dict(chunk, content="".join(parts))
+                )
+            yield chunk
+
+
+class AsyncRecordingClient(RecordingClient):
+    async def chat(self, model, messages, stream=False, format=None, options=None):
+        if stream:
+            # wie ollama.AsyncClient: await liefert einen asynchronen Iterator
+            return self._stream_async(
+                request_key(model, messages, format, options),
+                _request(model, messages, format, options),
+            )
+        response = await self.inner.chat(
+            model=model, messages=messages, format=format, options=options
+        )
+        self.recordings.append(
+            request_key(model, messages, format, options),
+            _request(model, messages, format, options),
+            response_dict(response),
+        )
+        return response
+
+    async def _stream_async(self, key, request):
+        parts = []
+        async for chunk in await self.inner.chat(stream=True, **request):
+            parts.append(chunk["message"]["content"] or "")
+            if chunk.get("done"):
+                self.recordings.append(
+                    key, request, response_dict(chunk, content="".join(parts))
+                )
+            yield chunk
+
+    async def embed(self, model, input):
+        texts = [input] if isinstance(input, str) else list(input)
+        response = await self.inner.embed(model=model, input=texts)
+        self.recordings.append(
+            request_key(model, texts),
+            {"model": model, "input": texts},
+            embed_response_dict(response),
+        )
+        return response
+
+
+@register_backend("record")
+def recording_client(host, asynchronous):
+    inner = ollama_client(host, asynchronous)
+    recordings = shared_recordings()
+    if asynchronous:
+        return AsyncRecordingClient(inner, recordings)
+    return RecordingClient(inner, recordings)
+
+
+# -------------------------------
+# Abspielen: Aufzeichnungen mit simulierter Latenz und begrenzten Slots
+# -------------------------------
+
+
+def _token_pieces(content):
+    """Teilt den Text in Stücke von etwa einem Token (für Streaming)."""
+    pieces, start = [], 0
+    for i, char in enumerate(content):
+        if char in " \n" and i > start:
+            pieces.append(content[start:i])
+            start = i
+    pieces.append(content[start:])
+    return [p for p in pieces if p]
+
+
+def _completion_tokens(response):
+    return response.get("eval_count") or len(response["message"]["content"]) // 4
+
+
+class ReplayClient:
+    """Spielt Aufzeichnungen ab, ohne Ollama.
+
+    Eine Antwort braucht ``first_token`` Sekunden bis zum ersten Token und
+    ``per_token`` Sekunden je weiterem Token; gleichzeitig laufen höchstens
+    ``concurrency`` Antworten, weitere warten auf einen freien Slot.
+    """
+
+    def __init__(
+        self,
+        recordings,
+        first_token=LLM_REPLAY_FIRST_TOKEN_SECONDS,
+        per_token=LLM_REPLAY_TOKEN_SECONDS,
+        concurrency=LLM_REPLAY_CONCURRENCY,
+    ):
+        self.recordings = recordings
+        self.first_token = first_token
+        self.per_token = per_token
+        self.concurrency = max(1, concurrency)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def _recorded(self, model, messages, format, options):
+        response = dict(
+            self.recordings.next_response(request_key(model, messages, format, options))
+        )
+        response["model"] = response.get("model") or model
+        return response
+
+    def chat(self, model, messages, stream=False, format=None, options=None):
+        response = self._recorded(model, messages, format, options)
+        if stream:
+            return self._stream(response)
+        with self._slots:
+            time.sleep(self.first_token + self.per_token * _completion_tokens(response))
+        return response
+
+    def embed(self, model, input):
+        # Embeddings haben keine Antwort-Tokens: nur die Wartezeit bis zur Antwort
+        texts = [input] if isinstance(input, str) else list(input)
+        response = self.recordings.next_response(request_key(model, texts))
+        with self._slots:
+            time.sleep(self.first_token)
+        return response
+
+    def _stream(self, response):
+        with self._slots:
+            time.sleep(self.first_token)
+            for piece in _token_pieces(response["message"]["content"]):
+                yield {
+                    "message": {"role": "assistant", "content": piece},
+                    "done": False,
+                }
+                time.sleep(self.per_token)
+        final = dict(response)
+        final["message"] = {"role": "assistant", "content": ""}
+        yield final
+
+
+class AsyncReplayClient(ReplayClient):
+    def __init__(self, recordings, **latency):
+        super().__init__(recordings, **latency)
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+    async def chat(self, model, messages, stream=False, format=None, options=None):
+        response = self._recorded(model, messages, format, options)
+        if stream:
+            return self._stream_async(response)
+        async with self._slots:
+            await asyncio.sleep(
+                self.first_token + self.per_token * _completion_tokens(response)
+            )
+        return response
+
+    async def _stream_async(self, response):
+        async with self._slots:
+            await asyncio.sleep(self.first_token)
+            for piece in _token_pieces(response["message"]["content"]):
+                yield {
+                    "message": {"role": "assistant", "content": piece},
+                    "done": False,
+                }
+                await asyncio.sleep(self.per_token)
+        final = dict(response)
+        final["message"] = {"role": "assistant", "content": ""}
+        yield final
+
+    async def embed(self, model, input):
+        texts = [input] if isinstance(input, str) else list(input)
+        response = self.recordings.next_response(request_key(model, texts))
+        async with self._slots:
+            await asyncio.sleep(self.first_token)
+        return response
+
+
+@register_backend("replay")
+def replay_client(host, asynchronous):
+    recordings = shared_recordings()
+    return AsyncReplayClient(recordings) if asynchronous else ReplayClient(recordings)
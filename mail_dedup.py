@@ -0,0 +1,135 @@
+import hashlib
+import heapq
+import json
+import os
+import re
+from collections import Counter, defaultdict
+
+from config import DEDUP_FINGERPRINT_FILE, DEDUP_THRESHOLD
+
+# Wörter je Shingle und Größe der MinHash-Skizze (bottom-k)
+SHINGLE_WORDS = 3
+SKETCH_SIZE = 64
+# Kürzere Texte (weniger Shingles) werden nur exakt verglichen
+MIN_SHINGLES = 8
+
+_QUOTE_LINE = re.compile(r"^[ \t]*>.*$", re.MULTILINE)
+_WORD = re.compile(r"\w+")
+
+
+def _words(text):
+    """Wörter ohne zitierte Zeilen ("> …"), klein geschrieben."""
+    return _WORD.findall(_QUOTE_LINE.sub("", text or "").lower())
+
+
+def body_digest(text):
+    """Stabiler Digest des normalisierten Mail-Texts (prozessunabhängig)."""
+    normalized = " ".join(_words(text))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _shingle_hash(shingle):
+    digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def body_sketch(text):
+    """MinHash-Skizze (die ``SKETCH_SIZE`` kleinsten Shingle-Hashes), sortiert.
+
+    Leere Liste bei zu kurzen Texten.
+    """
+    words = _words(text)
+    count = len(words) - SHINGLE_WORDS + 1
+    if count < MIN_SHINGLES:
+        return []
+    hashes = {
+        _shingle_hash(" ".join(words[i : i + SHINGLE_WORDS])) for i in range(count)
+    }
+    return sorted(heapq.nsmallest(SKETCH_SIZE, hashes))
+
+
+def similarity(a, b):
+    """Geschätzte Jaccard-Ähnlichkeit zweier Skizzen (0–1)."""
+    if not a or not b:
+        return 0.0
+    set_a, set_b = set(a), set(b)
+    union = heapq.nsmallest(SKETCH_SIZE, set_a | set_b)
+    shared = sum(1 for h in union if h in set_a and h in set_b)
+    return shared / len(union)
+
+
+# -------------------------------
+# Persistente Fingerprints (Schlüssel: Body-Digest)
+# -------------------------------
+
+
+def load_sketches(path=DEDUP_FINGERPRINT_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("shingle_words") != SHINGLE_WORDS or data.get("size") != SKETCH_SIZE:
+        return {}
+    return data.get("sketches", {})
+
+
+def save_sketches(sketches, path=DEDUP_FINGERPRINT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"shingle_words": SHINGLE_WORDS, "size": SKETCH_SIZE, "sketches": sketches},
+            f,
+        )
+    os.replace(tmp_path, path)
+
+
+def remove_duplicates(mails, threshold=DEDUP_THRESHOLD, sketches=None, prune=False):
+    """Entfernt exakte und fast gleiche Mails; die jeweils erste bleibt erhalten.
+
+    Exakt gleich heißt: gleicher Digest des normalisierten Texts. Fast gleich
+    heißt: geschätzte Jaccard-Ähnlichkeit der Shingles mindestens
+    ``threshold`` (``threshold >= 1`` schaltet das aus). ``sketches``
+    (Digest → Skizze) wird als Cache genutzt und um neue Skizzen ergänzt;
+    mit ``prune`` werden Skizzen nicht mehr vorhandener Texte daraus entfernt.
+    Gibt (eindeutige Mails, Anzahl exakt, Anzahl fast gleich) zurück.
+    """
+    if sketches is None:
+        sketches = {}
+    near = threshold < 1
+    # Mindestanzahl gemeinsamer Skizzen-Werte, ab der genauer verglichen wird
+    min_shared = max(1, int(SKETCH_SIZE * threshold / 2))
+
+    unique, seen_digests = [], set()
+    kept_sketches, index = [], defaultdict(list)
+    exact = near_count = 0
+    for mail in mails:
+        digest = body_digest(mail.get("body"))
+        if digest in seen_digests:
+            exact += 1
+            continue
+        seen_digests.add(digest)
+
+        if near:
+            sketch = sketches.get(digest)
+            if sketch is None:
+                sketch = sketches[digest] = body_sketch(mail.get("body"))
+            if sketch:
+                shared = Counter(i for h in sketch for i in index.get(h, ()))
+                if any(
+                    count >= min_shared
+                    and similarity(sketch, kept_sketches[i]) >= threshold
+                    for i, count in shared.items()
+                ):
+                    near_count += 1
+                    continue
+                for h in sketch:
+                    index[h].append(len(kept_sketches))
+                kept_sketches.append(sketch)
+        unique.append(mail)
+
+    if prune:
+        for digest in [d for d in sketches if d not in seen_digests]:
+            del sketches[digest]
+    return unique, exact, near_count
@@ -0,0 +1,388 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from config import (
+    CHATBOT_PASSAGES,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL,
+    JSON_MAIL_FOLDER,
+    MAIL_INDEX_FOLDER,
+    MAIL_PASSAGE_CHARS,
+)
+from llm_client import get_client
+from metrics import record_metric
+
+# Format der Metadaten; bei Änderung wird der Index neu aufgebaut
+INDEX_VERSION = 1
+
+META_FILE = "meta.json"
+
+# Während langer Läufe spätestens nach so vielen Sekunden den Stand sichern
+CHECKPOINT_SECONDS = 30
+
+
+# -------------------------------
+# Passagen aus den bereinigten Mails
+# -------------------------------
+
+
+def split_passages(text, max_chars=MAIL_PASSAGE_CHARS):
+    """Teilt Text an Absätzen in Passagen bis ``max_chars`` Zeichen.
+
+    Kurze Absätze (Anrede, Gruß) werden zusammengefasst, zu lange an
+    Wortgrenzen geteilt.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = " ".join(paragraph.split())
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            if cut < max_chars // 2:
+                cut = max_chars
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            pieces.append(paragraph)
+
+    passages, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def mail_passages(company, mails, max_chars=MAIL_PASSAGE_CHARS):
+    """Passagen aller Mails einer Firma (Schlüssel ist der Name der Email-JSON)."""
+    for mail in mails:
+        subject = mail.get("subject") or ""
+        for text in split_passages(mail.get("body"), max_chars):
+            yield {
+                "company": company,
+                "filename": mail.get("filename"),
+                "date": mail.get("date"),
+                "subject": subject,
+                "text": text,
+                # Gleicher Betreff und Text → gleicher Vektor, wird wiederverwendet
+                "digest": hashlib.sha256(
+                    f"{subject}\n{text}".encode("utf-8")
+                ).hexdigest()[:16],
+            }
+
+
+def embedding_input(passage):
+    """Text, der für eine Passage eingebettet wird."""
+    return f"{passage['subject']}\n{passage['text']}"
+
+
+def _normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def embed_texts(texts, model=EMBEDDING_MODEL, client=None):
+    """Bettet Texte mit Ollama ein; gibt eine normierte float32-Matrix zurück."""
+    client = client or get_client()
+    response = client.embed(model=model, input=list(texts))
+    return _normalized(response["embeddings"])
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def index_signature(folder=MAIL_INDEX_FOLDER):
+    """Cache-Schlüssel des Index-Stands (ändert sich mit jeder Aktualisierung)."""
+    try:
+        return _file_signature(os.path.join(folder, META_FILE))
+    except OSError:
+        return ""
+
+
+# -------------------------------
+# Embedding-Index (Memory-Map + Metadaten)
+# -------------------------------
+
+
+class MailIndex:
+    """Embedding-Index über die Passagen der Email-JSONs.
+
+    Die normierten Vektoren liegen zeilenweise als float32 in einer Datei,
+    die per ``numpy.memmap`` gelesen wird; ``meta.json`` enthält Modell,
+    Dimension, die Datei-Signaturen der Firmen und je Zeile die Passage
+    (oder ``null`` für eine freigegebene Zeile). Neue Vektoren werden
+    angehängt; sind mehr Zeilen frei als belegt, wird in eine neue Datei
+    umkopiert. Geschrieben wird nur durch ``update`` (ein Prozess, z. B. der
+    Job-Worker); Leser sehen den Stand beim Öffnen.
+    """
+
+    def __init__(self, folder=MAIL_INDEX_FOLDER, model=EMBEDDING_MODEL):
+        self.folder = folder
+        self.model = model
+        self.meta_path = os.path.join(folder, META_FILE)
+        self.meta = self._load_meta()
+        self._vectors = None
+        self._live = None
+
+    def _empty_meta(self):
+        return {
+            "version": INDEX_VERSION,
+            "model": self.model,
+            "dim": 0,
+            "generation": 0,
+            "file": None,
+            "companies": {},
+            "passages": [],
+        }
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION or meta.get("model") != self.model:
+                return self._empty_meta()
+            if meta["passages"]:
+                # Vektordatei muss alle Zeilen enthalten, sonst neu aufbauen
+                expected = len(meta["passages"]) * meta["dim"] * 4
+                if os.path.getsize(self._path(meta["file"])) < expected:
+                    return self._empty_meta()
+            return meta
+        except (OSError, ValueError, KeyError, TypeError):
+            return self._empty_meta()
+
+    def _path(self, name):
+        return os.path.join(self.folder, name)
+
+    def _save_meta(self):
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self.meta_path)
+
+    def __len__(self):
+        return sum(p is not None for p in self.meta["passages"])
+
+    def vectors(self):
+        """Alle Zeilen (auch freie) als Matrix ``rows × dim`` (Memory-Map)."""
+        if self._vectors is None:
+            rows, dim = len(self.meta["passages"]), self.meta["dim"]
+            if rows and dim:
+                self._vectors = np.memmap(
+                    self._path(self.meta["file"]),
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(rows, dim),
+                )
+            else:
+                self._vectors = np.zeros((0, dim), dtype=np.float32)
+            self._live = np.fromiter(
+                (p is not None for p in self.meta["passages"]), dtype=bool, count=rows
+            )
+        return self._vectors
+
+    def _release(self):
+        # Memory-Map schließen, bevor die Datei wächst oder ersetzt wird
+        self._vectors = None
+        self._live = None
+
+    # --- Suche ---
+
+    def search(self, query_vector, k=CHATBOT_PASSAGES):
+        """Die ``k`` Passagen mit der größten Kosinus-Ähnlichkeit (beste zuerst).
+
+        Jede Passage ist ein Dict wie in ``mail_passages`` plus ``score``.
+        """
+        vectors = self.vectors()
+        query = _normalized(query_vector)
+        if k <= 0 or not len(vectors) or query.shape != (self.meta["dim"],):
+            return []
+        scores = vectors @ query
+        scores[~self._live] = -np.inf
+        k = min(k, int(self._live.sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self.meta["passages"][i], score=float(scores[i])) for i in top]
+
+    # --- Aktualisierung ---
+
+    def pending(self, mail_folder=JSON_MAIL_FOLDER):
+        """Firmen, deren Email-JSON neu ist, sich geändert hat oder fehlt."""
+        current = {}
+        for path in glob.glob(os.path.join(mail_folder, "*.json")):
+            company = os.path.splitext(os.path.basename(path))[0]
+            current[company] = _file_signature(path)
+        known = self.meta["companies"]
+        changed = {c: sig for c, sig in current.items() if known.get(c) != sig}
+        removed = [c for c in known if c not in current]
+        return changed, removed
+
+    def _append(self, vectors):
+        """Hängt normierte Vektoren an die Vektordatei an."""
+        dim = self.meta["dim"] or vectors.shape[1]
+        if vectors.shape[1] != dim:
+            raise ValueError(
+                f"Embedding-Dimension {vectors.shape[1]} passt nicht zum Index ({dim})"
+            )
+        if self.meta["file"] is None:
+            self.meta["file"] = f"vectors-{self.meta['generation']}.f32"
+        self.meta["dim"] = dim
+        self._release()
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(self.meta["file"])
+        expected = len(self.meta["passages"]) * dim * 4
+        with open(path, "ab") as f:
+            # Reste eines abgebrochenen Laufs (hinter der letzten Zeile) verwerfen
+            if f.tell() != expected:
+                f.truncate(expected)
+            f.write(vectors.astype(np.float32).tobytes())
+
+    def _compact(self):
+        """Kopiert die belegten Zeilen in eine neue Vektordatei."""
+        vectors = self.vectors()
+        live = np.flatnonzero(self._live)
+        old_file = self.meta["file"]
+        self.meta["generation"] += 1
+        self.meta["file"] = f"vectors-{self.meta['generation']}.f32"
+        np.ascontiguousarray(vectors[live]).tofile(self._path(self.meta["file"]))
+        self.meta["passages"] = [self.meta["passages"][i] for i in live]
+        self._release()
+        self._save_meta()
+        try:
+            os.remove(self._path(old_file))
+        except OSError:
+            # z. B. unter Windows noch von einem Leser geöffnet
+            pass
+
+    def update(self, mail_folder=JSON_MAIL_FOLDER, client=None, on_progress=None):
+        """Gleicht den Index mit den Email-JSONs ab.
+
+        Nur Firmen mit geänderter JSON werden neu in Passagen zerlegt, und nur
+        Passagen ohne Vektor werden eingebettet (in Stapeln von
+        ``EMBEDDING_BATCH_SIZE``). ``on_progress(done, total)`` meldet den
+        Fortschritt. Ein abgebrochener Lauf setzt beim nächsten Aufruf fort.
+        Gibt eine Statistik zurück:
+        ``{"companies", "embedded", "reused", "removed", "passages", "seconds"}``.
+        """
+        start = time.perf_counter()
+        changed, removed = self.pending(mail_folder)
+        stats = {
+            "companies": len(changed) + len(removed),
+            "embedded": 0,
+            "reused": 0,
+            "removed": 0,
+        }
+        embed_seconds = 0.0
+        if changed or removed:
+            passages = self.meta["passages"]
+            affected = set(changed) | set(removed)
+            reusable = defaultdict(list)
+            for row, passage in enumerate(passages):
+                if passage is not None and passage["company"] in affected:
+                    reusable[passage["company"], passage["digest"]].append(row)
+                    passages[row] = None
+
+            todo = []
+            for company in list(changed):
+                try:
+                    with open(
+                        os.path.join(mail_folder, f"{company}.json"),
+                        "r",
+                        encoding="utf-8",
+                    ) as f:
+                        mails = json.load(f)
+                except (OSError, ValueError):
+                    # beim nächsten Lauf erneut versuchen
+                    del changed[company]
+                    continue
+                for passage in mail_passages(company, mails):
+                    rows = reusable.get((company, passage["digest"]))
+                    if rows:
+                        passages[rows.pop()] = passage
+                        stats["reused"] += 1
+                    else:
+                        todo.append(passage)
+            stats["removed"] = sum(len(rows) for rows in reusable.values())
+
+            saved = time.monotonic()
+            for i in range(0, len(todo), EMBEDDING_BATCH_SIZE):
+                batch = todo[i : i + EMBEDDING_BATCH_SIZE]
+                embed_start = time.perf_counter()
+                vectors = embed_texts(
+                    [embedding_input(p) for p in batch], self.model, client
+                )
+                embed_seconds += time.perf_counter() - embed_start
+                self._append(vectors)
+                passages.extend(batch)
+                stats["embedded"] += len(batch)
+                if on_progress is not None:
+                    on_progress(stats["embedded"], len(todo))
+                if time.monotonic() - saved > CHECKPOINT_SECONDS:
+                    # Zwischenstand: bereits eingebettete Passagen bleiben erhalten
+                    self._save_meta()
+                    saved = time.monotonic()
+
+            for company in removed:
+                del self.meta["companies"][company]
+            self.meta["companies"].update(changed)
+            self._release()
+            if len(passages) - len(self) > len(self):
+                self._compact()
+            else:
+                self._save_meta()
+
+        stats["passages"] = len(self)
+        stats["seconds"] = time.perf_counter() - start
+        record_metric("mail_index", embed_s=embed_seconds, **stats)
+        return stats
+
+
+# -------------------------------
+# Passagen zur Chatbot-Frage
+# -------------------------------
+
+
+def search_mails(query, index=None, k=CHATBOT_PASSAGES, client=None):
+    """Die ``k`` zur Frage passendsten Mail-Passagen.
+
+    Ohne Index, mit ``k = 0`` oder wenn die Frage nicht eingebettet werden
+    kann (z. B. Embedding-Modell fehlt), wird eine leere Liste geliefert;
+    der Chatbot antwortet dann nur anhand der Profile.
+    """
+    if k <= 0:
+        return []
+    index = index if index is not None else MailIndex()
+    if not len(index):
+        return []
+    start = time.perf_counter()
+    try:
+        query_vector = embed_texts([query], index.model, client)[0]
+    except Exception as e:
+        record_metric("mail_search", error=str(e) or type(e).__name__)
+        return []
+    embed_seconds = time.perf_counter() - start
+    passages = index.search(query_vector, k)
+    record_metric(
+        "mail_search",
+        seconds=time.perf_counter() - start,
+        embed_s=embed_seconds,
+        search_s=time.perf_counter() - start - embed_seconds,
+        rows=len(index.meta["passages"]),
+        passages=len(passages),
+    )
+    return passages
@@ -0,0 +1,715 @@
+import binascii
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import time
+from email.header import decode_header
+from email.parser import BytesHeaderParser
+from email.utils import parsedate_to_datetime, parseaddr, getaddresses
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+from body_cleaning import active_strippers, strip_body
+from company_aliases import CompanyAliasIndex, is_own_domain
+from mail_dedup import load_sketches, remove_duplicates, save_sketches
+from metrics import record_metric, timed
+from config import (
+    COMPANY_ALIAS_FILE,
+    DEDUP_FINGERPRINT_FILE,
+    DEDUP_THRESHOLD,
+    INGEST_WORKERS,
+    MAIL_BODY_MAX_BYTES,
+    MAIL_MANIFEST_FILE,
+    MAIL_PARSE_CACHE_FILE,
+)
+
+MANIFEST_VERSION = 3
+
+# Unterhalb dieser Anzahl lohnt sich der Start eines Prozess-Pools nicht
+MIN_PARALLEL_FILES = 64
+
+
+# -------------------------------
+# Parsing einzelner Emails
+# -------------------------------
+
+
+def clean_body(text):
+    """Reduziert die Email so, dass nur noch die Antwort drauf ist."""
+    return strip_body(text)[0].strip()
+
+
+def parser_signature():
+    """Kennung der Parser-Einstellungen; bei Änderung wird alles neu geparst."""
+    settings = f"{MAIL_BODY_MAX_BYTES}|{','.join(active_strippers())}"
+    return hashlib.sha1(settings.encode("utf-8")).hexdigest()[:12]
+
+
+def extract_company(from_email, to_emails):
+    """Bestimmt die Firma anhand der Absender-/Empfänger-Domain.
+
+    Bei eigenen Mails zählt der erste externe Empfänger aus To und Cc;
+    interne Mails ergeben "Unbekannt".
+    """
+    if not from_email:
+        return "Unbekannt"
+    from_domain = from_email.split("@")[-1].lower()
+
+    if is_own_domain(from_domain):
+        for address in to_emails or []:
+            domain = address.split("@")[-1].lower()
+            if domain and not is_own_domain(domain):
+                return domain
+        return "Unbekannt"
+    return from_domain
+
+
+# Adresse in Headern ohne spitze Klammern, z. B. "Thomas Berger t.berger@firma.de"
+EMAIL_ADDRESS = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def split_address(name, address):
+    """Bereinigt ein (Name, Adresse)-Paar von ``parseaddr``.
+
+    Fehlen im Header die spitzen Klammern, liefert ``parseaddr`` den ganzen
+    Text als Adresse; dann wird die Adresse per Regex herausgelöst und der
+    Rest als Anzeigename verwendet.
+    """
+    if not any(char.isspace() for char in address):
+        return name, address
+    match = EMAIL_ADDRESS.search(address)
+    if match is None:
+        return name, address
+    rest = (address[: match.start()] + address[match.end() :]).strip()
+    return name or " ".join(rest.split()), match.group(0)
+
+
+def format_address(name, address):
+    """ "Name <mail>" mit dekodiertem Anzeigenamen (lesbar, mit parseaddr umkehrbar)."""
+    if "=?" in name:
+        name = decode_subject(name)
+    name = " ".join(name.replace('"', "").split())
+    if not name:
+        return address
+    if any(char in name for char in ",;:<>@()[]\\"):
+        name = f'"{name}"'
+    return f"{name} <{address}>"
+
+
+def decode_subject(raw_subject):
+    """Dekodiert den Betreff und entfernt fehlerhafte Sonderzeichen."""
+    if not raw_subject:
+        return ""
+    decoded_parts = decode_header(raw_subject)
+    subject = ""
+    for part, enc in decoded_parts:
+        if isinstance(part, bytes):
+            try:
+                subject += part.decode(enc or "utf-8", errors="ignore")
+            except:
+                subject += part.decode("utf-8", errors="ignore")
+        else:
+            subject += part
+    return subject
+
+
+# -------------------------------
+# Streaming-MIME-Parser (begrenzter Speicher je Mail)
+# -------------------------------
+
+# Längste Zeile, die am Stück gelesen wird (längere werden gestückelt)
+MAX_LINE_BYTES = 64 * 1024
+# Obergrenze für Header einer Mail bzw. eines Teils
+MAX_HEADER_BYTES = 256 * 1024
+# Maximale Verschachtelungstiefe von multipart-Teilen
+MAX_MIME_DEPTH = 16
+
+
+class _LineReader:
+    """Zeilenweises Lesen mit einer Zeile Rückgabe (für Boundary-Erkennung)."""
+
+    def __init__(self, f):
+        self.f = f
+        self.pushed = None
+
+    def readline(self):
+        if self.pushed is not None:
+            line, self.pushed = self.pushed, None
+            return line
+        return self.f.readline(MAX_LINE_BYTES)
+
+    def unread(self, line):
+        self.pushed = line
+
+
+class _HTMLText(HTMLParser):
+    """Sehr einfache HTML-zu-Text-Umwandlung (ohne script/style, Blöcke als Zeilen)."""
+
+    BLOCK_TAGS = {"br", "p", "div", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self.skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self.skip = max(0, self.skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    text = "".join(parser.parts).replace("\xa0", " ")
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+class _BodyCollector:
+    """Sammelt dekodierte text/plain- und text/html-Teile bis ``max_bytes``."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.plain = []
+        self.html = []
+        self.size = 0
+
+    def room(self):
+        return self.max_bytes - self.size
+
+    def add(self, kind, data, charset):
+        # Erst am Ende eines Teils dekodieren, damit über Zeilen verteilte
+        # Multibyte-Zeichen erhalten bleiben
+        self.size += len(data)
+        try:
+            text = data.decode(charset, errors="ignore")
+        except LookupError:
+            text = data.decode("utf-8", errors="ignore")
+        (self.plain if kind == "plain" else self.html).append(text)
+
+
+def _read_headers(reader):
+    """Liest einen Header-Block bis zur Leerzeile und parst ihn."""
+    lines, size = [], 0
+    while True:
+        line = reader.readline()
+        if not line or line in (b"\n", b"\r\n"):
+            break
+        size += len(line)
+        if size <= MAX_HEADER_BYTES:
+            lines.append(line)
+    return BytesHeaderParser().parsebytes(b"".join(lines) + b"\n")
+
+
+def _boundary_hit(line, boundaries):
+    """(Ebene, schließend) wenn ``line`` eine der Boundaries ist, sonst None."""
+    if not line.startswith(b"--"):
+        return None
+    stripped = line.rstrip(b"\r\n \t")
+    for level in range(len(boundaries) - 1, -1, -1):
+        delimiter = b"--" + boundaries[level]
+        if stripped == delimiter:
+            return level, False
+        if stripped == delimiter + b"--":
+            return level, True
+    return None
+
+
+def _skip_until_boundary(reader, boundaries):
+    while True:
+        line = reader.readline()
+        if not line:
+            return
+        if _boundary_hit(line, boundaries):
+            reader.unread(line)
+            return
+
+
+def _read_leaf(reader, headers, boundaries, collector, kind):
+    """Dekodiert einen Textteil zeilenweise (base64/quoted-printable) in ``collector``."""
+    encoding = str(headers.get("Content-Transfer-Encoding", "")).strip().lower()
+    charset = headers.get_content_charset() or "utf-8"
+    room = collector.room()
+    data, pending = bytearray(), b""
+    while True:
+        line = reader.readline()
+        if not line:
+            break
+        if boundaries and _boundary_hit(line, boundaries):
+            reader.unread(line)
+            break
+        if len(data) >= room:
+            continue  # Obergrenze erreicht: Rest des Teils nur überspringen
+        if encoding == "base64":
+            pending += b"".join(line.split())
+            usable = len(pending) - len(pending) % 4
+            chunk, pending = pending[:usable], pending[usable:]
+            try:
+                data += binascii.a2b_base64(chunk)
+            except binascii.Error:
+                pass
+        elif encoding == "quoted-printable":
+            data += binascii.a2b_qp(line)
+        else:
+            data += line
+    if data:
+        collector.add(kind, bytes(data[: max(room, 0)]), charset)
+
+
+def _parse_entity(reader, headers, boundaries, collector, depth=0):
+    """Verarbeitet einen MIME-Teil; Anhänge werden gelesen, aber nie dekodiert."""
+    maintype = headers.get_content_maintype()
+    boundary = headers.get_param("boundary") if maintype == "multipart" else None
+
+    if boundary and depth < MAX_MIME_DEPTH:
+        stack = boundaries + [str(boundary).encode("latin-1", "ignore")]
+        own = len(stack) - 1
+        while True:
+            line = reader.readline()
+            if not line:
+                return
+            hit = _boundary_hit(line, stack)
+            if hit is None:
+                continue  # Präambel/Epilog
+            level, closing = hit
+            if level < own:
+                reader.unread(line)  # gehört zu einem äußeren Teil
+                return
+            if closing:
+                continue
+            _parse_entity(reader, _read_headers(reader), stack, collector, depth + 1)
+        return
+
+    ctype = headers.get_content_type()
+    disposition = str(headers.get("Content-Disposition", "")).lower()
+    is_attachment = disposition.startswith("attachment") or headers.get_filename()
+    if ctype == "text/plain" and not is_attachment:
+        _read_leaf(reader, headers, boundaries, collector, "plain")
+    elif ctype == "text/html" and not is_attachment:
+        _read_leaf(reader, headers, boundaries, collector, "html")
+    else:
+        _skip_until_boundary(reader, boundaries)
+
+
+def parse_eml_stream(filename, f, max_body_bytes=MAIL_BODY_MAX_BYTES, strippers=None):
+    """Extrahiert Metadaten und bereinigten Body aus einer geöffneten .eml-Datei.
+
+    Liest zeilenweise: Anhänge werden übersprungen statt dekodiert, der
+    dekodierte Text ist auf ``max_body_bytes`` begrenzt. Enthält die Mail
+    nur HTML, wird es in Text umgewandelt. ``removed_chars`` zählt die
+    beim Bereinigen entfernten Zeichen (Zitate, Signaturen, ...); ``strippers``
+    wählt die Stripper aus (Standard: ``active_strippers()``, ``[]`` = keine).
+    """
+    reader = _LineReader(f)
+    msg = _read_headers(reader)
+
+    # Metadaten extrahieren
+    date = parsedate_to_datetime(str(msg["Date"])) if msg["Date"] else None
+    # Adressen mit Anzeigenamen (From, To, Cc), u. a. für die Kontakte der Profile
+    sender_email, to_cc, addresses = "", [], []
+    for field in ("From", "To", "Cc"):
+        header = msg[field]
+        if not header:
+            continue
+        if field == "From":
+            pairs = [parseaddr(str(header))]
+            sender_email = pairs[0][1]
+        else:
+            pairs = getaddresses([header])
+            to_cc.extend(address for _, address in pairs)
+        for name, address in pairs:
+            if address:
+                addresses.append(format_address(*split_address(name, address)))
+
+    subject = decode_subject(msg["Subject"])
+
+    # Body
+    collector = _BodyCollector(max_body_bytes)
+    _parse_entity(reader, msg, [], collector)
+    if collector.plain:
+        body = "".join(collector.plain)
+    else:
+        body = html_to_text("".join(collector.html))
+    cleaned, removed = strip_body(body, strippers)
+
+    return {
+        "filename": filename,
+        "date": date.isoformat() if date else None,
+        "from_email": sender_email,
+        "to_emails": to_cc,
+        "addresses": addresses,
+        "subject": subject,
+        "body": cleaned.strip(),
+        "removed_chars": sum(removed.values()),
+    }
+
+
+def parse_eml_file(path, filename=None):
+    with open(path, "rb") as f:
+        return parse_eml_stream(filename or os.path.basename(path), f)
+
+
+def parse_eml_bytes(filename, raw):
+    """Wie ``parse_eml_stream`` für bereits gelesene Bytes."""
+    return parse_eml_stream(filename, io.BytesIO(raw))
+
+
+def safe_company_name(company):
+    """Dateiname (ohne Endung) der Email-JSON einer Firma."""
+    return company.replace(".", "_").replace("@", "_")
+
+
+# -------------------------------
+# Manifest (inkrementelles Einlesen)
+# -------------------------------
+
+
+def _read_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json_atomic(path, data, indent=None):
+    """Schreibt JSON über eine temporäre Datei, damit nie halbe Dateien entstehen."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(manifest_path, source_folder):
+    """Lädt das Manifest; bei anderem Quellordner, Version oder Parser wird neu begonnen."""
+    source = os.path.abspath(source_folder)
+    parser = parser_signature()
+    manifest = _read_json(manifest_path, {})
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("source") != source
+        or manifest.get("parser") != parser
+    ):
+        manifest = {}
+    return {
+        "version": MANIFEST_VERSION,
+        "source": source,
+        "parser": parser,
+        "files": manifest.get("files", {}),
+        "companies": manifest.get("companies", {}),
+        "dedup_threshold": manifest.get("dedup_threshold"),
+    }
+
+
+def mails_digest(mails):
+    """Stabiler Digest über die Mail-Liste einer Firma."""
+    payload = json.dumps(mails, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def scan_eml_folder(company_folder, manifest_files):
+    """Vergleicht den Ordnerinhalt mit dem Manifest anhand von Größe und mtime.
+
+    Gibt (Dateiliste in Verzeichnisreihenfolge, Manifest-Einträge der
+    unveränderten Dateien, Kandidaten als Liste von (filename, size,
+    mtime_ns, bekannter Digest)) zurück. Unveränderte Dateien werden
+    nicht geöffnet.
+    """
+    filenames, entries, candidates = [], {}, []
+
+    for filename in os.listdir(company_folder):
+        if not filename.lower().endswith(".eml"):
+            continue
+        filepath = os.path.join(company_folder, filename)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            continue
+        filenames.append(filename)
+
+        known = manifest_files.get(filename)
+        if (
+            known
+            and known["size"] == stat.st_size
+            and known["mtime_ns"] == stat.st_mtime_ns
+        ):
+            entries[filename] = known
+        else:
+            candidates.append(
+                (
+                    filename,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    known["sha256"] if known else None,
+                )
+            )
+
+    return filenames, entries, candidates
+
+
+# -------------------------------
+# Paralleles Parsen
+# -------------------------------
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """SHA-256 einer Datei, blockweise gelesen."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _parse_chunk(company_folder, chunk):
+    """Worker: liest, hasht und parst einen Block von Dateien.
+
+    Dateien, deren Digest dem bekannten entspricht (nur mtime geändert),
+    werden nicht erneut geparst (Record ``None``).
+    """
+    results = []
+    for filename, known_sha in chunk:
+        path = os.path.join(company_folder, filename)
+        digest = file_sha256(path)
+        record = None if digest == known_sha else parse_eml_file(path, filename)
+        results.append((filename, digest, record))
+    return results
+
+
+def resolve_workers(workers=None):
+    """Anzahl Worker-Prozesse (0/None = alle Kerne)."""
+    if workers is None:
+        workers = INGEST_WORKERS
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+
+def parse_eml_files(company_folder, items, workers=None, chunk_size=None):
+    """Parst (filename, bekannter Digest)-Paare, bei Bedarf in einem Prozess-Pool.
+
+    Die Liste wird in Blöcke geteilt, die Ergebnisse kommen in der
+    Reihenfolge von ``items`` zurück: Liste von (filename, digest, record).
+    """
+    items = list(items)
+    workers = min(resolve_workers(workers), max(len(items), 1))
+    if workers <= 1 or len(items) < MIN_PARALLEL_FILES:
+        return _parse_chunk(company_folder, items)
+
+    if not chunk_size:
+        # mehrere Blöcke pro Worker, damit langsame Blöcke ausgeglichen werden
+        chunk_size = max(1, math.ceil(len(items) / (workers * 4)))
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk_result in pool.map(
+            _parse_chunk, [company_folder] * len(chunks), chunks
+        ):
+            results.extend(chunk_result)
+    return results
+
+
+def group_by_company(emails_data, threshold=DEDUP_THRESHOLD, sketches=None, stats=None):
+    """Sortiert nach Datum, entfernt (fast) gleiche Mails und gruppiert nach Firma.
+
+    ``sketches`` ist der persistente Cache der MinHash-Skizzen, in ``stats``
+    werden ``duplicates`` und ``near_duplicates`` gezählt.
+    """
+    # Sortieren + Duplikate
+    emails_data.sort(key=lambda x: x["date"] or "", reverse=False)
+    unique_emails, exact, near = remove_duplicates(
+        emails_data, threshold, sketches, prune=True
+    )
+    if stats is not None:
+        stats["duplicates"] = exact
+        stats["near_duplicates"] = near
+        stats["removed_chars"] = sum(m.get("removed_chars", 0) for m in emails_data)
+
+    # Nach Firma gruppieren
+    profiles = defaultdict(list)
+    for mail in unique_emails:
+        company = extract_company(mail["from_email"], mail["to_emails"])
+        mail_copy = {
+            k: v for k, v in mail.items() if k not in ("to_emails", "removed_chars")
+        }
+        profiles[company].append(mail_copy)
+    return profiles
+
+
+def ingest_eml_folder(
+    company_folder,
+    output_dir,
+    manifest_path=MAIL_MANIFEST_FILE,
+    cache_path=MAIL_PARSE_CACHE_FILE,
+    workers=None,
+    store=None,
+    dedup_threshold=DEDUP_THRESHOLD,
+    sketches_path=DEDUP_FINGERPRINT_FILE,
+    alias_path=COMPANY_ALIAS_FILE,
+):
+    """Liest neue/geänderte .eml-Dateien ein und schreibt geänderte Firmen-JSONs.
+
+    Das Parsen läuft mit ``workers`` Prozessen (Standard: ``INGEST_WORKERS``).
+    Mit ``store`` (``MailStore``) werden die Mails zusätzlich inkrementell in
+    SQLite abgeglichen. Der Alias-Index (``alias_path``) wird mit den
+    Firmen-Domains neu aufgebaut.
+    Gibt eine Statistik zurück:
+    ``{"parsed", "reused", "removed", "written": {firma: anzahl}, "deleted": [...]}``
+    und nach einer Neugruppierung ``duplicates``/``near_duplicates`` sowie
+    ``removed_chars`` (beim Bereinigen entfernte Zeichen aller Mails).
+    Ein Aufruf ohne Änderungen parst keine Datei und schreibt nichts.
+    """
+    start = time.perf_counter()
+    with timed("ingest_scan") as m:
+        manifest = load_manifest(manifest_path, company_folder)
+        old_files = manifest["files"]
+        filenames, entries, candidates = scan_eml_folder(company_folder, old_files)
+        m["files"] = len(filenames)
+
+    # Kandidaten (Größe/mtime geändert) lesen, hashen und ggf. parallel parsen
+    to_parse = {}
+    with timed("ingest_parse", files=len(candidates), workers=resolve_workers(workers)):
+        results = parse_eml_files(
+            company_folder, [(c[0], c[3]) for c in candidates], workers=workers
+        )
+    for (filename, size, mtime_ns, _), (_, digest, record) in zip(candidates, results):
+        entries[filename] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+        if record is not None:
+            to_parse[filename] = record
+
+    removed = [name for name in old_files if name not in entries]
+    stats = {
+        "parsed": len(to_parse),
+        "reused": len(filenames) - len(to_parse),
+        "removed": len(removed),
+        "written": {},
+        "deleted": [],
+    }
+
+    files_changed = bool(to_parse or removed) or entries != old_files
+    outputs_present = all(
+        os.path.exists(os.path.join(output_dir, f"{safe_company_name(c)}.json"))
+        for c in manifest["companies"]
+    ) and os.path.exists(alias_path)
+    if store is not None:
+        outputs_present = outputs_present and (
+            store.get_meta("companies") == manifest["companies"]
+        )
+    if manifest["dedup_threshold"] != dedup_threshold:
+        files_changed = True
+    if not files_changed and outputs_present:
+        _record_ingest(stats, start)
+        return stats
+
+    # Geparste Mails: Cache für unveränderte Dateien, Parser für neue
+    cache = _read_json(cache_path, {}) if stats["reused"] else {}
+    parsed = dict(to_parse)
+
+    emails_data = []
+    for filename in filenames:
+        record = parsed.get(filename) or cache.get(filename)
+        if record is None:
+            # Cache fehlt/ist beschädigt → Datei erneut parsen
+            record = parse_eml_file(os.path.join(company_folder, filename), filename)
+            stats["parsed"] += 1
+            stats["reused"] -= 1
+        parsed[filename] = record
+        emails_data.append(dict(record))
+
+    with timed("ingest_dedup", mails=len(emails_data)) as m:
+        sketches = load_sketches(sketches_path)
+        grouped = group_by_company(emails_data, dedup_threshold, sketches, stats)
+        save_sketches(sketches, sketches_path)
+        m.update(
+            companies=len(grouped),
+            duplicates=stats["duplicates"],
+            near_duplicates=stats["near_duplicates"],
+            removed_chars=stats["removed_chars"],
+        )
+
+    # 🔧 Sicherstellen, dass der Ausgabeordner existiert
+    os.makedirs(output_dir, exist_ok=True)
+
+    with timed("ingest_write") as m:
+        # JSON nur für Firmen schreiben, deren Mails sich geändert haben
+        companies = {}
+        for company, mails in grouped.items():
+            digest = mails_digest(mails)
+            companies[company] = digest
+            out_path = os.path.join(output_dir, f"{safe_company_name(company)}.json")
+            if manifest["companies"].get(company) == digest and os.path.exists(
+                out_path
+            ):
+                continue
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(mails, f, indent=2, ensure_ascii=False)
+            stats["written"][company] = len(mails)
+
+        # Firmen ohne Mails: veraltete JSON entfernen
+        for company in manifest["companies"]:
+            if company in companies:
+                continue
+            out_path = os.path.join(output_dir, f"{safe_company_name(company)}.json")
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            stats["deleted"].append(company)
+
+        _write_json_atomic(cache_path, parsed)
+        manifest["files"] = entries
+        manifest["companies"] = companies
+        manifest["dedup_threshold"] = dedup_threshold
+        _write_json_atomic(manifest_path, manifest, indent=1)
+        m["companies"] = len(stats["written"])
+
+        aliases = CompanyAliasIndex.load(alias_path)
+        aliases.set_companies({c: safe_company_name(c) for c in companies})
+        aliases.save(alias_path)
+
+    if store is not None:
+        with timed("ingest_store") as m:
+            inserted, updated, deleted = store.sync_mails(
+                [
+                    (
+                        safe_company_name(company),
+                        # Parser-Kennung im Digest: andere Bereinigung → Update
+                        f"{entries[mail['filename']]['sha256']}:{manifest['parser']}",
+                        parsed[mail["filename"]],
+                    )
+                    for company, mails in grouped.items()
+                    for mail in mails
+                ]
+            )
+            store.set_meta("companies", companies)
+            m.update(inserted=inserted, updated=updated, deleted=deleted)
+
+    _record_ingest(stats, start)
+    return stats
+
+
+def _record_ingest(stats, start):
+    record_metric(
+        "ingest",
+        seconds=time.perf_counter() - start,
+        parsed=stats["parsed"],
+        reused=stats["reused"],
+        removed=stats["removed"],
+        written=len(stats["written"]),
+    )
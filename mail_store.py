@@ -0,0 +1,327 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from company_aliases import is_own_domain
+from config import SQLITE_DB_FILE, STORAGE_BACKEND
+
+# -------------------------------
+# SQLite-Speicher für Mails, Kontakte und Profile
+# -------------------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS mails (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    digest TEXT,
+    company TEXT NOT NULL,
+    date TEXT,
+    from_email TEXT,
+    to_emails TEXT,
+    subject TEXT,
+    body TEXT
+);
+CREATE INDEX IF NOT EXISTS mails_company_date ON mails (company, date);
+CREATE TABLE IF NOT EXISTS contacts (
+    company TEXT NOT NULL,
+    email TEXT NOT NULL,
+    mails INTEGER,
+    first_seen TEXT,
+    last_seen TEXT,
+    PRIMARY KEY (company, email)
+);
+CREATE TABLE IF NOT EXISTS profiles (
+    company TEXT PRIMARY KEY,
+    company_name TEXT,
+    data TEXT NOT NULL,
+    updated REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS mails_fts USING fts5 (
+    subject, body, content='mails', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS mails_ai AFTER INSERT ON mails BEGIN
+    INSERT INTO mails_fts (rowid, subject, body)
+    VALUES (new.id, new.subject, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS mails_ad AFTER DELETE ON mails BEGIN
+    INSERT INTO mails_fts (mails_fts, rowid, subject, body)
+    VALUES ('delete', old.id, old.subject, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS mails_au AFTER UPDATE ON mails BEGIN
+    INSERT INTO mails_fts (mails_fts, rowid, subject, body)
+    VALUES ('delete', old.id, old.subject, old.body);
+    INSERT INTO mails_fts (rowid, subject, body)
+    VALUES (new.id, new.subject, new.body);
+END;
+"""
+
+MAIL_COLUMNS = ("filename", "date", "from_email", "to_emails", "subject", "body")
+
+
+def _mail_from_row(row):
+    mail = dict(zip(MAIL_COLUMNS, row))
+    mail["to_emails"] = json.loads(mail["to_emails"] or "[]")
+    return mail
+
+
+def _profile_name(profile, company):
+    if isinstance(profile, list) and profile:
+        profile = profile[0]
+    if isinstance(profile, dict):
+        return profile.get("company_name", company)
+    return company
+
+
+def _fts_query(text):
+    """Suchbegriffe als FTS5-Ausdruck (jeder Begriff in Anführungszeichen, ODER)."""
+    terms = [t.replace('"', "") for t in text.split()]
+    return " OR ".join(f'"{t}"' for t in terms if t)
+
+
+class MailStore:
+    """Mails, Kontakte und Profile als Zeilen in einer SQLite-Datei.
+
+    Mails werden einzeln (nach Dateiname) eingefügt, aktualisiert oder
+    gelöscht; ein FTS5-Index über Betreff und Text wird per Trigger
+    mitgeführt. ``revision()`` ändert sich mit jedem Schreibvorgang und
+    eignet sich als Cache-Schlüssel. Jeder Aufruf öffnet eine eigene
+    Verbindung, daher kann eine Instanz von mehreren Threads genutzt werden.
+    """
+
+    def __init__(self, path=SQLITE_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    # --- Metadaten ---
+
+    def get_meta(self, key, default=None):
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, db, key, value):
+        db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    def set_meta(self, key, value):
+        with self._lock, self._connect() as db:
+            self._set_meta(db, key, value)
+
+    def _bump_revision(self, db):
+        row = db.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        self._set_meta(db, "revision", (json.loads(row[0]) if row else 0) + 1)
+
+    def revision(self):
+        return self.get_meta("revision", 0)
+
+    # --- Mails ---
+
+    def sync_mails(self, mails):
+        """Gleicht die Tabelle mit dem aktuellen Mail-Bestand ab.
+
+        ``mails`` ist eine Liste von (company, digest, record). Nur neue,
+        geänderte (anderer Digest oder andere Firma) und entfernte Mails
+        werden geschrieben. Gibt (eingefügt, aktualisiert, gelöscht) zurück.
+        """
+        wanted = {
+            record["filename"]: (company, digest, record)
+            for company, digest, record in mails
+        }
+        with self._lock, self._connect() as db:
+            existing = {
+                filename: (company, digest)
+                for filename, company, digest in db.execute(
+                    "SELECT filename, company, digest FROM mails"
+                )
+            }
+            inserts, updates, affected = [], [], set()
+            for filename, (company, digest, record) in wanted.items():
+                known = existing.get(filename)
+                if known == (company, digest):
+                    continue
+                row = (
+                    digest,
+                    company,
+                    record.get("date"),
+                    record.get("from_email"),
+                    json.dumps(record.get("to_emails") or [], ensure_ascii=False),
+                    record.get("subject"),
+                    record.get("body"),
+                    filename,
+                )
+                (updates if known else inserts).append(row)
+                affected.add(company)
+                if known:
+                    affected.add(known[0])
+            deletes = [(f,) for f in existing if f not in wanted]
+            affected.update(existing[f][0] for (f,) in deletes)
+
+            db.executemany(
+                "INSERT INTO mails (digest, company, date, from_email, to_emails,"
+                " subject, body, filename) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                inserts,
+            )
+            db.executemany(
+                "UPDATE mails SET digest = ?, company = ?, date = ?, from_email = ?,"
+                " to_emails = ?, subject = ?, body = ? WHERE filename = ?",
+                updates,
+            )
+            db.executemany("DELETE FROM mails WHERE filename = ?", deletes)
+            if affected:
+                self._refresh_contacts(db, affected)
+                self._bump_revision(db)
+        return len(inserts), len(updates), len(deletes)
+
+    def _refresh_contacts(self, db, companies):
+        """Kontakte (Absender außer eigenen Domains) der Firmen neu ableiten."""
+        for company in companies:
+            db.execute("DELETE FROM contacts WHERE company = ?", (company,))
+            rows = db.execute(
+                "SELECT lower(from_email), count(*), min(date), max(date) FROM mails"
+                " WHERE company = ? AND from_email != '' GROUP BY lower(from_email)",
+                (company,),
+            ).fetchall()
+            db.executemany(
+                "INSERT INTO contacts VALUES (?, ?, ?, ?, ?)",
+                [
+                    (company, *row)
+                    for row in rows
+                    if not is_own_domain(row[0].split("@")[-1])
+                ],
+            )
+
+    def companies(self):
+        """Firmen mit Anzahl Mails: ``{company: count}``."""
+        with self._connect() as db:
+            return dict(
+                db.execute(
+                    "SELECT company, count(*) FROM mails GROUP BY company ORDER BY company"
+                )
+            )
+
+    def mail_count(self, company):
+        with self._connect() as db:
+            return db.execute(
+                "SELECT count(*) FROM mails WHERE company = ?", (company,)
+            ).fetchone()[0]
+
+    def mails_for(self, company, limit=None, offset=0, newest_first=True):
+        """Mails einer Firma nach Datum sortiert, optional seitenweise."""
+        order = "DESC" if newest_first else "ASC"
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {', '.join(MAIL_COLUMNS)} FROM mails WHERE company = ?"
+                f" ORDER BY date {order}, id {order} LIMIT ? OFFSET ?",
+                (company, -1 if limit is None else limit, offset),
+            ).fetchall()
+        return [_mail_from_row(row) for row in rows]
+
+    def contacts(self, company):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT email, mails, first_seen, last_seen FROM contacts"
+                " WHERE company = ? ORDER BY mails DESC, email",
+                (company,),
+            ).fetchall()
+        return [
+            dict(zip(("email", "mails", "first_seen", "last_seen"), row))
+            for row in rows
+        ]
+
+    def search(self, query, company=None, limit=20):
+        """Volltextsuche (FTS5, BM25) über Betreff und Text."""
+        expression = _fts_query(query)
+        if not expression:
+            return []
+        sql = (
+            "SELECT m.company, m.filename, m.date, m.from_email, m.subject,"
+            " snippet(mails_fts, 1, '[', ']', ' … ', 12), bm25(mails_fts)"
+            " FROM mails_fts JOIN mails m ON m.id = mails_fts.rowid"
+            " WHERE mails_fts MATCH ?"
+        )
+        params = [expression]
+        if company is not None:
+            sql += " AND m.company = ?"
+            params.append(company)
+        sql += " ORDER BY bm25(mails_fts) LIMIT ?"
+        params.append(limit)
+        with self._connect() as db:
+            rows = db.execute(sql, params).fetchall()
+        keys = ("company", "filename", "date", "from_email", "subject", "snippet")
+        return [dict(zip(keys, row[:6]), score=-row[6]) for row in rows]
+
+    # --- Profile ---
+
+    def upsert_profile(self, company, profile):
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?)",
+                (
+                    company,
+                    _profile_name(profile, company),
+                    json.dumps(profile, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            self._bump_revision(db)
+
+    def delete_profiles_except(self, companies):
+        """Entfernt Profile von Firmen, die nicht mehr in ``companies`` stehen."""
+        companies = set(companies)
+        with self._lock, self._connect() as db:
+            stale = [
+                (c,)
+                for (c,) in db.execute("SELECT company FROM profiles")
+                if c not in companies
+            ]
+            db.executemany("DELETE FROM profiles WHERE company = ?", stale)
+            if stale:
+                self._bump_revision(db)
+        return len(stale)
+
+    def profile_companies(self):
+        with self._connect() as db:
+            return {c for (c,) in db.execute("SELECT company FROM profiles")}
+
+    def profiles(self):
+        """Alle Profile, Schlüssel wie bei ``read_profiles``: ``company_name``."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT company, company_name, data FROM profiles ORDER BY company"
+            ).fetchall()
+        profiles = {}
+        for company, name, data in rows:
+            profile = json.loads(data)
+            if isinstance(profile, list) and profile:
+                profile = profile[0]
+            profiles[name or company] = profile
+        return profiles
+
+
+def open_store():
+    """``MailStore`` bei ``MDZ_STORAGE=sqlite``, sonst ``None`` (nur JSON-Dateien)."""
+    if STORAGE_BACKEND != "sqlite":
+        return None
+    return MailStore()
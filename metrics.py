@@ -0,0 +1,112 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED, METRICS_FILE, METRICS_MAX_BYTES
+
+
+def record_metric(stage, **fields):
+    """Hängt einen Messwert als JSON-Zeile an die lokale Metrik-Datei an."""
+    entry = {"ts": round(time.time(), 3), "stage": stage}
+    for key, value in fields.items():
+        entry[key] = round(value, 4) if isinstance(value, float) else value
+    if not METRICS_ENABLED:
+        return entry
+    try:
+        os.makedirs(os.path.dirname(METRICS_FILE) or ".", exist_ok=True)
+        # Datei begrenzen: bei Überschreitung einmal rotieren (metrics.jsonl.1)
+        if (
+            os.path.exists(METRICS_FILE)
+            and os.path.getsize(METRICS_FILE) > METRICS_MAX_BYTES
+        ):
+            os.replace(METRICS_FILE, METRICS_FILE + ".1")
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError:
+        # Messwerte dürfen die Anwendung nie stören
+        pass
+    return entry
+
+
+@contextmanager
+def timed(stage, **fields):
+    """Misst die Dauer eines Blocks und schreibt sie als ``seconds``.
+
+    Der Block bekommt das Feld-Dict und kann weitere Werte (z. B. Zähler)
+    ergänzen, die mit protokolliert werden.
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record_metric(stage, seconds=time.perf_counter() - start, **fields)
+
+
+def ollama_durations(response):
+    """Von Ollama gemeldete Dauern (Nanosekunden) in Sekunden."""
+    durations = {}
+    for field in ("load_duration", "prompt_eval_duration", "eval_duration"):
+        value = response.get(field)
+        if value:
+            durations[field.replace("_duration", "_s")] = value / 1e9
+    return durations
+
+
+# -------------------------------
+# Auswertung
+# -------------------------------
+
+
+def read_metrics(path=METRICS_FILE, include_rotated=True):
+    """Liest alle Messwerte (älteste zuerst); defekte Zeilen werden übersprungen."""
+    records = []
+    paths = [path + ".1", path] if include_rotated else [path]
+    for p in paths:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return records
+
+
+def percentile(values, q):
+    """Perzentil (0–100) mit linearer Interpolation."""
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+def summarize_metrics(records, fields=("seconds", "ttft_s")):
+    """p50/p95/max je Stufe für die angegebenen Dauer-Felder."""
+    values = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        for field in fields:
+            value = record.get(field)
+            if isinstance(value, (int, float)):
+                values[record.get("stage", "?")][field].append(value)
+
+    summary = []
+    for stage in sorted(values):
+        for field, vals in values[stage].items():
+            summary.append(
+                {
+                    "stage": stage,
+                    "field": field,
+                    "count": len(vals),
+                    "p50": round(percentile(vals, 50), 4),
+                    "p95": round(percentile(vals, 95), 4),
+                    "max": round(max(vals), 4),
+                }
+            )
+    return summary
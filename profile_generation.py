@@ -0,0 +1,878 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import time
+from email.utils import parseaddr
+
+from company_aliases import CompanyAliasIndex, is_own_domain
+from llm_client import get_async_client
+from mail_ingest import split_address
+from metrics import ollama_durations, record_metric
+from profile_schema import LLM_PROFILE_SCHEMA, parse_profile
+from prompt_compaction import compact_emails, compact_json, compact_template
+from config import (
+    JSON_MAIL_FOLDER,
+    JSON_PROFILE_FOLDER,
+    LLM_BACKOFF_SECONDS,
+    LLM_MAX_CONCURRENCY,
+    LLM_RETRIES,
+    LLM_TIMEOUT_SECONDS,
+    MODEL,
+    PROFILE_CHUNK_CACHE_FOLDER,
+    PROFILE_DELTA_STATE_FILE,
+    PROFILE_FINGERPRINT_FILE,
+    PROFILE_FULL_REBUILD_EVERY,
+    PROFILE_PARSE_RETRIES,
+    PROFILE_STRUCTURED_OUTPUT,
+    PROFILE_TOKEN_BUDGET,
+)
+
+# -------------------------------
+# Prompt & LLM-Aufruf
+# -------------------------------
+
+PROFILE_PROMPT_TEMPLATE = compact_template("""
+            Du bekommst eine Liste von Emails im JSON-Format.
+            Erstelle für jede Kundenfirma nur ein Profil.
+
+            Jedes Profil enthält:
+            - Name des Unternehmens
+            - eine Liste der angefragten oder bestellten Produkte
+            - Summary des Email-Verlaufs (max. 8 Sätze). Die Zusammenfassung muss summary heißen.
+
+            Regeln:
+            - Kontakte werden nicht benötigt.
+            - Gib das Ergebnis ausschließlich als gültiges JSON-Array zurück, ohne Markdown.
+
+            Hier sind die Emails:
+            {emails}
+            """)
+
+
+def build_profile_prompt(emails):
+    """Baut den Profil-Prompt für den Email-Verlauf einer Firma (kompakt)."""
+    return PROFILE_PROMPT_TEMPLATE.replace(
+        "{emails}", compact_json(compact_emails(emails))
+    )
+
+
+def parse_profile_output(output_text):
+    """Wandelt die LLM-Antwort in ein Profil um (siehe ``parse_profile``).
+
+    Gibt (profil, ok) zurück; bei ungültigem JSON wird der Rohtext gespeichert.
+    """
+    profile, status = parse_profile(output_text)
+    return profile, status != "invalid"
+
+
+# -------------------------------
+# Map-Reduce für lange Verläufe
+# -------------------------------
+
+# Grobe Schätzung, reicht für das Budget (kein Tokenizer nötig)
+CHARS_PER_TOKEN = 4
+
+MAP_PROMPT_TEMPLATE = compact_template("""
+            Du bekommst einen Ausschnitt aus dem Email-Verlauf einer Kundenfirma im JSON-Format.
+            Erstelle daraus ein Teilprofil.
+
+            Das Teilprofil enthält:
+            - Name des Unternehmens (company_name)
+            - eine Liste der angefragten oder bestellten Produkte (products)
+            - Summary dieses Ausschnitts (max. 5 Sätze). Die Zusammenfassung muss summary heißen.
+
+            Regeln:
+            - Kontakte werden nicht benötigt.
+            - Gib das Ergebnis ausschließlich als gültiges JSON-Array zurück, ohne Markdown.
+
+            Hier sind die Emails:
+            {emails}
+            """)
+
+REDUCE_PROMPT_TEMPLATE = compact_template("""
+            Du bekommst mehrere Teilprofile derselben Kundenfirma im JSON-Format.
+            Sie stammen aus aufeinanderfolgenden Abschnitten des Email-Verlaufs (chronologisch sortiert).
+            Führe sie zu genau einem Profil zusammen.
+
+            Das Profil enthält:
+            - Name des Unternehmens
+            - eine Liste aller angefragten oder bestellten Produkte ohne Duplikate
+            - Summary des gesamten Email-Verlaufs (max. 8 Sätze). Die Zusammenfassung muss summary heißen.
+
+            Regeln:
+            - Kontakte werden nicht benötigt.
+            - Gib das Ergebnis ausschließlich als gültiges JSON-Array zurück, ohne Markdown.
+
+            Hier sind die Teilprofile:
+            {profiles}
+            """)
+
+
+def estimate_tokens(text):
+    """Schätzt die Tokenanzahl eines Textes."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_emails(emails, budget=PROFILE_TOKEN_BUDGET):
+    """Teilt den Verlauf chronologisch in Blöcke, deren Map-Prompt ins Budget passt.
+
+    Die Blöcke werden von vorne gefüllt, neue Mails ändern daher nur den
+    letzten Block (die übrigen bleiben im Cache gültig). Einzelne Mails, die
+    allein das Budget sprengen, werden am Body gekürzt.
+    """
+    available = max(budget - estimate_tokens(MAP_PROMPT_TEMPLATE), 1)
+    chunks, current, used = [], [], 0
+    for mail in emails:
+        cost = estimate_tokens(compact_json(mail))
+        if cost > available:
+            overflow = (cost - available) * CHARS_PER_TOKEN
+            body = mail.get("body") or ""
+            mail = dict(mail, body=body[: max(len(body) - overflow, 0)])
+            cost = estimate_tokens(compact_json(mail))
+        if current and used + cost > available:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(mail)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _chunk_cache_path(prompt):
+    digest = hashlib.sha256(f"{MODEL}\0{prompt}".encode("utf-8")).hexdigest()
+    return os.path.join(PROFILE_CHUNK_CACHE_FOLDER, f"{digest}.json")
+
+
+def _load_chunk_cache(prompt):
+    try:
+        with open(_chunk_cache_path(prompt), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_chunk_cache(prompt, partial):
+    path = _chunk_cache_path(prompt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(partial, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _as_profile_list(profile):
+    return profile if isinstance(profile, list) else [profile]
+
+
+async def _map_chunk(chunk, call):
+    """Teilprofil eines Blocks als (profile, ok).
+
+    Gültige Ergebnisse werden per Block-Hash gecacht.
+    """
+    prompt = MAP_PROMPT_TEMPLATE.replace("{emails}", compact_json(chunk))
+    cached = _load_chunk_cache(prompt)
+    if cached is not None:
+        return cached, True
+    partial, ok = await call(prompt, "profile_map")
+    partial = _as_profile_list(partial)
+    if ok:
+        _save_chunk_cache(prompt, partial)
+    return partial, ok
+
+
+async def _reduce_partials(partials, call, budget, ok=True):
+    """Führt Teilprofile zusammen, bei Bedarf stufenweise in Gruppen.
+
+    ``ok`` ist False, wenn schon ein Teilprofil ungültig war; das Ergebnis
+    gilt dann ebenfalls als ungültig, auch wenn der letzte Aufruf gelingt.
+    """
+    available = max(budget - estimate_tokens(REDUCE_PROMPT_TEMPLATE), 1)
+    while True:
+        prompt = REDUCE_PROMPT_TEMPLATE.replace("{profiles}", compact_json(partials))
+        if estimate_tokens(prompt) <= budget or len(partials) <= 2:
+            profile, reduced_ok = await call(prompt, "profile_reduce")
+            return profile, ok and reduced_ok
+
+        groups, current, used = [], [], 0
+        for partial in partials:
+            cost = estimate_tokens(compact_json(partial))
+            if current and used + cost > available:
+                groups.append(current)
+                current, used = [], 0
+            current.append(partial)
+            used += cost
+        groups.append(current)
+        if len(groups) == 1:
+            profile, reduced_ok = await call(prompt, "profile_reduce")
+            return profile, ok and reduced_ok
+        if len(groups) == len(partials):
+            # Schon jedes Teilprofil allein zu groß: trotzdem paarweise
+            # zusammenführen, damit die Liste schrumpft (sonst Endlosschleife)
+            groups = [partials[i : i + 2] for i in range(0, len(partials), 2)]
+
+        async def reduce_group(group):
+            if len(group) == 1:
+                return group[0], True
+            group_prompt = REDUCE_PROMPT_TEMPLATE.replace(
+                "{profiles}", compact_json(group)
+            )
+            merged, merged_ok = await call(group_prompt, "profile_reduce")
+            return _as_profile_list(merged)[0], merged_ok
+
+        reduced = await asyncio.gather(*(reduce_group(g) for g in groups))
+        partials = [partial for partial, _ in reduced]
+        ok = ok and all(merged_ok for _, merged_ok in reduced)
+
+
+async def build_profile(emails, call, budget=PROFILE_TOKEN_BUDGET):
+    """Erzeugt ein Profil; lange Verläufe werden per Map-Reduce verarbeitet.
+
+    ``call(prompt, stage)`` ist eine Coroutine, die die geprüfte Antwort des
+    LLM als (profil, ok) liefert. Passt der normale Prompt ins Token-Budget,
+    genügt ein Aufruf.
+    """
+    emails = compact_emails(emails)
+    prompt = PROFILE_PROMPT_TEMPLATE.replace("{emails}", compact_json(emails))
+    if estimate_tokens(prompt) <= budget:
+        return await call(prompt, "profile")
+
+    chunks = chunk_emails(emails, budget)
+    mapped = await asyncio.gather(*(_map_chunk(chunk, call) for chunk in chunks))
+    partials = [partial for profiles, _ in mapped for partial in profiles]
+    ok = all(mapped_ok for _, mapped_ok in mapped)
+    return await _reduce_partials(partials, call, budget, ok)
+
+
+# -------------------------------
+# Delta-Aktualisierung (bisheriges Profil + neue Mails)
+# -------------------------------
+
+DELTA_PROMPT_TEMPLATE = compact_template("""
+            Du bekommst das bisherige Profil einer Kundenfirma und neue Emails derselben Firma im JSON-Format.
+            Aktualisiere das Profil anhand der neuen Emails.
+
+            Das Profil enthält:
+            - Name des Unternehmens
+            - eine Liste aller angefragten oder bestellten Produkte ohne Duplikate: bisherige behalten, neue ergänzen
+            - Summary des gesamten Email-Verlaufs (max. 8 Sätze), fortgeschrieben um die neuen Emails. Die Zusammenfassung muss summary heißen.
+
+            Regeln:
+            - Kontakte werden nicht benötigt.
+            - Gib das Ergebnis ausschließlich als gültiges JSON-Array zurück, ohne Markdown.
+
+            Hier ist das bisherige Profil:
+            {profile}
+
+            Hier sind die neuen Emails:
+            {emails}
+            """)
+
+
+def mail_digest(mail):
+    """Stabiler Digest einer Mail der Email-JSON."""
+    payload = json.dumps(mail, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def build_delta_prompt(previous, new_emails):
+    """Prompt aus bisherigem Profil und den neuen Mails (kompakt)."""
+    return DELTA_PROMPT_TEMPLATE.replace("{profile}", compact_json(previous)).replace(
+        "{emails}", compact_json(compact_emails(new_emails))
+    )
+
+
+async def update_profile(previous, new_emails, call):
+    """Aktualisiert ``previous`` mit den neuen Mails in einem LLM-Aufruf."""
+    return await call(build_delta_prompt(previous, new_emails), "profile_delta")
+
+
+# -------------------------------
+# Kontakte aus den Mail-Headern (ohne LLM)
+# -------------------------------
+
+
+def extract_contacts(emails):
+    """Kontakte der Kundenfirma aus From/To/Cc aller Mails.
+
+    Je Mail zählt die Domain der ersten externen Adresse (wie bei der
+    Zuordnung zur Firma); aufgenommen werden nur Adressen dieser Domain,
+    eigene Domains (``MY_DOMAINS``) also nie. Der Name ist der erste nicht
+    leere Anzeigename der Adresse; Header ohne spitze Klammern werden mit
+    ``split_address`` zerlegt. Email-JSONs ohne ``addresses`` (ältere
+    Versionen) liefern nur die Absender.
+    """
+    contacts = {}
+    for mail in emails:
+        addresses = mail.get("addresses") or [mail.get("from_email") or ""]
+        external = [
+            (name, email.lower())
+            for name, email in (split_address(*parseaddr(a)) for a in addresses)
+            if "@" in email and not is_own_domain(email.rpartition("@")[2])
+        ]
+        if not external:
+            continue
+        domain = external[0][1].rpartition("@")[2]
+        for name, email in external:
+            if email.rpartition("@")[2] == domain and not contacts.get(email):
+                contacts[email] = name
+    return [{"name": name, "email": email} for email, name in contacts.items()]
+
+
+def merge_contacts(*contact_lists):
+    """Vereinigt Kontaktlisten (Schlüssel: Email, erster nicht leerer Name)."""
+    contacts = {}
+    for contact_list in contact_lists:
+        for contact in contact_list or []:
+            email = (contact.get("email") or "").lower()
+            if email and not contacts.get(email):
+                contacts[email] = contact.get("name") or ""
+    return [{"name": name, "email": email} for email, name in contacts.items()]
+
+
+def with_contacts(profile, contacts):
+    """Setzt die Kontakte in jedes Profil der Liste (Feldreihenfolge wie im Schema)."""
+    return [
+        {
+            "company_name": item.get("company_name", ""),
+            "contacts": contacts,
+            "products": item.get("products", []),
+            "summary": item.get("summary", ""),
+        }
+        for item in _as_profile_list(profile)
+    ]
+
+
+# -------------------------------
+# Nebenläufige Profil-Generierung
+# -------------------------------
+
+
+class LLMCallError(Exception):
+    """Ein LLM-Aufruf ist auch nach allen Wiederholungen fehlgeschlagen."""
+
+
+def _make_caller(client, key, semaphore, timeout, retries, backoff, stats):
+    """Coroutine-Funktion für einen LLM-Aufruf mit Timeout, Retry und Prüfung.
+
+    Die Antwort wird (bei ``PROFILE_STRUCTURED_OUTPUT`` per JSON-Schema
+    erzwungen) geparst, ggf. lokal repariert und gegen das Profil-Schema
+    geprüft. Nur wenn sie danach noch ungültig ist, wird genau dieser Aufruf
+    bis zu ``PROFILE_PARSE_RETRIES``-mal wiederholt. Jeder erfolgreiche
+    Aufruf wird mit den von Ollama gemeldeten Tokenzahlen
+    (``prompt_eval_count``, ``eval_count``) protokolliert, jede Prüfung als
+    ``profile_parse``.
+    """
+    response_format = LLM_PROFILE_SCHEMA if PROFILE_STRUCTURED_OUTPUT else None
+
+    async def request(prompt, stage):
+        messages = [{"role": "user", "content": prompt}]
+        error = None
+        stats["calls"] += 1
+        start = time.perf_counter()
+        for attempt in range(1, retries + 2):
+            stats["attempts"] += 1
+            # Slot nur für den eigentlichen Aufruf belegen, nicht während des Backoffs
+            async with semaphore:
+                try:
+                    response = await asyncio.wait_for(
+                        client.chat(
+                            model=MODEL, messages=messages, format=response_format
+                        ),
+                        timeout,
+                    )
+                except asyncio.TimeoutError:
+                    error = f"Timeout nach {timeout:g}s"
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                else:
+                    prompt_tokens = response.get("prompt_eval_count") or 0
+                    completion_tokens = response.get("eval_count") or 0
+                    stats["prompt_tokens"] += prompt_tokens
+                    stats["completion_tokens"] += completion_tokens
+                    record_metric(
+                        "llm_call",
+                        purpose=stage,
+                        key=key,
+                        prompt_chars=len(prompt),
+                        prompt_tokens=prompt_tokens,
+                        completion_tokens=completion_tokens,
+                        seconds=time.perf_counter() - start,
+                        **ollama_durations(response),
+                    )
+                    return response["message"]["content"].strip()
+            if attempt <= retries:
+                await asyncio.sleep(backoff * 2 ** (attempt - 1))
+        raise LLMCallError(error)
+
+    async def call(prompt, stage):
+        for parse_attempt in range(PROFILE_PARSE_RETRIES + 1):
+            profile, status = parse_profile(await request(prompt, stage))
+            stats[status] += 1
+            record_metric(
+                "profile_parse",
+                purpose=stage,
+                key=key,
+                status=status,
+                retry=parse_attempt,
+            )
+            if status != "invalid":
+                return profile, True
+            if parse_attempt < PROFILE_PARSE_RETRIES:
+                stats["parse_retries"] += 1
+        return profile, False
+
+    return call
+
+
+async def _generate_one(
+    client, key, emails, semaphore, timeout, retries, backoff, previous=None
+):
+    """Ein Profil mit Timeout und Retry (exponentielles Backoff) erzeugen.
+
+    Mit ``previous`` wird dieses Profil nur um ``emails`` (die neuen Mails)
+    ergänzt.
+    """
+    start = time.perf_counter()
+    stats = dict.fromkeys(
+        (
+            "calls",
+            "attempts",
+            "prompt_tokens",
+            "completion_tokens",
+            "valid",
+            "repaired",
+            "invalid",
+            "parse_retries",
+        ),
+        0,
+    )
+    call = _make_caller(client, key, semaphore, timeout, retries, backoff, stats)
+    try:
+        if previous is not None:
+            profile, ok = await update_profile(previous, emails, call)
+            contacts = merge_contacts(
+                _as_profile_list(previous)[0].get("contacts"), extract_contacts(emails)
+            )
+        else:
+            profile, ok = await build_profile(emails, call)
+            contacts = extract_contacts(emails)
+        if ok:
+            profile = with_contacts(profile, contacts)
+        error = None
+    except LLMCallError as e:
+        profile, ok, error = None, False, str(e)
+    return {
+        "key": key,
+        "mode": "full" if previous is None else "delta",
+        "profile": profile,
+        "ok": ok,
+        "error": error,
+        "calls": stats["calls"],
+        "attempts": stats["attempts"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "repaired": stats["repaired"],
+        "parse_failures": stats["invalid"],
+        "parse_retries": stats["parse_retries"],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+async def _generate_all(
+    jobs, on_result, max_concurrency, timeout, retries, backoff, host
+):
+    client = get_async_client(host)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [
+        asyncio.create_task(
+            _generate_one(
+                client,
+                key,
+                emails,
+                semaphore,
+                timeout,
+                retries,
+                backoff,
+                previous[0] if previous else None,
+            )
+        )
+        for key, emails, *previous in jobs
+    ]
+    results = []
+    for finished in asyncio.as_completed(tasks):
+        result = await finished
+        results.append(result)
+        if on_result:
+            on_result(result)
+    return results
+
+
+def generate_profiles_concurrently(
+    jobs,
+    on_result=None,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    timeout=LLM_TIMEOUT_SECONDS,
+    retries=LLM_RETRIES,
+    backoff=LLM_BACKOFF_SECONDS,
+    host=None,
+):
+    """Erzeugt mehrere Profile parallel über den asynchronen LLM-Client.
+
+    ``jobs`` ist eine Liste von (key, emails) oder, für eine
+    Delta-Aktualisierung, (key, neue emails, bisheriges Profil). Höchstens ``max_concurrency``
+    Anfragen laufen gleichzeitig; jeder LLM-Aufruf hat ein eigenes
+    ``timeout`` und wird bis zu ``retries``-mal mit Backoff wiederholt.
+    ``on_result`` wird für jedes Ergebnis aufgerufen, sobald es fertig ist
+    (Reihenfolge der Fertigstellung). Ein Ergebnis ist ein Dict mit
+    ``key``, ``mode`` (``full``/``delta``), ``profile``, ``ok``, ``error``,
+    ``calls``, ``attempts``,
+    ``prompt_tokens``, ``completion_tokens``, ``repaired``,
+    ``parse_failures``, ``parse_retries`` und ``seconds``; ``profile`` ist
+    ``None``, wenn ein Aufruf endgültig fehlgeschlagen ist.
+    """
+    return asyncio.run(
+        _generate_all(
+            list(jobs), on_result, max_concurrency, timeout, retries, backoff, host
+        )
+    )
+
+
+def generate_profile(emails):
+    """Erzeugt ein Kundenprofil aus dem Email-Verlauf (blockierend)."""
+    result = generate_profiles_concurrently([(None, emails)], max_concurrency=1)[0]
+    if result["profile"] is None:
+        raise LLMCallError(result["error"])
+    return result["profile"], result["ok"]
+
+
+# -------------------------------
+# Fingerprints (nur geänderte Firmen neu erzeugen)
+# -------------------------------
+
+
+def profile_fingerprint(mail_json_bytes):
+    """Fingerprint der Eingabe eines Profils: Email-JSON, Prompts, Schema und Modell."""
+    h = hashlib.sha256()
+    for part in (
+        MODEL,
+        PROFILE_PROMPT_TEMPLATE,
+        MAP_PROMPT_TEMPLATE,
+        REDUCE_PROMPT_TEMPLATE,
+        str(PROFILE_TOKEN_BUDGET),
+        json.dumps(LLM_PROFILE_SCHEMA if PROFILE_STRUCTURED_OUTPUT else None),
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    h.update(mail_json_bytes)
+    return h.hexdigest()
+
+
+def delta_config():
+    """Fingerprint der Einstellungen, unter denen ein Delta gültig bleibt."""
+    h = hashlib.sha256(profile_fingerprint(b"").encode("utf-8"))
+    h.update(DELTA_PROMPT_TEMPLATE.encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_fingerprints(path=PROFILE_FINGERPRINT_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_fingerprints(fingerprints, path=PROFILE_FINGERPRINT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_delta_state(path=PROFILE_DELTA_STATE_FILE):
+    """Je Profil: ``config``, ``mails`` (Digests) und ``deltas`` seit dem Neuaufbau."""
+    return load_fingerprints(path)
+
+
+def save_delta_state(states, path=PROFILE_DELTA_STATE_FILE):
+    save_fingerprints(states, path)
+
+
+def profile_path_for(mail_file):
+    """Pfad der Profil-JSON zu einer Email-JSON."""
+    return os.path.join(JSON_PROFILE_FOLDER, f"profil_{os.path.basename(mail_file)}")
+
+
+def plan_profile_refresh(force=False, fingerprints=None, keep=(), states=None):
+    """Ermittelt, welche Profile neu erzeugt werden müssen.
+
+    Gibt eine Liste von Dicts mit ``mail_file``, ``profile_file``,
+    ``fingerprint``, ``digests`` (je Mail), ``dirty`` und ``mode`` zurück.
+    Mit ``force`` sind alle dirty, außer Email-JSONs in ``keep``
+    (Dateiname), deren Profil aktuell ist. Ein geändertes Profil bekommt
+    ``mode="delta"`` und ``new_mails``, wenn laut ``states`` seit der
+    letzten Erzeugung nur Mails hinzugekommen sind, die Einstellungen gleich
+    sind und noch keine ``PROFILE_FULL_REBUILD_EVERY`` Deltas erfolgt sind;
+    sonst ``mode="full"``.
+    """
+    if fingerprints is None:
+        fingerprints = load_fingerprints()
+    if states is None:
+        states = load_delta_state()
+    config = delta_config()
+
+    plan = []
+    for mail_file in sorted(glob.glob(os.path.join(JSON_MAIL_FOLDER, "*.json"))):
+        with open(mail_file, "rb") as f:
+            data = f.read()
+        fingerprint = profile_fingerprint(data)
+        try:
+            mails = json.loads(data)
+            digests = [mail_digest(mail) for mail in mails]
+        except (ValueError, TypeError):
+            mails, digests = None, None
+        profile_file = profile_path_for(mail_file)
+        forced = force and os.path.basename(mail_file) not in keep
+        item = {
+            "mail_file": mail_file,
+            "profile_file": profile_file,
+            "fingerprint": fingerprint,
+            "digests": digests,
+            "dirty": (
+                forced
+                or fingerprints.get(os.path.basename(profile_file)) != fingerprint
+                or not os.path.exists(profile_file)
+            ),
+            "mode": "full",
+        }
+        state = states.get(os.path.basename(profile_file))
+        if (
+            item["dirty"]
+            and not forced
+            and digests is not None
+            and state
+            and state["config"] == config
+            and state["deltas"] < PROFILE_FULL_REBUILD_EVERY
+            and os.path.exists(profile_file)
+        ):
+            known = set(state["mails"])
+            new_mails = [m for m, d in zip(mails, digests) if d not in known]
+            if new_mails and known <= set(digests):
+                item["mode"], item["new_mails"] = "delta", new_mails
+        plan.append(item)
+    return plan
+
+
+def profile_company_name(profile):
+    """``company_name`` eines Profils (auch als Liste gespeichert) oder ``None``."""
+    if isinstance(profile, list) and profile:
+        profile = profile[0]
+    return profile.get("company_name") if isinstance(profile, dict) else None
+
+
+def store_profile(
+    item, profile, ok, fingerprints, store=None, aliases=None, states=None
+):
+    """Speichert ein erzeugtes Profil und merkt sich dessen Fingerprint.
+
+    Die Datei wird atomar ersetzt. Der Fingerprint wird nur bei gültigem
+    Profil gespeichert, damit fehlgeschlagene Profile beim nächsten
+    Aktualisieren erneut erzeugt werden; ein vorhandenes Profil wird dann
+    nicht durch den Rohtext ersetzt (Rückgabe ``None``).
+    Mit ``store`` (``MailStore``) wird das Profil zusätzlich dort abgelegt,
+    mit ``aliases`` (``CompanyAliasIndex``) der Firmenname als Alias, in
+    ``states`` die berücksichtigten Mails für spätere Delta-Aktualisierungen.
+    """
+    output_file = item["profile_file"]
+    name = os.path.basename(output_file)
+    if states is not None and (not ok or item["digests"] is None):
+        states.pop(name, None)
+    elif states is not None:
+        previous = states.get(name) or {}
+        states[name] = {
+            "config": delta_config(),
+            "mails": item["digests"],
+            "deltas": previous.get("deltas", 0) + 1 if item["mode"] == "delta" else 0,
+        }
+    if states is not None:
+        save_delta_state(states)
+    if not ok and os.path.exists(output_file):
+        fingerprints.pop(name, None)
+        save_fingerprints(fingerprints)
+        return None
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    tmp_path = output_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_file)
+    company = os.path.splitext(os.path.basename(item["mail_file"]))[0]
+    if store is not None:
+        store.upsert_profile(company, profile)
+    if aliases is not None and ok:
+        aliases.add_name(profile_company_name(profile), company)
+
+    if ok:
+        fingerprints[name] = item["fingerprint"]
+    else:
+        fingerprints.pop(name, None)
+    save_fingerprints(fingerprints)
+    return output_file
+
+
+def remove_orphan_profiles(fingerprints, store=None, states=None):
+    """Löscht Profile, zu denen es keine Email-JSON mehr gibt."""
+    mail_files = glob.glob(os.path.join(JSON_MAIL_FOLDER, "*.json"))
+    active = {os.path.basename(profile_path_for(p)) for p in mail_files}
+    if store is not None:
+        store.delete_profiles_except(
+            os.path.splitext(os.path.basename(p))[0] for p in mail_files
+        )
+    removed = 0
+    for p in glob.glob(os.path.join(JSON_PROFILE_FOLDER, "*.json")):
+        name = os.path.basename(p)
+        if name in active:
+            continue
+        try:
+            os.remove(p)
+            removed += 1
+        except OSError:
+            pass
+        fingerprints.pop(name, None)
+    for name in [name for name in states or {} if name not in active]:
+        del states[name]
+    return removed
+
+
+def refresh_profiles(
+    force=False,
+    on_result=None,
+    on_load_error=None,
+    store=None,
+    keep=(),
+    **llm_options,
+):
+    """Aktualisiert alle Kundenprofile (ohne Oberfläche, z. B. für CLI und GUI).
+
+    Löscht verwaiste Profile, erzeugt nur Profile mit geändertem Fingerprint
+    (mit ``force`` alle außer den aktuellen in ``keep``) und speichert sie.
+    Sind zu einer Firma nur Mails hinzugekommen, wird das bisherige Profil
+    mit den neuen Mails aktualisiert (Delta), sofern der Prompt ins
+    Token-Budget passt; ``force`` erzwingt den vollständigen Neuaufbau.
+    ``on_result(result, output_file, done, total)`` wird je fertigem Profil
+    aufgerufen (``output_file`` ist ``None``, wenn das Profil nicht erzeugt
+    wurde oder das bisherige erhalten bleibt),
+    ``on_load_error(filename, error)`` für unlesbare Email-JSONs. Mit
+    ``store`` werden die Profile zusätzlich in SQLite gespeichert. Die
+    Firmennamen der Profile landen im Alias-Index. Weitere
+    Schlüsselwörter gehen an ``generate_profiles_concurrently``.
+    """
+    fingerprints = load_fingerprints()
+    states = load_delta_state()
+    removed = remove_orphan_profiles(fingerprints, store=store, states=states)
+    plan = plan_profile_refresh(
+        force=force, fingerprints=fingerprints, keep=keep, states=states
+    )
+    aliases = CompanyAliasIndex.load()
+
+    jobs, items = [], {}
+    for item in plan:
+        if not item["dirty"]:
+            continue
+        filename = os.path.basename(item["mail_file"])
+        if item["mode"] == "delta":
+            try:
+                with open(item["profile_file"], "r", encoding="utf-8") as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = None
+            prompt = build_delta_prompt(previous, item["new_mails"])
+            if previous is not None and estimate_tokens(prompt) <= PROFILE_TOKEN_BUDGET:
+                jobs.append((filename, item["new_mails"], previous))
+                items[filename] = item
+                continue
+            item["mode"] = "full"
+        with open(item["mail_file"], "r", encoding="utf-8") as f:
+            try:
+                jobs.append((filename, json.load(f)))
+                items[filename] = item
+            except Exception as e:
+                if on_load_error:
+                    on_load_error(filename, e)
+
+    # Unveränderte Profile, die in SQLite oder im Alias-Index noch fehlen
+    # (z. B. nach dem Umstellen auf MDZ_STORAGE=sqlite), ohne LLM-Aufruf übernehmen
+    stored = store.profile_companies() if store is not None else None
+    named = set(aliases.names.values())
+    config = delta_config()
+    for item in plan:
+        # Aktuelle Profile ohne Delta-Stand (z. B. aus älteren Versionen) übernehmen
+        name = os.path.basename(item["profile_file"])
+        if not item["dirty"] and item["digests"] is not None and name not in states:
+            states[name] = {"config": config, "mails": item["digests"], "deltas": 0}
+
+        company = os.path.splitext(os.path.basename(item["mail_file"]))[0]
+        in_store = stored is None or company in stored
+        if item["dirty"] or (in_store and company in named):
+            continue
+        try:
+            with open(item["profile_file"], "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not in_store:
+            store.upsert_profile(company, profile)
+        aliases.add_name(profile_company_name(profile), company)
+
+    finished = []
+
+    def store_result(result):
+        output_file = None
+        if result["profile"] is not None:
+            output_file = store_profile(
+                items[result["key"]],
+                result["profile"],
+                result["ok"],
+                fingerprints,
+                store=store,
+                aliases=aliases,
+                states=states,
+            )
+        finished.append(result["key"])
+        if on_result:
+            on_result(result, output_file, len(finished), len(jobs))
+
+    start = time.perf_counter()
+    results = (
+        generate_profiles_concurrently(jobs, on_result=store_result, **llm_options)
+        if jobs
+        else []
+    )
+    save_fingerprints(fingerprints)
+    save_delta_state(states)
+    aliases.save()
+
+    summary = {
+        "removed": removed,
+        "skipped": sum(1 for item in plan if not item["dirty"]),
+        "regenerated": sum(1 for r in results if r["profile"] is not None),
+        "delta_updates": sum(
+            1 for r in results if r["profile"] is not None and r["mode"] == "delta"
+        ),
+        "raw_output": sum(
+            1 for r in results if r["profile"] is not None and not r["ok"]
+        ),
+        "failed": sum(1 for r in results if r["profile"] is None),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in results),
+        "completion_tokens": sum(r["completion_tokens"] for r in results),
+        "repaired": sum(r["repaired"] for r in results),
+        "parse_failures": sum(r["parse_failures"] for r in results),
+        "parse_retries": sum(r["parse_retries"] for r in results),
+        "seconds": time.perf_counter() - start,
+    }
+    record_metric("profile_refresh", **summary)
+    summary["results"] = results
+    return summary
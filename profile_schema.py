@@ -0,0 +1,193 @@
+import json
+import re
+from email.utils import parseaddr
+
+# -------------------------------
+# JSON-Schema der Kundenprofile (für Ollamas ``format``)
+# -------------------------------
+
+PROFILE_FIELDS = ("company_name", "contacts", "products", "summary")
+
+PROFILE_OBJECT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "company_name": {"type": "string"},
+        "contacts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "email": {"type": "string"},
+                },
+                "required": ["name", "email"],
+            },
+        },
+        "products": {"type": "array", "items": {"type": "string"}},
+        "summary": {"type": "string"},
+    },
+    "required": list(PROFILE_FIELDS),
+}
+
+# Die Prompts verlangen ein JSON-Array mit einem Profil je Firma
+PROFILE_SCHEMA = {"type": "array", "items": PROFILE_OBJECT_SCHEMA, "minItems": 1}
+
+# Was das LLM liefert: Kontakte kommen deterministisch aus den Mail-Headern
+LLM_PROFILE_FIELDS = ("company_name", "products", "summary")
+
+LLM_PROFILE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            field: PROFILE_OBJECT_SCHEMA["properties"][field]
+            for field in LLM_PROFILE_FIELDS
+        },
+        "required": list(LLM_PROFILE_FIELDS),
+    },
+    "minItems": 1,
+}
+
+
+# -------------------------------
+# Prüfen und Normalisieren
+# -------------------------------
+
+
+def _contact(value):
+    """Kontakt als {name, email}; Strings wie "Name <mail>" werden zerlegt."""
+    if isinstance(value, str):
+        name, email = parseaddr(value)
+        return {"name": name or value.strip(), "email": email}
+    if isinstance(value, dict):
+        return {
+            "name": str(value.get("name") or ""),
+            "email": str(value.get("email") or ""),
+        }
+    return None
+
+
+def validate_profile(data):
+    """Prüft ein geparstes Profil gegen das Schema und normalisiert es.
+
+    Gibt (Profil-Liste, Fehler, angepasst) zurück. Kleine Abweichungen
+    (einzelnes Objekt statt Array, Produkte als kommagetrennter Text,
+    Kontakte als "Name <mail>") werden korrigiert und setzen ``angepasst``.
+    """
+    errors, coerced = [], False
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not data:
+        return [], ["kein Profil (Objekt oder Array) gefunden"], coerced
+
+    profiles = []
+    for i, item in enumerate(data):
+        if not isinstance(item, dict):
+            errors.append(f"Profil {i}: kein Objekt")
+            continue
+        company_name = item.get("company_name")
+        summary = item.get("summary")
+        if not isinstance(company_name, str) or not company_name.strip():
+            errors.append(f"Profil {i}: company_name fehlt")
+        if not isinstance(summary, str):
+            errors.append(f"Profil {i}: summary fehlt")
+
+        contacts = item.get("contacts") or []
+        if not isinstance(contacts, list):
+            contacts, coerced = [contacts], True
+        normalized_contacts = [c for c in map(_contact, contacts) if c is not None]
+        if normalized_contacts != contacts:
+            coerced = True
+
+        products = item.get("products") or []
+        if isinstance(products, str):
+            products, coerced = [p.strip() for p in products.split(",")], True
+        if not isinstance(products, list):
+            products, coerced = [products], True
+        normalized_products = [str(p) for p in products if p not in (None, "")]
+        if normalized_products != products:
+            coerced = True
+
+        if set(item) - set(PROFILE_FIELDS):
+            coerced = True
+        profiles.append(
+            {
+                "company_name": (company_name or "").strip(),
+                "contacts": normalized_contacts,
+                "products": normalized_products,
+                "summary": summary or "",
+            }
+        )
+    return profiles, errors, coerced
+
+
+# -------------------------------
+# Reparatur fast gültiger Ausgaben
+# -------------------------------
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"'})
+
+
+def _close_brackets(text):
+    """Schließt offene Strings und Klammern (abgeschnittene Ausgabe)."""
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            stack.append("]" if char == "[" else "}")
+        elif char in "]}" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",:")
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text):
+    """Versucht, fast gültiges JSON zu retten; gibt das Objekt oder ``None`` zurück.
+
+    Entfernt Markdown-Zäune und Text um das JSON, typografische
+    Anführungszeichen und Kommas vor schließenden Klammern und schließt
+    abgeschnittene Ausgaben.
+    """
+    text = _FENCE.sub("", text).translate(_SMART_QUOTES)
+    starts = [i for i in (text.find("["), text.find("{")) if i >= 0]
+    if not starts:
+        return None
+    text = _TRAILING_COMMA.sub(r"\1", text[min(starts) :].strip())
+    decoder = json.JSONDecoder()
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", _close_brackets(text))):
+        try:
+            return decoder.raw_decode(candidate)[0]
+        except ValueError:
+            continue
+    return None
+
+
+def parse_profile(output_text):
+    """Wandelt die LLM-Antwort in ein geprüftes Profil um.
+
+    Gibt (Profil, Status) zurück; Status ist ``valid``, ``repaired``
+    (Reparatur oder Normalisierung war nötig) oder ``invalid`` – dann ist
+    das Profil ``{"raw_output": ...}``.
+    """
+    try:
+        data, repaired = json.loads(_FENCE.sub("", output_text).strip()), False
+    except ValueError:
+        data, repaired = repair_json(output_text), True
+    if data is None:
+        return {"raw_output": output_text}, "invalid"
+    profiles, errors, coerced = validate_profile(data)
+    if errors:
+        return {"raw_output": output_text}, "invalid"
+    return profiles, "repaired" if repaired or coerced else "valid"
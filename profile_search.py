@@ -0,0 +1,185 @@
+import difflib
+import math
+import re
+from collections import Counter, defaultdict
+
+# -------------------------------
+# Normalisierung von Firmennamen
+# -------------------------------
+
+
+def normalize_key(name: str) -> str:
+    name = (
+        name.lower()
+        .replace("_", "-")
+        .replace(" ", "-")
+        .replace("ä", "ae")
+        .replace("ö", "oe")
+        .replace("ü", "ue")
+        .replace("ß", "ss")
+    )
+    # Firmen-Rechtsformen entfernen
+    for suffix in ["-gmbh", "-mbh", "-ag", "-kg", "-ug", "-inc", "-ltd"]:
+        if name.endswith(suffix):
+            name = name.replace(suffix, "")
+    return name.strip("-")
+
+
+def find_best_key(expected: str, keys: list[str]) -> str | None:
+    expected_norm = normalize_key(expected)
+    normalized_keys = {normalize_key(k): k for k in keys}
+
+    # 1️⃣ Direkter exakter Treffer
+    if expected_norm in normalized_keys:
+        return normalized_keys[expected_norm]
+
+    # 2️⃣ Fuzzy-Matching (findet auch Tippfehler oder Teilmatches)
+    best_match = difflib.get_close_matches(
+        expected_norm, normalized_keys.keys(), n=1, cutoff=0.6
+    )
+    if best_match:
+        return normalized_keys[best_match[0]]
+
+    return None
+
+
+# -------------------------------
+# BM25-Index über die Kundenprofile
+# -------------------------------
+
+STOPWORDS = set("""
+    der die das den dem des ein eine einen einem und oder zu zum zur von vom mit
+    bei fuer auf an am im in ist sind hat haben wie was welche welcher welches wer
+    wo noch uns wir sie er es nicht bisher viele herr frau gmbh ag kg mbh
+    """.split())
+
+# Gewichte der Profilfelder (Tokens werden entsprechend oft gezählt)
+FIELD_WEIGHTS = {"company_name": 3, "contacts": 2, "products": 2, "summary": 1}
+
+# Zusatzpunkte, wenn ein Firmen- oder Kontaktname in der Frage vorkommt
+NAME_BOOST = 10.0
+
+
+def tokenize(text):
+    """Zerlegt Text in normalisierte Suchbegriffe (wie ``normalize_key``)."""
+    text = (
+        text.lower()
+        .replace("ä", "ae")
+        .replace("ö", "oe")
+        .replace("ü", "ue")
+        .replace("ß", "ss")
+    )
+    return [t for t in re.findall(r"[a-z0-9]+", text) if len(t) > 1]
+
+
+def _profile_fields(profile):
+    contacts = profile.get("contacts") or []
+    products = profile.get("products") or []
+    return {
+        "company_name": str(profile.get("company_name", "")),
+        "contacts": " ".join(
+            f"{c.get('name', '')} {c.get('email', '')}"
+            for c in contacts
+            if isinstance(c, dict)
+        ),
+        "products": " ".join(str(p) for p in products),
+        "summary": str(profile.get("summary", "")),
+    }
+
+
+def _name_tokens(key, profile):
+    """Tokens, die eine Firma bzw. ihre Kontakte eindeutig benennen."""
+    fields = _profile_fields(profile)
+    names = set(tokenize(normalize_key(key)))
+    names.update(tokenize(normalize_key(fields["company_name"])))
+    for contact in profile.get("contacts") or []:
+        if isinstance(contact, dict):
+            names.update(tokenize(contact.get("name", "")))
+    return {t for t in names if t not in STOPWORDS and len(t) > 2}
+
+
+class ProfileIndex:
+    """Invertierter Index (BM25) über Firmennamen, Kontakte, Produkte und Summaries."""
+
+    def __init__(self, profiles, k1=1.5, b=0.75):
+        self.k1, self.b = k1, b
+        self.keys = list(profiles)
+        self.postings = defaultdict(dict)
+        self.lengths = []
+        self.name_index = defaultdict(set)
+
+        for doc_id, key in enumerate(self.keys):
+            profile = profiles[key]
+            if not isinstance(profile, dict):
+                profile = {"summary": str(profile)}
+            counts = Counter()
+            for field, text in _profile_fields(profile).items():
+                for token in tokenize(text):
+                    if token not in STOPWORDS:
+                        counts[token] += FIELD_WEIGHTS[field]
+            for token, tf in counts.items():
+                self.postings[token][doc_id] = tf
+            self.lengths.append(sum(counts.values()))
+            for token in _name_tokens(key, profile):
+                self.name_index[token].add(doc_id)
+
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        self.name_vocabulary = list(self.name_index)
+
+    def _bm25(self, tokens):
+        scores = defaultdict(float)
+        n_docs = len(self.keys)
+        for token in set(tokens):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = 1 - self.b + self.b * self.lengths[doc_id] / self.avg_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+        return scores
+
+    def matched_names(self, query):
+        """Profile, deren Firmen- oder Kontaktname (auch unscharf) in der Frage steht."""
+        hits = set()
+        for token in tokenize(query):
+            if token in STOPWORDS or len(token) < 3:
+                continue
+            if token in self.name_index:
+                hits |= self.name_index[token]
+                continue
+            for match in difflib.get_close_matches(
+                token, self.name_vocabulary, n=2, cutoff=0.75
+            ):
+                hits |= self.name_index[match]
+        return hits
+
+    def search(self, query, k=5):
+        """Gibt die Keys der ``k`` relevantesten Profile zurück (beste zuerst).
+
+        Profile, deren Firmen- oder Kontaktname in der Frage vorkommt, werden
+        hochgewichtet. Leere Liste, wenn nichts passt.
+        """
+        scores = self._bm25([t for t in tokenize(query) if t not in STOPWORDS])
+        for doc_id in self.matched_names(query):
+            scores[doc_id] += NAME_BOOST
+        ranked = sorted(
+            (doc_id for doc_id, score in scores.items() if score > 0),
+            key=lambda doc_id: -scores[doc_id],
+        )
+        return [self.keys[doc_id] for doc_id in ranked[:k]]
+
+
+def select_profiles(query, profiles, index=None, k=5, fallback=20):
+    """Wählt die für eine Frage relevanten Profile aus.
+
+    Passt kein Profil, werden bis zu ``fallback`` Profile unverändert
+    übernommen, damit allgemeine Fragen ("Welcher Kunde …?") weiter
+    beantwortet werden können.
+    """
+    if index is None:
+        index = ProfileIndex(profiles)
+    keys = [key for key in index.search(query, k) if key in profiles]
+    if not keys:
+        keys = list(profiles)[:fallback]
+    return {key: profiles[key] for key in keys}
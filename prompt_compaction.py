@@ -0,0 +1,82 @@
+import json
+import re
+import textwrap
+from collections import Counter, defaultdict
+
+# Felder, die der Profil-Prompt aus einer Mail braucht (filename z. B. nicht)
+PROFILE_MAIL_FIELDS = ("date", "from_email", "subject", "body")
+
+# Länge (in Zeilen), bis zu der ein wiederkehrender Mail-Schluss als Signatur gilt
+MAX_SIGNATURE_LINES = 8
+
+_TRAILING_SPACES = re.compile(r"[ \t]+\n")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def compact_json(data):
+    """JSON ohne Einrückung und Leerzeichen nach Trennzeichen."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_template(template):
+    """Entfernt die Quelltext-Einrückung aus einer Prompt-Vorlage."""
+    return textwrap.dedent(template).strip()
+
+
+def compact_text(text):
+    """Entfernt Leerzeichen am Zeilenende und mehrfache Leerzeilen."""
+    text = _TRAILING_SPACES.sub("\n", text.replace("\r\n", "\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _signature_candidates(lines):
+    """Alle Zeilen-Suffixe (2 bis MAX_SIGNATURE_LINES) als Tupel."""
+    return [
+        tuple(lines[-n:])
+        for n in range(2, min(MAX_SIGNATURE_LINES, len(lines) - 1) + 1)
+    ]
+
+
+def strip_repeated_signatures(emails):
+    """Kürzt Signaturen, die ein Absender in mehreren Mails wiederholt.
+
+    Die Signatur bleibt in der ersten Mail des Absenders erhalten und wird
+    in allen weiteren entfernt. Als Signatur gilt der längste Block von
+    Schlusszeilen, der bei mindestens zwei Mails desselben Absenders
+    identisch ist.
+    """
+    by_sender = defaultdict(list)
+    for i, mail in enumerate(emails):
+        body = mail.get("body") or ""
+        by_sender[(mail.get("from_email") or "").lower()].append((i, body.split("\n")))
+
+    result = [dict(mail) for mail in emails]
+    for mails in by_sender.values():
+        if len(mails) < 2:
+            continue
+        counts = Counter(
+            suffix for _, lines in mails for suffix in _signature_candidates(lines)
+        )
+        seen = set()
+        for i, lines in mails:
+            repeated = [s for s in _signature_candidates(lines) if counts[s] >= 2]
+            if not repeated:
+                continue
+            signature = max(repeated, key=len)
+            if signature in seen:
+                result[i]["body"] = "\n".join(lines[: -len(signature)]).rstrip()
+            seen.add(signature)
+    return result
+
+
+def compact_emails(emails, fields=PROFILE_MAIL_FIELDS):
+    """Mail-Liste für den Prompt: nur benötigte Felder, bereinigter Text, ohne Signatur-Wiederholungen."""
+    reduced = []
+    for mail in emails:
+        item = {k: mail.get(k) for k in fields if mail.get(k) not in (None, "")}
+        if isinstance(item.get("body"), str):
+            item["body"] = compact_text(item["body"])
+        reduced.append(item)
+    if "body" in fields:
+        reduced = strip_repeated_signatures(reduced)
+    return reduced
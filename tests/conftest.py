@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Module liegen flach im Projektordner
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests sollen keine Messwerte nach data/metrics schreiben
+os.environ.setdefault("MDZ_METRICS", "0")
@@ -0,0 +1,63 @@
+import os
+
+from answer_cache import AnswerCache
+
+
+def test_hits_do_not_rewrite_the_file(tmp_path):
+    path = str(tmp_path / "answer_cache.json")
+    cache = AnswerCache(path, save_interval=3600)
+    cache.put("Welche Firma?", "fp", "Technofab")
+    mtime = os.stat(path).st_mtime_ns
+
+    for _ in range(3):
+        assert cache.get("welche firma", "fp") == "Technofab"
+    assert os.stat(path).st_mtime_ns == mtime
+
+    cache.flush()
+    reloaded = AnswerCache(path)
+    assert reloaded.get("Welche Firma?", "fp") == "Technofab"
+    assert next(iter(reloaded._entries.values()))["hits"] == 4
+
+
+def test_stale_answers_are_dropped_when_full(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answer_cache.json"), max_entries=2)
+    cache.put("a", "alt", "1")
+    cache.put("b", "neu", "2")
+    assert len(cache) == 2
+    cache.put("c", "neu", "3")
+    assert len(cache) == 2
+    assert cache.get("a", "alt") is None
+    assert cache.get("b", "neu") == "2"
+
+
+def test_instances_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / "answer_cache.json")
+    gui = AnswerCache(path, save_interval=0)
+    worker = AnswerCache(path)
+    worker.put("Vorab", "fp", "aus dem Worker")
+
+    gui.put("Frage", "fp", "aus der Oberfläche")
+    assert gui.get("Vorab", "fp") == "aus dem Worker"
+    assert len(AnswerCache(path)) == 2
+
+
+def test_hits_do_not_restore_pruned_answers(tmp_path):
+    path = str(tmp_path / "answer_cache.json")
+    gui = AnswerCache(path, save_interval=3600)
+    gui.put("Frage", "alt", "1")
+    assert gui.get("Frage", "alt") == "1"
+
+    assert AnswerCache(path).prune("neu") == 1
+    gui.flush()
+    assert len(AnswerCache(path)) == 0
+
+
+def test_replaced_instance_is_flushed(tmp_path):
+    path = str(tmp_path / "answer_cache.json")
+    old = AnswerCache(path, save_interval=3600)
+    old.put("Frage", "fp", "1")
+    old.get("Frage", "fp")
+
+    # z. B. nach get_answer_cache.clear(): die alte Instanz schreibt vorher
+    new = AnswerCache(path)
+    assert next(iter(new._entries.values()))["hits"] == 1
@@ -0,0 +1,40 @@
+from company_aliases import CompanyAliasIndex
+
+
+def test_save_merges_aliases_of_concurrent_writers(tmp_path):
+    path = str(tmp_path / "company_aliases.json")
+    initial = CompanyAliasIndex()
+    initial.set_companies({"technofab.de": "technofab_de"})
+    initial.save(path)
+
+    # Profil-Worker und Einlesen laden denselben Stand ...
+    worker = CompanyAliasIndex.load(path)
+    ingest = CompanyAliasIndex.load(path)
+    worker.add_name("TechnoFab Anlagenbau GmbH", "technofab_de")
+    worker.save(path)
+    # ... das Einlesen speichert zuletzt und darf den Namen nicht verlieren
+    ingest.set_companies(
+        {"technofab.de": "technofab_de", "technomech.de": "technomech_de"}
+    )
+    ingest.save(path)
+
+    merged = CompanyAliasIndex.load(path)
+    assert merged.resolve("TechnoFab Anlagenbau") == "technofab_de"
+    assert merged.resolve("technomech.de") == "technomech_de"
+    assert ingest.resolve("TechnoFab Anlagenbau GmbH") == "technofab_de"
+
+
+def test_save_does_not_restore_removed_companies(tmp_path):
+    path = str(tmp_path / "company_aliases.json")
+    initial = CompanyAliasIndex()
+    initial.set_companies({"alt.de": "alt_de", "neu.de": "neu_de"})
+    initial.save(path)
+
+    worker = CompanyAliasIndex.load(path)
+    ingest = CompanyAliasIndex.load(path)
+    ingest.set_companies({"neu.de": "neu_de"})
+    ingest.save(path)
+    worker.add_name("Alt GmbH", "alt_de")
+    worker.save(path)
+
+    assert CompanyAliasIndex.load(path).resolve("Alt GmbH") is None
@@ -0,0 +1,30 @@
+import os
+
+from mail_ingest import parse_eml_file, split_address
+from profile_generation import extract_contacts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TECHNOFAB = os.path.join(ROOT, "Kundenmails_Original", "TechnoFab", "TechnoFab_02.eml")
+
+
+def test_split_address_without_angle_brackets():
+    assert split_address("", "Thomas Berger t.berger@technofab.de") == (
+        "Thomas Berger",
+        "t.berger@technofab.de",
+    )
+    assert split_address("Erika", "erika@firma.de") == ("Erika", "erika@firma.de")
+
+
+def test_contacts_from_malformed_technofab_headers():
+    record = parse_eml_file(TECHNOFAB, "TechnoFab_02.eml")
+    assert "Thomas Berger <t.berger@technofab.de>" in record["addresses"]
+    assert extract_contacts([record]) == [
+        {"name": "Thomas Berger", "email": "t.berger@technofab.de"}
+    ]
+
+
+def test_contacts_from_old_json_without_addresses():
+    mail = {"from_email": "Thomas Berger t.berger@technofab.de"}
+    assert extract_contacts([mail]) == [
+        {"name": "Thomas Berger", "email": "t.berger@technofab.de"}
+    ]
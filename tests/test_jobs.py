@@ -0,0 +1,70 @@
+import time
+
+from jobs import MAX_ATTEMPTS, JobQueue, job_handler, run_job
+
+
+def test_claim_takes_oldest_queued_job_once(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    first = queue.enqueue("refresh", {"force": True})
+    # Gleicher wartender Job wird nicht doppelt angelegt
+    assert queue.enqueue("refresh", {"force": True})["id"] == first["id"]
+    second = queue.enqueue("refresh")
+
+    job = queue.claim()
+    assert (job["id"], job["status"], job["attempts"]) == (first["id"], "running", 1)
+    assert job["params"] == {"force": True}
+    assert queue.claim()["id"] == second["id"]
+    assert queue.claim() is None
+
+
+def test_stale_job_is_claimed_again_with_checkpoint(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), stale_seconds=0.2)
+    job = queue.enqueue("refresh")
+    queue.claim()
+    queue.heartbeat(job["id"], done=1, total=3, checkpoint=["firma_a"])
+    assert queue.claim() is None  # Lebenszeichen ist frisch
+
+    time.sleep(0.3)
+    again = queue.claim()
+    assert (again["id"], again["attempts"]) == (job["id"], 2)
+    assert again["checkpoint"] == ["firma_a"]
+    assert (again["done"], again["total"]) == (1, 3)
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), stale_seconds=0.1)
+    job = queue.enqueue("refresh")
+    for _ in range(MAX_ATTEMPTS):
+        assert queue.claim()["id"] == job["id"]
+        time.sleep(0.15)
+
+    assert queue.claim() is None
+    failed = queue.get(job["id"])
+    assert (failed["status"], failed["attempts"]) == ("failed", MAX_ATTEMPTS)
+    assert failed["error"]
+
+
+def test_run_job_records_result_and_error(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+    @job_handler("test_ok")
+    def ok(params, progress, checkpoint):
+        progress(1, 1, "fertig")
+        return {"value": params["value"]}
+
+    @job_handler("test_error")
+    def error(params, progress, checkpoint):
+        raise RuntimeError("kaputt")
+
+    queue.enqueue("test_ok", {"value": 42})
+    queue.enqueue("test_error")
+    run_job(queue, queue.claim())
+    run_job(queue, queue.claim())
+
+    done, failed = sorted(queue.jobs(), key=lambda j: j["id"])
+    assert (done["status"], done["result"], done["message"]) == (
+        "done",
+        {"value": 42},
+        "fertig",
+    )
+    assert (failed["status"], failed["error"]) == ("failed", "kaputt")
@@ -0,0 +1,35 @@
+import asyncio
+
+from llm_client import AsyncRecordingClient, AsyncReplayClient, Recordings
+
+
+class FakeAsyncOllama:
+    async def chat(self, model, messages, stream=False, format=None, options=None):
+        async def chunks():
+            for text in ("Hallo", " Welt"):
+                yield {"message": {"role": "assistant", "content": text}}
+            yield {
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "eval_count": 2,
+            }
+
+        return chunks()
+
+
+async def _collect(client, messages):
+    stream = await client.chat(model="m", messages=messages, stream=True)
+    return "".join([chunk["message"]["content"] async for chunk in stream])
+
+
+def test_async_streaming_record_and_replay(tmp_path):
+    recordings = Recordings(str(tmp_path / "recordings.jsonl"))
+    messages = [{"role": "user", "content": "Frage: Hallo?"}]
+
+    recorder = AsyncRecordingClient(FakeAsyncOllama(), recordings)
+    assert asyncio.run(_collect(recorder, messages)) == "Hallo Welt"
+
+    replay = AsyncReplayClient(
+        Recordings(recordings.path), first_token=0, per_token=0, concurrency=1
+    )
+    assert asyncio.run(_collect(replay, messages)) == "Hallo Welt"
@@ -0,0 +1,90 @@
+import json
+import os
+import zlib
+
+import numpy as np
+
+from mail_index import MailIndex
+
+
+class FakeEmbedClient:
+    """Bettet Texte als Wort-Histogramm ein (8 Dimensionen)."""
+
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, model, input):
+        self.texts.extend(input)
+        vectors = []
+        for text in input:
+            vector = [0.0] * 8
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode("utf-8")) % 8] += 1.0
+            vectors.append(vector)
+        return {"embeddings": vectors}
+
+
+def _write(folder, company, bodies):
+    mails = [
+        {
+            "filename": f"{company}_{i}.eml",
+            "date": None,
+            "subject": "Anfrage",
+            "body": body,
+        }
+        for i, body in enumerate(bodies)
+    ]
+    with open(os.path.join(folder, f"{company}.json"), "w", encoding="utf-8") as f:
+        json.dump(mails, f)
+
+
+def _search(index, client, text):
+    query = np.asarray(client.embed("m", [text])["embeddings"][0])
+    return index.search(query, k=1)[0]
+
+
+def test_update_embeds_only_new_passages(tmp_path):
+    mails = tmp_path / "mails"
+    mails.mkdir()
+    _write(mails, "firma_a", ["Ventile bestellt", "Lieferung verspätet"])
+    _write(mails, "firma_b", ["Rechnung offen"])
+    client = FakeEmbedClient()
+    index = MailIndex(str(tmp_path / "index"), model="m")
+
+    stats = index.update(str(mails), client=client)
+    assert (stats["embedded"], stats["passages"]) == (3, 3)
+    assert index.update(str(mails), client=client)["embedded"] == 0
+
+    # Geänderte Firma: unveränderte Passage wird wiederverwendet
+    _write(mails, "firma_a", ["Ventile bestellt", "Reklamation Dichtung"])
+    client.texts.clear()
+    stats = index.update(str(mails), client=client)
+    assert (stats["embedded"], stats["reused"], stats["removed"]) == (1, 1, 1)
+    assert client.texts == ["Anfrage\nReklamation Dichtung"]
+
+    reopened = MailIndex(str(tmp_path / "index"), model="m")
+    assert len(reopened) == 3
+    assert _search(reopened, client, "Reklamation Dichtung")["company"] == "firma_a"
+    assert _search(reopened, client, "Rechnung offen")["company"] == "firma_b"
+
+
+def test_update_compacts_when_most_rows_are_free(tmp_path):
+    mails = tmp_path / "mails"
+    mails.mkdir()
+    _write(mails, "firma_a", ["Ventile bestellt"])
+    _write(mails, "firma_b", ["Rechnung offen", "Mahnung", "Zahlung erhalten"])
+    client = FakeEmbedClient()
+    folder = tmp_path / "index"
+    index = MailIndex(str(folder), model="m")
+    index.update(str(mails), client=client)
+    assert index.meta["file"] == "vectors-0.f32"
+
+    os.remove(mails / "firma_b.json")
+    stats = index.update(str(mails), client=client)
+    assert (stats["removed"], stats["passages"]) == (3, 1)
+    assert index.meta["file"] == "vectors-1.f32"
+    assert sorted(os.listdir(folder)) == ["meta.json", "vectors-1.f32"]
+
+    reopened = MailIndex(str(folder), model="m")
+    assert len(reopened.meta["passages"]) == 1
+    assert _search(reopened, client, "Ventile bestellt")["text"] == "Ventile bestellt"
@@ -0,0 +1,125 @@
+import base64
+import io
+import json
+import os
+import shutil
+
+from mail_ingest import ingest_eml_folder, parse_eml_bytes, parse_eml_stream
+
+SAMPLES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "Kundenmails_Original",
+    "TechnoFab",
+)
+
+
+def _ingest(src, tmp_path):
+    return ingest_eml_folder(
+        str(src),
+        str(tmp_path / "json"),
+        manifest_path=str(tmp_path / "manifest.json"),
+        cache_path=str(tmp_path / "cache.json"),
+        sketches_path=str(tmp_path / "sketches.json"),
+        alias_path=str(tmp_path / "aliases.json"),
+    )
+
+
+def _outputs(tmp_path):
+    folder = tmp_path / "json"
+    return {name: os.stat(folder / name).st_mtime_ns for name in os.listdir(folder)}
+
+
+def test_rerun_without_changes_parses_and_writes_nothing(tmp_path):
+    src = tmp_path / "eml"
+    shutil.copytree(SAMPLES, src)
+    count = len(os.listdir(src))
+
+    first = _ingest(src, tmp_path)
+    assert first["parsed"] == count and first["written"]
+    outputs = _outputs(tmp_path)
+
+    second = _ingest(src, tmp_path)
+    assert (second["parsed"], second["reused"], second["removed"]) == (0, count, 0)
+    assert not second["written"] and not second["deleted"]
+    assert _outputs(tmp_path) == outputs
+
+
+def test_manifest_tracks_touched_and_removed_files(tmp_path):
+    src = tmp_path / "eml"
+    shutil.copytree(SAMPLES, src)
+    _ingest(src, tmp_path)
+    names = sorted(os.listdir(src))
+
+    os.remove(src / names[0])
+    # Nur die mtime geändert: Digest gleich, also nicht erneut parsen
+    stat = os.stat(src / names[1])
+    os.utime(src / names[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    stats = _ingest(src, tmp_path)
+    assert (stats["parsed"], stats["removed"]) == (0, 1)
+    assert stats["written"]
+
+    with open(tmp_path / "manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert sorted(manifest["files"]) == names[1:]
+    assert manifest["files"][names[1]]["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+
+def _multipart(parts):
+    lines = [
+        b"From: Kunde <kunde@example.com>",
+        b"To: ich@innovatek-solutions.de",
+        b"Subject: Anfrage",
+        b"Date: Mon, 01 Jan 2024 10:00:00 +0100",
+        b"MIME-Version: 1.0",
+        b'Content-Type: multipart/mixed; boundary="b1"',
+        b"",
+        b"Praeambel",
+    ]
+    for headers, body in parts:
+        lines += [b"--b1", *headers, b"", body]
+    lines += [b"--b1--", b""]
+    return b"\r\n".join(lines)
+
+
+def test_stream_parser_skips_attachments():
+    attachment = base64.encodebytes(os.urandom(300 * 1024))
+    raw = _multipart(
+        [
+            (
+                [
+                    b"Content-Type: text/plain; charset=utf-8",
+                    b"Content-Transfer-Encoding: quoted-printable",
+                ],
+                b"Bitte ein Angebot f=C3=BCr 20 Ventile.",
+            ),
+            (
+                [
+                    b"Content-Type: application/pdf",
+                    b'Content-Disposition: attachment; filename="zeichnung.pdf"',
+                    b"Content-Transfer-Encoding: base64",
+                ],
+                attachment,
+            ),
+        ]
+    )
+    mail = parse_eml_bytes("a.eml", raw)
+    assert mail["subject"] == "Anfrage"
+    assert mail["body"] == "Bitte ein Angebot für 20 Ventile."
+
+
+def test_stream_parser_converts_html_only_mail():
+    raw = _multipart(
+        [
+            (
+                [b"Content-Type: text/html; charset=utf-8"],
+                b"<html><body><p>Liefertermin&nbsp;KW 12</p><p>Danke</p></body></html>",
+            )
+        ]
+    )
+    assert parse_eml_bytes("a.eml", raw)["body"] == "Liefertermin KW 12\n\nDanke"
+
+
+def test_stream_parser_caps_decoded_body():
+    raw = _multipart([([b"Content-Type: text/plain"], b"x" * 5000)])
+    mail = parse_eml_stream("a.eml", io.BytesIO(raw), max_body_bytes=100)
+    assert mail["body"] == "x" * 100
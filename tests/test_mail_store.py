@@ -0,0 +1,26 @@
+from mail_store import MailStore
+
+
+def _mail(filename, sender):
+    return {
+        "filename": filename,
+        "date": "2024-01-01T10:00:00",
+        "from_email": sender,
+        "to_emails": [],
+        "subject": "Anfrage",
+        "body": "Text",
+    }
+
+
+def test_contacts_skip_only_real_own_domains(tmp_path):
+    store = MailStore(str(tmp_path / "mdz.sqlite3"))
+    store.sync_mails(
+        [
+            ("firma", "1", _mail("1.eml", "kunde@notinnovatek-solutions.de")),
+            ("firma", "2", _mail("2.eml", "ich@innovatek-solutions.de")),
+            ("firma", "3", _mail("3.eml", "ich@mail.innovatek-solutions.de")),
+        ]
+    )
+    with store._connect() as db:
+        emails = [r[0] for r in db.execute("SELECT email FROM contacts")]
+    assert emails == ["kunde@notinnovatek-solutions.de"]
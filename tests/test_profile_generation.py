@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+import profile_generation
+from profile_generation import _reduce_partials, build_profile
+from profile_schema import parse_profile
+
+
+def test_reduce_partials_terminates_with_oversized_partials():
+    # Jedes Teilprofil (~310 Tokens) ist größer als die Hälfte des Budgets
+    partials = [
+        {"company_name": f"Firma {i}", "products": [], "summary": "x" * 1200}
+        for i in range(5)
+    ]
+    calls = []
+
+    async def call(prompt, stage):
+        calls.append(stage)
+        return [{"company_name": "Firma", "products": [], "summary": "kurz"}], True
+
+    profile, ok = asyncio.run(
+        asyncio.wait_for(_reduce_partials(partials, call, budget=600), timeout=5)
+    )
+    assert ok
+    assert profile[0]["summary"] == "kurz"
+    assert calls and set(calls) == {"profile_reduce"}
+
+
+def test_failed_map_chunk_marks_profile_invalid(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        profile_generation, "PROFILE_CHUNK_CACHE_FOLDER", str(tmp_path / "chunks")
+    )
+    emails = [
+        {"date": f"2024-01-{i + 1:02d}", "subject": f"Anfrage {i}", "body": "x" * 900}
+        for i in range(6)
+    ]
+    stages = []
+
+    async def call(prompt, stage):
+        stages.append(stage)
+        if stage == "profile_map" and len(stages) == 1:
+            return parse_profile("Das ist kein JSON")[0], False
+        return [{"company_name": "Firma", "products": [], "summary": "kurz"}], True
+
+    profile, ok = asyncio.run(build_profile(emails, call, budget=800))
+    assert "profile_map" in stages and stages[-1] == "profile_reduce"
+    assert profile[0]["summary"] == "kurz"
+    assert not ok
+    # Ungültige Teilprofile landen nicht im Block-Cache
+    assert len(os.listdir(tmp_path / "chunks")) == stages.count("profile_map") - 1